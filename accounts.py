@@ -0,0 +1,350 @@
+"""Accounts, logins, sessions and password resets.
+
+Split from services.py so a terminal can start, log in and show its
+menus without loading billing, the kitchen or the venue calendar;
+services re-exports everything here. Nothing here prompts or prints.
+"""
+import csv
+import threading
+import weakref
+
+import credentials
+import metrics
+from sessions import RESET_TTL, RateLimiter, SessionStore
+
+POSITIONS = ["chef", "waiter", "receptionist", "housekeeper", "manager"]
+
+SIGNUP_ROLES = {"1": "staff", "2": "user", "staff": "staff", "user": "user"}
+
+
+class ServiceError(Exception):
+    pass
+
+
+class RateLimited(ServiceError):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _check_text(value, label):
+    """Reject what would break a line of the users files or record logs.
+
+    Lines end at a newline (or a carriage return, read in text mode) and
+    split into fields at commas and "Key: value" colons, so a name with
+    any of these could forge another record or account.
+    """
+    if not value.isprintable():
+        raise ServiceError(f"{label} cannot contain line breaks or control characters.")
+    if "," in value or ":" in value:
+        raise ServiceError(f"{label} cannot contain commas or colons.")
+    return value
+
+
+def _require_password(password):
+    if not password:
+        raise ServiceError("Password cannot be empty.")
+    return password
+
+
+_sessions = weakref.WeakKeyDictionary()
+_session_lock = threading.Lock()
+
+# Login and reset attempts: a few at once per username, then one every 30
+# seconds; a busier allowance per client address. Successful attempts
+# give their token back, so only failures run the buckets down.
+user_attempts = RateLimiter(rate=1 / 30, burst=5)
+source_attempts = RateLimiter(rate=1.0, burst=30)
+
+
+def get_sessions(storage, persist=False):
+    """The session store for storage; persist (first call only) saves sessions in its data directory"""
+    with _session_lock:
+        store = _sessions.get(storage)
+        if store is None:
+            store = _sessions[storage] = SessionStore(storage.root if persist else None)
+        return store
+
+
+def _end_sessions(storage, username):
+    store = _sessions.get(storage)
+    if store is not None:
+        store.end_user(username)
+
+
+def check_new_username(storage, username):
+    """The stripped username if it is free to sign up with"""
+    username = str(username or "").strip()
+    if not username:
+        raise ServiceError("Username cannot be empty.")
+    _check_text(username, "Username")
+    if storage.username_taken(username):
+        raise ServiceError("Username already exists. Please choose another.")
+    return username
+
+
+def check_position(position):
+    position = (position or "").lower().strip()
+    if position not in POSITIONS:
+        raise ServiceError("Invalid position. Please enter 'chef', 'waiter', 'receptionist', 'housekeeper', or 'manager'.")
+    return position
+
+
+@metrics.timed("signup")
+def signup(storage, role, username, password, position=None):
+    role = SIGNUP_ROLES.get(role)
+    if role is None:
+        raise ServiceError("Invalid choice. Please select 1 or 2.")
+    username = check_new_username(storage, username)
+    _require_password(password)
+    if role == "staff":
+        position = check_position(position)
+    stored = credentials.hash_password(password)
+    if not storage.save_user(role, username, stored, position if role == "staff" else None):
+        # Taken at another property since check_new_username()
+        raise ServiceError("Username already exists. Please choose another.")
+    return {"username": username, "role": role}
+
+
+def ensure_admin(storage):
+    """Create the first admin (password admin123) if there is none; returns its username or None.
+
+    It is "admin", or "admin-<property>" when serving one property of several.
+    """
+    if storage.has_admin():
+        return None
+    username = "admin" if storage.property_id is None else f"admin-{storage.property_id}"
+    if not storage.save_user("admin", username, credentials.hash_password("admin123")):
+        raise ServiceError(f"Username {username} is taken at another property.")
+    return username
+
+
+def _take_attempt(username, source):
+    """Spend a login attempt for username and source, or raise RateLimited"""
+    wait = user_attempts.take(username)
+    if not wait and source is not None:
+        wait = source_attempts.take(source)
+        if wait:
+            user_attempts.refund(username)
+    if wait:
+        raise RateLimited(f"Too many attempts. Try again in {int(wait) + 1} seconds.", wait)
+
+
+def _refund_attempt(username, source):
+    user_attempts.refund(username)
+    if source is not None:
+        source_attempts.refund(source)
+
+
+@metrics.timed("login")
+def authenticate(storage, username, password, source=None):
+    """Return the logged-in user dict, as login() used to.
+
+    source (e.g. the client address) is rate limited as well as the
+    username; throttled attempts never reach the users files.
+    """
+    _take_attempt(username, source)
+    entry = storage.find_user(username)
+    if entry is None:
+        raise ServiceError("Username not found.")
+    role, data = entry
+    if not credentials.verify_password(data["password"], password):
+        raise ServiceError("Incorrect password.")
+    _refund_attempt(username, source)
+    if credentials.needs_upgrade(data["password"]):
+        # Legacy plaintext row or old cost settings: store a fresh hash
+        storage.set_password(username, credentials.hash_password(password))
+    user = {"username": username, "role": role}
+    if role == "staff":
+        user["position"] = data["position"]
+    return user
+
+
+def login(storage, username, password, source=None):
+    user = authenticate(storage, username, password, source)
+    return {"token": get_sessions(storage).create(user), "user": user}
+
+
+def session_user(storage, token):
+    return get_sessions(storage).user(token)
+
+
+def logout(storage, token):
+    return {"logged_out": get_sessions(storage).end(token)}
+
+
+@metrics.timed("change_password")
+def change_password(storage, username, old_password, new_password, token=None):
+    """Set a new password after checking the old one; other sessions are logged out"""
+    _require_password(new_password)
+    authenticate(storage, username, old_password)
+    storage.set_password(username, credentials.hash_password(new_password))
+    ended = get_sessions(storage).end_user(username, keep=token)
+    return {"username": username, "sessions_ended": ended}
+
+
+def issue_password_reset(storage, username):
+    """A one-time code (given to the user by an admin) to set a forgotten password"""
+    if storage.find_user(username) is None:
+        raise ServiceError("User not found.")
+    code = get_sessions(storage).issue_reset(username)
+    return {"username": username, "code": code, "expires_in": RESET_TTL}
+
+
+@metrics.timed("reset_password")
+def reset_password(storage, username, code, new_password, source=None):
+    """Set a password with a reset code; this also enables imported staff accounts"""
+    _require_password(new_password)
+    _take_attempt(username, source)
+    if storage.find_user(username) is None or not get_sessions(storage).use_reset(username, code or ""):
+        raise ServiceError("Invalid or expired reset code.")
+    _refund_attempt(username, source)
+    storage.set_password(username, credentials.hash_password(new_password))
+    ended = get_sessions(storage).end_user(username)
+    return {"username": username, "sessions_ended": ended}
+
+
+def list_users(storage):
+    return {
+        "admins": [u for u, _ in storage.each_user("admin")],
+        "staff": {u: d["position"] for u, d in storage.each_user("staff")},
+        "users": [u for u, _ in storage.each_user("user")],
+    }
+
+
+def staff_by_position(storage):
+    return {position: [u for u, _ in storage.each_user("staff", position)] for position in POSITIONS}
+
+
+@metrics.timed("user_page")
+def user_page(storage, role, position=None, cursor=None, limit=50):
+    """One page of a role (or a staff position) in username order.
+
+    Pass the returned cursor back for the next page; it is None after the
+    last one. The total is only counted for the first page.
+    """
+    if role not in ("admin", "staff", "user"):
+        raise ServiceError("Role must be admin, staff or user.")
+    if position and position not in POSITIONS:
+        raise ServiceError("Invalid position.")
+    try:
+        limit = max(1, min(int(limit), 1000))
+    except (TypeError, ValueError):
+        raise ServiceError("Page size must be a number.")
+    first = not cursor
+    page, cursor = storage.user_page(role, position or None, cursor or None, limit)
+    users = [{"username": u, "position": d["position"]} if role == "staff" else {"username": u} for u, d in page]
+    total = storage.count_users(role, position or None) if first else None
+    return {"users": users, "cursor": cursor, "total": total}
+
+
+@metrics.timed("promote_user")
+def promote_user(storage, username):
+    entry = storage.find_user(username)
+    if entry is None:
+        raise ServiceError("User not found.")
+    if entry[0] == "admin":
+        raise ServiceError(f"{username} is already an admin.")
+    storage.promote_to_admin(username)
+    _end_sessions(storage, username)
+    return {"username": username, "role": "admin"}
+
+
+@metrics.timed("delete_user")
+def delete_user(storage, username, acting=None):
+    entry = storage.find_user(username)
+    if entry is None:
+        raise ServiceError("User not found.")
+    if username == acting:
+        raise ServiceError("You cannot delete your own account.")
+    if entry[0] == "admin" and storage.count_users("admin") <= 1:
+        raise ServiceError("Cannot delete the last admin.")
+    storage.delete_user(username)
+    _end_sessions(storage, username)
+    return {"username": username, "deleted": True}
+
+
+@metrics.timed("import_staff")
+def import_staff(storage, rows):
+    """Add or update staff from rows of (username, position[, password]).
+
+    Rows for usernames held by an admin or customer (here or at another
+    property), or with a bad position, are skipped and reported. New staff without a password
+    cannot log in until one is set.
+    """
+    staff = storage.load_users("staff")
+    valid, skipped, seen = [], [], {}  # seen: username -> row number
+    added = updated = 0
+    for number, row in enumerate(rows, 1):
+        row = [str(x).strip() for x in row]
+        if len(row) < 2 or not row[0]:
+            skipped.append((number, "expected username,position[,password]"))
+            continue
+        username, position = row[0], row[1].lower()
+        password = row[2] if len(row) > 2 and row[2] else None
+        if not username.isprintable() or "," in username or ":" in username:
+            skipped.append((number, "username cannot contain line breaks, commas or colons"))
+        elif position not in POSITIONS:
+            skipped.append((number, f"invalid position {position!r}"))
+        elif username not in staff and storage.find_user(username) is not None:
+            skipped.append((number, f"{username} is not a staff member"))
+        elif username not in staff and storage.username_taken(username):
+            skipped.append((number, f"{username} is taken at another property"))
+        else:
+            valid.append((username, position, credentials.hash_password(password) if password else None))
+            if username in staff or username in seen:
+                updated += 1
+            else:
+                added += 1
+            seen[username] = number
+    if valid:
+        for username in storage.import_staff(valid):
+            # Claimed at another property since the check above
+            added -= 1
+            skipped.append((seen[username], f"{username} is taken at another property"))
+    return {"added": added, "updated": updated, "skipped": skipped}
+
+
+def export_staff(storage):
+    """[(username, position)] for every staff member, in username order"""
+    rows, cursor = [], None
+    while True:
+        page, cursor = storage.user_page("staff", after=cursor, limit=10000)
+        rows.extend((u, d["position"]) for u, d in page)
+        if cursor is None:
+            return rows
+
+
+def read_roster(path):
+    """Rows of a staff roster CSV (username,position[,password]); a header row is skipped"""
+    try:
+        with open(path, newline="") as f:
+            rows = [row for row in csv.reader(f) if row]
+    except OSError as e:
+        raise ServiceError(f"Cannot read {path}: {e.strerror}")
+    if rows and [x.strip().lower() for x in rows[0][:2]] == ["username", "position"]:
+        rows = rows[1:]
+    return rows
+
+
+def write_roster(storage, path):
+    rows = export_staff(storage)
+    try:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["username", "position"])
+            writer.writerows(rows)
+    except OSError as e:
+        raise ServiceError(f"Cannot write {path}: {e.strerror}")
+    return len(rows)
+
+
+@metrics.timed("update_staff_position")
+def update_staff_position(storage, username, position):
+    position = (position or "").lower().strip()
+    if position not in POSITIONS:
+        raise ServiceError("Invalid position.")
+    if not storage.update_staff_position(username, position):
+        raise ServiceError("Staff member not found.")
+    _end_sessions(storage, username)
+    return {"username": username, "position": position}
@@ -0,0 +1,187 @@
+"""Apply a file of signups, bookings, food orders and events without prompts.
+
+Run: python batch.py ops.jsonl|ops.csv [--results out.jsonl] [--chunk 5000] [--data data] [--property id]
+
+Each JSONL line, or CSV row under a header naming the fields, is one
+operation. It runs through the same service functions as the menus and
+the HTTP API, so phones, positions, rooms and dates are checked exactly
+as they are there:
+
+    {"op": "signup", "role": "user", "username": "ravi", "password": "..."}
+    {"op": "signup", "role": "staff", "username": "anita", "password": "...", "position": "chef"}
+    {"op": "book_room", "username": "ravi", "room": 2, "name": "Ravi Kumar", "phone": "9876543210",
+     "check_in": "2027-03-01", "check_out": "2027-03-03"}
+    {"op": "order_food", "username": "ravi", "items": "pepsi x2; tata-tea x1", "name": "Ravi Kumar",
+     "phone": "9876543210", "delivery": "yes"}
+    {"op": "book_event", "username": "ravi", "event": 2, "name": "Ravi Kumar", "phone": "9876543210",
+     "date": "2027-04-12", "guests": 120, "confirmed": "no"}
+
+Bookings, orders and events must name a user who exists or signs up
+earlier in the file. Operations are applied --chunk at a time inside
+storage.batch(), so a chunk is one append per file (text) or one
+transaction (SQLite). A result line per operation goes to --results
+(stdout by default) once its chunk is saved:
+
+    {"line": 3, "op": "book_room", "ok": true, "result": {"record": {...}, "total": 9000}}
+    {"line": 4, "op": "book_room", "ok": false, "error": "Invalid input, please enter a 10 digit number"}
+
+Signups hash a password each, so they go at the KDF's pace, not the
+bookings'. The exit status is 1 if any operation failed.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+
+import properties
+import services
+from services import ServiceError
+from storage import open_storage
+
+# op -> (service function, required fields in call order, optional keyword fields)
+OPERATIONS = {
+    "signup": (services.signup, ("role", "username", "password"), ("position",)),
+    "book_room": (services.book_room, ("username", "room", "name", "phone", "check_in", "check_out"), ()),
+    "order_food": (services.order_food, ("username", "items", "name", "phone"), ("delivery",)),
+    "book_event": (services.book_event, ("username", "event", "name", "phone", "date", "guests"),
+                   ("venue", "confirmed")),
+}
+OP_KINDS = {"book_room": "booking", "order_food": "food", "book_event": "event"}
+FLAGS = ("delivery", "confirmed")
+CHUNK = 5000
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "y", "yes", "true")
+    return bool(value)
+
+
+def read_operations(path):
+    """(line number, operation) for each operation in a .jsonl or .csv file"""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+        return
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def apply(storage, operation, known=None):
+    """Run one operation; returns the service's result or raises ServiceError.
+
+    known is an optional set of usernames already checked to exist.
+    """
+    if not isinstance(operation, dict):
+        raise ServiceError("Expected a JSON object.")
+    op = operation.get("op")
+    if op not in OPERATIONS:
+        raise ServiceError(f"Unknown operation {op!r}; expected one of {', '.join(OPERATIONS)}.")
+    func, required, optional = OPERATIONS[op]
+    missing = [field for field in required if operation.get(field) in (None, "")]
+    if missing:
+        raise ServiceError(f"Missing {', '.join(missing)}.")
+    args = [operation[field] for field in required]
+    if op != "signup":
+        args[0] = str(args[0]).strip()
+        if known is None or args[0] not in known:
+            if storage.find_user(args[0]) is None:
+                raise ServiceError(f"Unknown user {args[0]}.")
+            if known is not None:
+                known.add(args[0])
+    kwargs = {field: operation[field] for field in optional if operation.get(field) not in (None, "")}
+    for field in FLAGS:
+        if field in kwargs:
+            kwargs[field] = _flag(kwargs[field])
+    return func(storage, *args, **kwargs)
+
+
+def _summary(result):
+    """A service result with its invoice cut down to the total"""
+    invoice = result.get("invoice")
+    if invoice is None:
+        return result
+    summary = {key: value for key, value in result.items() if key != "invoice"}
+    summary["total"] = invoice["total"]
+    return summary
+
+
+def _saved(result, batch):
+    kind = result["result"]["role"] if result["op"] == "signup" else OP_KINDS[result["op"]]
+    return kind in batch.written
+
+
+def run(storage, operations, out, chunk=CHUNK):
+    """Apply (line number, operation) pairs a chunk at a time, writing a result line for each to out.
+
+    Returns (applied, failed) counts.
+    """
+    applied = failed = 0
+    operations = iter(operations)
+    while True:
+        block = list(itertools.islice(operations, chunk))
+        if not block:
+            return applied, failed
+        results = []
+        known = set()  # users seen to exist in this chunk; each is looked up once
+        try:
+            with storage.batch() as batch:
+                for number, operation in block:
+                    op = operation.get("op") if isinstance(operation, dict) else None
+                    try:
+                        result = _summary(apply(storage, operation, known))
+                        results.append({"line": number, "op": op, "ok": True, "result": result})
+                    except (ServiceError, TypeError, ValueError, KeyError) as e:
+                        # KeyError/TypeError/ValueError: fields of the wrong shape, e.g. items: 5
+                        results.append({"line": number, "op": op, "ok": False, "error": str(e) or type(e).__name__})
+        except OSError as e:
+            for result in results:
+                if result["ok"] and not _saved(result, batch):
+                    del result["result"]
+                    result.update(ok=False, error=f"Not saved: {e.strerror or e}")
+        for result in results:
+            if result["ok"]:
+                applied += 1
+            else:
+                failed += 1
+            out.write(json.dumps(result, default=str) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a JSONL or CSV file of hotel operations")
+    parser.add_argument("path", help="operations, one per line (.jsonl) or row (.csv)")
+    parser.add_argument("--results", help="file for the per-operation results (default: stdout)")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="operations per bulk write")
+    parser.add_argument("--data", default=properties.data_root(), help="data directory (the root, with --property)")
+    parser.add_argument("--property", default=properties.current_property(), help="apply to this property of several")
+    args = parser.parse_args()
+    storage = open_storage(root=args.data, property_id=args.property)
+    out = open(args.results, "w") if args.results else sys.stdout
+    start = time.perf_counter()
+    try:
+        applied, failed = run(storage, read_operations(args.path), out, max(1, args.chunk))
+    except OSError as e:
+        print(f"Cannot read {args.path}: {e.strerror or e}", file=sys.stderr)
+        return 2
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        storage.close()
+    seconds = time.perf_counter() - start
+    print(f"{applied} applied, {failed} failed in {seconds:.2f} s "
+          f"({(applied + failed) / max(seconds, 1e-9):.0f} operations/s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
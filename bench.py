@@ -0,0 +1,1064 @@
+"""Benchmarks for the hotel management system.
+
+Usage: python bench.py [name ...] [--scale 1e3,1e5] [--json out.json]
+                       [--compare base.json] [--threshold 1.25]
+       (no name runs every benchmark)
+
+Each benchmark runs inside a throwaway working directory, so the relative
+data/ paths used by main.py never touch real data. The headline numbers
+each benchmark record()s can be saved with --json; --compare checks them
+against an earlier run (say, of the previous commit) and exits 1 if any
+got worse by more than --threshold times. The startup benchmark also
+exits 1 if a terminal's cold start goes over STARTUP_BUDGET.
+
+The flows benchmark generates a hotel (datagen.py) at each --scale and
+drives login, signup, admin listings, bookings, food orders, search and
+reports through services.py, with no prompts.
+
+Benchmarks measure; correctness is checked by the tests (python -m
+pytest tests).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = {}
+RESULTS = {}  # benchmark -> {metric: [value, unit]}
+SCALES = (1000, 10000, 100000)
+HIGHER_IS_BETTER = ("/s",)  # units of throughputs; all other units are times
+_running = None
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def record(metric, value, unit):
+    """Keep one headline number of the running benchmark for --json and --compare"""
+    RESULTS.setdefault(_running, {})[metric] = [value, unit]
+
+
+def timed(func, *args, repeat=1):
+    """Return the best wall-clock time of func(*args) over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def write_user_files(users=50000, staff=2000, admins=5):
+    os.makedirs("data", exist_ok=True)
+    positions = ["chef", "waiter", "receptionist", "housekeeper", "manager"]
+    with open("data/admins.txt", "w") as f:
+        f.writelines(f"admin{i},pw{i}\n" for i in range(admins))
+    with open("data/staff.txt", "w") as f:
+        f.writelines(f"staff{i},pw{i},{positions[i % 5]}\n" for i in range(staff))
+    with open("data/users.txt", "w") as f:
+        f.writelines(f"user{i},pw{i}\n" for i in range(users))
+
+
+@benchmark("users")
+def bench_user_lookup(users=50000, logins=200):
+    """Per-call users file parsing vs the cached user directory"""
+    import main
+    from userdir import read_user_file
+    write_user_files(users)
+    names = [f"user{i * (users // logins)}" for i in range(logins)]
+    files = [("data/admins.txt", False), ("data/staff.txt", True), ("data/users.txt", False)]
+
+    def scan():
+        for name in names:
+            for path, staff in files:
+                if name in read_user_file(path, staff):
+                    break
+
+    storage = main.open_data()
+
+    def indexed():
+        for name in names:
+            storage.find_user(name)
+
+    storage.load_users("user")  # the one-off load at first use
+    per_call = timed(scan)
+    cached = timed(indexed, repeat=3)
+    storage.close()
+    print(f"{users} users, {logins} lookups")
+    print(f"  users files parsed per call: {per_call * 1000 / logins:.3f} ms/lookup")
+    print(f"  user directory:              {cached * 1e6 / logins:.2f} us/lookup")
+    record("lookup", cached / logins, "s")
+
+
+@benchmark("storage")
+def bench_storage(users=50000, staff=20000, updates=20):
+    """Text vs SQLite backend: lookups, staff position updates, bookings"""
+    from storage import TextStorage, migrate_text_to_sqlite, SqliteStorage
+    write_user_files(users, staff)
+    migrate_start = time.perf_counter()
+    migrate_text_to_sqlite("data", "data/hotel.db")
+    print(f"migrated {users + staff} users in {time.perf_counter() - migrate_start:.2f} s")
+    backends = {"text": TextStorage("data"), "sqlite": SqliteStorage("data/hotel.db")}
+    for name, backend in backends.items():
+        backend.find_user("user0")
+        lookup = timed(lambda: [backend.find_user(f"user{i}") for i in range(0, users, users // 1000)])
+        update = timed(lambda: [backend.update_staff_position(f"staff{i}", "chef") for i in range(updates)])
+        booking = {"username": "user1", "item": 2, "name": "Guest", "phone": "9876543210"}
+        append = timed(lambda: [backend.add_record("booking", booking) for _ in range(1000)])
+        print(f"  {name:6} lookup {lookup * 1000:.3f} us  position update {update * 1000 / updates:.3f} ms"
+              f"  booking {append * 1000:.3f} us")
+        record(f"{name}_lookup", lookup / 1000, "s")
+        record(f"{name}_position_update", update / updates, "s")
+        record(f"{name}_booking", append / 1000, "s")
+        backend.close()
+
+
+@benchmark("admin")
+def bench_admin(users=1000000, staff=100000, changes=200):
+    """Admin listings, promote/delete and roster import at 1M customers, 100k staff"""
+    import services
+    from storage import TextStorage, migrate_text_to_sqlite, SqliteStorage
+    write_user_files(users, staff)
+    migrate_text_to_sqlite("data", "data/hotel.db")
+    roster = [[f"staff{i}", "manager"] for i in range(0, staff, 2)] + [[f"new{i}", "chef"] for i in range(staff // 2)]
+    print(f"{users} customers, {staff} staff")
+    for name, backend in (("text", TextStorage("data")), ("sqlite", SqliteStorage("data/hotel.db"))):
+        load = timed(backend.find_user, "user0")
+
+        def pages(role, position=None, count=50):
+            cursor = None
+            for _ in range(count):
+                cursor = services.user_page(backend, role, position, cursor, 20)["cursor"]
+
+        first = timed(pages, "user", None, 1)
+        paging = timed(pages, "user", None, 50)
+        positions = timed(lambda: [pages("staff", p, 1) for p in services.POSITIONS])
+        counts = timed(lambda: [backend.count_users("staff", p) for p in services.POSITIONS])
+        promote = timed(lambda: [services.promote_user(backend, f"user{i}") for i in range(changes)])
+        delete = timed(lambda: [services.delete_user(backend, f"user{i}") for i in range(changes, 2 * changes)])
+        move = timed(lambda: [backend.update_staff_position(f"staff{i}", "chef") for i in range(changes)])
+        imported = timed(services.import_staff, backend, roster)
+        exported = timed(services.export_staff, backend)
+        print(f"  {name:6} load {load:.2f}s, first customer page {first * 1000:.0f} ms, "
+              f"next pages {paging * 1000 / 50:.2f} ms")
+        print(f"         first page per position {positions * 1000 / 5:.0f} ms, counts {counts * 1e6 / 5:.0f} us")
+        print(f"         promote {promote * 1000 / changes:.2f} ms, delete {delete * 1000 / changes:.2f} ms, "
+              f"position change {move * 1000 / changes:.2f} ms")
+        print(f"         import {len(roster)} roster rows {imported:.2f}s, export {exported:.2f}s")
+        record(f"{name}_first_page", first, "s")
+        record(f"{name}_next_page", paging / 50, "s")
+        record(f"{name}_import", imported, "s")
+        backend.close()
+
+
+@benchmark("availability")
+def bench_availability(bookings=1000000, queries=10000):
+    """Occupancy index over 1M historical bookings vs a linear scan"""
+    import datetime
+    import random
+    from inventory import RoomInventory
+    rng = random.Random(1)
+    start = datetime.date(2016, 1, 1)
+    history = []
+    for _ in range(bookings):
+        check_in = start + datetime.timedelta(days=rng.randrange(3650))
+        check_out = check_in + datetime.timedelta(days=rng.randint(1, 7))
+        history.append({"item": str(rng.randint(1, 5)), "date": check_in.isoformat(),
+                        "checkout": check_out.isoformat()})
+    # Large counts so the synthetic history never exceeds capacity
+    counts = {room: 1000 for room in range(1, 6)}
+    build = timed(lambda: RoomInventory.from_bookings(history, counts))
+    inventory = RoomInventory.from_bookings(history, counts)
+    ranges = []
+    for _ in range(queries):
+        check_in = start + datetime.timedelta(days=rng.randrange(3650))
+        ranges.append((check_in, check_in + datetime.timedelta(days=rng.randint(1, 14))))
+    query = timed(lambda: [inventory.free_rooms(a, b) for a, b in ranges])
+
+    def scan(check_in, check_out):
+        lo, hi = check_in.isoformat(), check_out.isoformat()
+        return sum(1 for r in history if r["date"] < hi and r["checkout"] > lo)
+
+    linear = timed(lambda: scan(*ranges[0]))
+    print(f"{bookings} bookings: index build {build:.2f} s")
+    print(f"  free_rooms() over all types: {query * 1e6 / queries:.1f} us/query")
+    record("free_rooms", query / queries, "s")
+    print(f"  linear scan of the history:  {linear * 1000:.1f} ms/query")
+
+
+def _stress_bookings(worker, count, group_commit):
+    from concurrent.futures import ThreadPoolExecutor
+    from storage import TextStorage
+    storage = TextStorage("data", sync=True, group_commit=group_commit)
+
+    def book(i):
+        storage.add_record("booking", {"username": f"w{worker}", "item": i % 5 + 1,
+                                       "name": f"Guest {worker}-{i}", "phone": "9876543210"})
+
+    threads = 8 if group_commit else 1
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(book, range(count)))
+
+
+def _stress_staff(count):
+    from storage import TextStorage
+    storage = TextStorage("data")
+    for i in range(count):
+        storage.save_user("staff", f"stress{i}", "pw", "waiter")
+        storage.update_staff_position(f"stress{i // 2}", "chef")
+
+
+@benchmark("stress")
+def bench_stress(processes=4, count=2000, staff=200):
+    """Several processes booking while another rewrites staff.txt"""
+    import multiprocessing
+    for group_commit in (False, True):
+        for path in ("data/bookings.txt", "data/staff.txt", "data/journal.wal"):
+            if os.path.exists(path):
+                os.remove(path)
+        workers = [multiprocessing.Process(target=_stress_bookings, args=(w, count, group_commit))
+                   for w in range(processes)]
+        workers.append(multiprocessing.Process(target=_stress_staff, args=(staff,)))
+        start = time.perf_counter()
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+        elapsed = time.perf_counter() - start
+        with open("data/bookings.txt") as f:
+            names = {line.split("Name: ")[1].split(",")[0] for line in f}
+        expected = {f"Guest {w}-{i}" for w in range(processes) for i in range(count)}
+        with open("data/staff.txt") as f:
+            staff_names = {line.split(",")[0] for line in f}
+        lost = len(expected - names) + (staff - len(staff_names))
+        mode = "group commit" if group_commit else "fsync each "
+        print(f"  {mode}: {processes * count / elapsed:8.0f} bookings/s, {lost} lost records")
+        record("group_commit" if group_commit else "fsync_each", processes * count / elapsed, "/s")
+        if lost:
+            raise SystemExit("records were lost")
+
+
+
+CRASH_CHILD = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from storage import TextStorage
+storage = TextStorage("data", sync=True)
+for i in range(int(sys.argv[2]), int(sys.argv[3])):
+    if i % 4 == 0:
+        storage.save_user("user", f"crash{i}", "pw")
+    storage.add_record("booking", {"username": "crash", "item": i % 5 + 1,
+                                   "name": f"Crash {i}", "phone": "9876543210"})
+    print(i, flush=True)
+"""
+
+
+def _check_crash(acked):
+    """Reopen the storage (recovery) and check every acknowledged write survived once"""
+    from storage import TextStorage
+    storage = TextStorage("data")
+    seconds, frames = storage.journal.last_recovery
+    raw = b""
+    if os.path.exists("data/bookings.txt"):
+        with open("data/bookings.txt", "rb") as f:
+            raw = f.read()
+    storage.close()
+    if raw and not raw.endswith(b"\n"):
+        raise SystemExit("bookings.txt ends with a torn line")
+    names = [line.split("Name: ")[1].split(",")[0] for line in raw.decode().splitlines()]
+    counts = {}
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+    lost = [i for i in acked if counts.get(f"Crash {i}") != 1]
+    users = TextStorage("data").directory
+    lost += [i for i in acked if i % 4 == 0 and not users.exists(f"crash{i}")]
+    if lost or any(n > 1 for n in counts.values()):
+        raise SystemExit(f"lost or duplicated writes: {lost[:10]}")
+    return seconds, frames
+
+
+@benchmark("crash")
+def bench_crash(kills=10, frames_mb=4):
+    """Kill writers at each journal step and at random, then check recovery"""
+    import random
+    import signal
+    import subprocess
+    repo = os.path.dirname(os.path.abspath(__file__))
+    acked = []
+    next_id = 0
+
+    def child(count, env=None):
+        nonlocal next_id
+        proc = subprocess.Popen([sys.executable, "-c", CRASH_CHILD, repo, str(next_id), str(next_id + count)],
+                                stdout=subprocess.PIPE, text=True, env=env)
+        next_id += count
+        return proc
+
+    for point in ("wal-torn", "wal", "target-torn", "target"):
+        for after in (1, 7):
+            env = dict(os.environ, HOTEL_CRASH_AT=point, HOTEL_CRASH_AFTER=str(after))
+            proc = child(20, env)
+            acked += [int(line) for line in proc.stdout]
+            proc.wait()
+            seconds, frames = _check_crash(acked)
+            print(f"  crash at {point:<11} write {after}: exit {proc.returncode}, "
+                  f"recovered {frames} frames in {seconds * 1000:.1f} ms")
+    rng = random.Random(5)
+    for _ in range(kills):
+        proc = child(100000)
+        for _ in range(rng.randrange(1, 400)):
+            acked.append(int(proc.stdout.readline()))
+        proc.send_signal(signal.SIGKILL)
+        proc.stdout.close()
+        proc.wait()
+        _check_crash(acked)
+    print(f"  {kills} random SIGKILLs: {len(acked)} acknowledged writes, none lost or doubled")
+
+    # Worst case recovery: a full journal whose writes never reached the file
+    import journal
+    for name in ("bookings.txt", journal.JOURNAL_FILE):
+        os.remove(os.path.join("data", name))
+    wal, offset = [], 0
+    while sum(map(len, wal)) < frames_mb * 1024 * 1024:
+        line = f"Username: guest, Item: 3, Name: Guest {len(wal)}, Phone: 9876543210\n"
+        wal.append(journal.encode_frame({"file": "bookings.txt", "offset": offset, "data": line}))
+        offset += len(line)
+    with open(os.path.join("data", journal.JOURNAL_FILE), "wb") as f:
+        f.writelines(wal)
+    start = time.perf_counter()
+    recovered = journal.Journal("data", ["bookings.txt"], background=False)
+    elapsed = time.perf_counter() - start
+    recovered.close()
+    print(f"  full {frames_mb} MB journal ({len(wal)} frames) replayed in {elapsed:.2f}s, "
+          f"bookings.txt {'complete' if os.path.getsize('data/bookings.txt') == offset else 'INCOMPLETE'}")
+    record("full_journal_recovery", elapsed, "s")
+
+
+async def _http(reader, writer, method, path, body=None, token=None):
+    import json
+    data = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+@benchmark("server")
+def bench_server(clients=300, requests=20):
+    """Load test: concurrent keep-alive clients against server.py"""
+    import asyncio
+    import socket
+    import subprocess
+    write_user_files(users=clients, staff=10)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    server = subprocess.Popen([sys.executable, script, "--port", str(port)], stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "Serving on ..."
+        latencies = []
+        failures = 0
+
+        async def client(i):
+            nonlocal failures
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            status, body = await _http(reader, writer, "POST", "/login", {"username": f"user{i}", "password": f"pw{i}"})
+            token = body["token"]
+            for n in range(requests):
+                start = time.perf_counter()
+                if n % 4 == 0:
+                    status, _ = await _http(reader, writer, "POST", "/bookings", {
+                        "room": n % 5 + 1, "name": f"Guest {i}", "phone": "9876543210",
+                        "check_in": "2027-01-01", "check_out": "2027-01-02"}, token)
+                else:
+                    status, _ = await _http(reader, writer, "GET",
+                                            "/rooms/availability?check_in=2027-01-01&check_out=2027-01-05", token=token)
+                latencies.append(time.perf_counter() - start)
+                failures += status not in (200, 400)  # 400: room type full
+            writer.close()
+
+        async def load():
+            await asyncio.gather(*(client(i) for i in range(clients)))
+
+        start = time.perf_counter()
+        asyncio.run(load())
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"{clients} clients x {requests} requests: {len(latencies) / elapsed:.0f} req/s, {failures} errors")
+    print(f"  p50 {p50 * 1000:.1f} ms   p99 {p99 * 1000:.1f} ms")
+    record("throughput", len(latencies) / elapsed, "/s")
+    record("p50", p50, "s")
+
+
+@benchmark("sessions")
+def bench_sessions(sessions=100000, checks=200000, attempts=2000):
+    """Token checks against a full session cache, and throttled login bursts"""
+    import services
+    from sessions import SessionStore
+    from storage import TextStorage
+    store = SessionStore(max_sessions=sessions)
+    create = timed(lambda: [store.create({"username": f"user{i}", "role": "user"}) for i in range(sessions)])
+    tokens = [store.create({"username": f"user{i}", "role": "user"}) for i in range(1000)]
+    forged = [t[:-4] + "AAAA" for t in tokens]
+    check = timed(lambda: [store.user(tokens[i % 1000]) for i in range(checks)])
+    reject = timed(lambda: [store.user(forged[i % 1000]) for i in range(checks)])
+    print(f"  {sessions} sessions created in {create:.2f}s ({len(store.sessions)} kept)")
+    print(f"  token check {check * 1e6 / checks:.1f} us, forged token rejected in {reject * 1e6 / checks:.1f} us")
+    record("token_check", check / checks, "s")
+
+    write_user_files(users=1000, staff=10)
+    storage = TextStorage("data")
+    stored = services.credentials.hash_password("secret")
+    storage.set_password("user1", stored)
+    wrong = timed(services.credentials.verify_password, stored, "nope", repeat=3)
+    checked = 0
+    while True:  # run the account's bucket dry
+        try:
+            services.authenticate(storage, "user1", "guess", source="203.0.113.9")
+        except services.RateLimited:
+            break
+        except services.ServiceError:
+            checked += 1
+
+    def burst():
+        for _ in range(attempts):
+            try:
+                services.authenticate(storage, "user1", "guess", source="203.0.113.9")
+            except services.RateLimited:
+                pass
+
+    throttled = timed(burst)
+    print(f"  wrong passwords on one account: {checked} checked, then each throttled in "
+          f"{throttled * 1e6 / attempts:.1f} us")
+    record("throttled_login", throttled / attempts, "s")
+    print(f"  (an attempt that reaches the password hash: {wrong * 1000:.1f} ms)")
+
+@benchmark("metrics")
+def bench_metrics(calls=200000, lookups=100000):
+    """Cost of the instrumentation, off and on"""
+    import metrics
+    from storage import TextStorage
+
+    def bare():
+        return None
+
+    wrapped = metrics.timed("bench.noop")(bare)
+    write_user_files(users=50000, staff=1000)
+    storage = TextStorage("data")
+    names = [f"user{i}" for i in range(0, 50000, 50000 // 1000)]
+    rows = {}
+    for label, on in (("off", False), ("on", True)):
+        metrics.enable(on)
+        noop = timed(lambda: [wrapped() for _ in range(calls)], repeat=3) / calls
+        lookup = timed(lambda: [storage.find_user(names[i % 1000]) for i in range(lookups)], repeat=3) / lookups
+        rows[label] = (noop, lookup)
+    base = timed(lambda: [bare() for _ in range(calls)], repeat=3) / calls
+    print(f"  plain call {base * 1e9:.0f} ns; timed() wrapper off {rows['off'][0] * 1e9:.0f} ns, "
+          f"on {rows['on'][0] * 1e9:.0f} ns")
+    print(f"  storage.find_user: metrics off {rows['off'][1] * 1e6:.2f} us, on {rows['on'][1] * 1e6:.2f} us")
+    record("wrapper_off", rows["off"][0], "s")
+    record("find_user_metrics_on", rows["on"][1], "s")
+    metrics.start_profile()
+    profiled = timed(lambda: [storage.find_user(names[i % 1000]) for i in range(lookups // 10)]) / (lookups // 10)
+    metrics.stop_profile()
+    metrics.enable(False)
+    print(f"  with cProfile capture on: {profiled * 1e6:.2f} us")
+    export = timed(metrics.prometheus, repeat=3)
+    print(f"  Prometheus dump of {len(metrics.snapshot()['operations'])} operations: {export * 1e3:.2f} ms")
+
+@benchmark("catalog")
+def bench_catalog(views=20000):
+    """Cached pre-rendered screens vs rendering with print() per line"""
+    import contextlib
+    import catalog
+    screens = [("rooms",), ("room", 3), ("food",), ("food_type", 4), ("events",), ("event", 2)]
+    cat = catalog.get_catalog()
+
+    def per_line():
+        for i in range(views):
+            name, *args = screens[i % len(screens)]
+            for line in catalog.RENDERERS[name](cat, *args):
+                print(line)
+
+    def cached():
+        for i in range(views):
+            catalog.show(*screens[i % len(screens)])
+
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        slow = timed(per_line)
+        fast = timed(cached)
+    print(f"{views} screen views")
+    print(f"  print() per line: {slow * 1e6 / views:.1f} us/view")
+    print(f"  cached screen:    {fast * 1e6 / views:.1f} us/view")
+    record("cached_view", fast / views, "s")
+
+
+@benchmark("billing")
+def bench_billing(bookings=300000, orders=300000, events=100000):
+    """Month-end batch billing over the text logs"""
+    import random
+    from storage import TextStorage, format_record
+    import billing
+    rng = random.Random(7)
+    codes = ["veg-combo", "pepsi", "paneer-tikka", "chili-chicken", "fish-curry", "green-tea"]
+    os.makedirs("data", exist_ok=True)
+    with open("data/bookings.txt", "w") as f:
+        for i in range(bookings):
+            day = 1 + i % 28
+            f.write(format_record("booking", {"username": f"user{i}", "item": rng.randint(1, 5), "name": "Guest",
+                                              "phone": "9876543210", "date": f"2026-02-{day:02d}",
+                                              "checkout": f"2026-03-{day:02d}"}))
+    with open("data/food.txt", "w") as f:
+        for i in range(orders):
+            items = [(rng.choice(codes), rng.randint(1, 4)) for _ in range(rng.randint(1, 4))]
+            f.write(format_record("food", {"username": f"user{i}", "item": 1, "name": "Guest", "phone": "9876543210",
+                                           "date": f"2026-02-{1 + i % 28:02d}", "items": billing.format_items(items),
+                                           "delivery": rng.choice(["yes", "no"])}))
+    with open("data/event.txt", "w") as f:
+        for i in range(events):
+            f.write(format_record("event", {"username": f"user{i}", "item": rng.randint(1, 5), "name": "Guest",
+                                            "phone": "9876543210", "date": f"2026-02-{1 + i % 28:02d}",
+                                            "guests": rng.randint(5, 300)}))
+    storage = TextStorage("data")
+    start = time.perf_counter()
+    totals = billing.batch_totals(storage)
+    elapsed = time.perf_counter() - start
+    lines = bookings + orders + events
+    grand = sum(sum(totals[kind].values()) for kind in ("booking", "food", "event"))
+    engine = "numpy" if billing.numpy is not None else "array"
+    print(f"{lines} records billed in {elapsed:.2f} s ({lines / elapsed:.0f}/s, {engine}), "
+          f"total {grand:,.2f}, skipped {totals['skipped']}")
+    record("records", lines / elapsed, "/s")
+    # Cross-check the columnar food totals against the per-order invoice path
+    def invoice_total(order):
+        items = billing.parse_items(order["items"])
+        try:
+            return billing.price_food_order(items, order["delivery"] == "yes")["total"]
+        except billing.BillingError:  # below the delivery minimum: no fee
+            return billing.price_food_order(items)["total"]
+
+    expected = sum(invoice_total(r) for r in storage.records("food"))
+    print(f"  food total {sum(totals['food'].values()):,.2f} vs per-invoice {expected:,.2f}")
+
+
+@benchmark("reports")
+def bench_reports(lines=1000000):
+    """Streaming report over synthetic logs: one process vs a process pool"""
+    import random
+    import reports
+    rng = random.Random(3)
+    os.makedirs("data", exist_ok=True)
+    with open("data/bookings.txt", "w") as f:
+        for i in range(lines):
+            day = 1 + i % 28
+            f.write(f"Username: user{rng.randrange(50000)}, Room: {rng.randint(1, 5)}, Name: Guest {i}, "
+                    f"Phone: 98765{i % 100000:05d}, Date: 2026-02-{day:02d}, Checkout: 2026-03-{day:02d}\n")
+            if i % 10000 == 0:
+                f.write("this line is not a booking\n")
+    with open("data/food.txt", "w") as f:
+        for i in range(lines // 4):
+            f.write(f"Username: user{rng.randrange(50000)}, Food: 2, Name: Guest, Phone: 9876543210, "
+                    f"Date: 2026-02-{1 + i % 28:02d}, Items: veg-combo x1, Delivery: no\n")
+    with open("data/event.txt", "w") as f:
+        for i in range(lines // 10):
+            f.write(f"Username: user{i}, Event: {rng.randint(1, 5)}, Name: Guest, Phone: 9876543210, "
+                    f"Date: 2026-02-{1 + i % 28:02d}, Guests: 50\n")
+    size = sum(os.path.getsize(f"data/{name}") for name in ("bookings.txt", "food.txt", "event.txt"))
+    start = time.perf_counter()
+    single = reports.summarize(reports.build_report("data", workers=1))
+    one = time.perf_counter() - start
+    start = time.perf_counter()
+    pooled = reports.summarize(reports.build_report("data", parallel_min_bytes=0))
+    many = time.perf_counter() - start
+    print(f"{size / 1e6:.0f} MB of logs, {sum(single['records'].values())} records, "
+          f"{sum(single['malformed'].values())} malformed")
+    print(f"  one process: {one:.2f} s ({size / 1e6 / one:.0f} MB/s)")
+    record("one_process", one, "s")
+    print(f"  {os.cpu_count()} cores:     {many:.2f} s ({size / 1e6 / many:.0f} MB/s), same result: {single == pooled}")
+
+
+@benchmark("search")
+def bench_search(records=2000000, queries=2000):
+    """Guest lookups by phone, username and name over millions of records"""
+    import random
+    import search
+    from storage import TextStorage
+    rng = random.Random(12)
+    first = ["Ravi", "Anita", "Sanjay", "Priya", "Amit", "Neha", "Rahul", "Pooja", "Arjun", "Kavya"]
+    last = ["Kumar", "Roy", "Sharma", "Das", "Gupta", "Singh", "Bose", "Iyer", "Nair", "Mehta"]
+    # Returning guests: each has one name and phone across many records
+    guests = [(f"user{i}", f"{rng.choice(first)} {rng.choice(last)} {i}", f"9{rng.randrange(10 ** 9):09d}")
+              for i in range(records // 10)]
+    os.makedirs("data")
+    with open("data/bookings.txt", "w") as f:
+        for i in range(records):
+            username, name, phone = rng.choice(guests)
+            f.write(f"Username: {username}, Room: {rng.randint(1, 5)}, Name: {name}, Phone: {phone}, "
+                    f"Date: 2026-02-01, Checkout: 2026-02-03\n")
+    size = os.path.getsize("data/bookings.txt")
+    build = timed(lambda: search.RecordIndex("data").rebuild())
+    print(f"{records} records ({size / 1e6:.0f} MB): built and saved in {build:.1f}s, "
+          f"index file {os.path.getsize('data/search.idx') / 1e6:.0f} MB")
+    load = timed(search.RecordIndex, "data")
+    storage = TextStorage("data")
+    storage.index.catch_up()
+    print(f"  loaded from search.idx in {load:.2f}s")
+    record("load", load, "s")
+    phones = [rng.choice(guests)[2] for _ in range(queries)]
+    users = [rng.choice(guests)[0] for _ in range(queries)]
+    for label, field, values in (("phone", "phone", phones), ("username", "username", users)):
+        elapsed = timed(lambda: [storage.find_records(field, v, 20) for v in values])
+        print(f"  by {label}: {elapsed * 1e6 / queries:.0f} us/lookup")
+        record(f"by_{label}", elapsed / queries, "s")
+    elapsed = timed(lambda: storage.find_records("name", "kumar 4", 20))
+    print(f"  by name, first query (builds trigrams): {elapsed * 1000:.0f} ms")
+    names = [rng.choice(guests)[1].split(" ", 1)[1] for _ in range(queries)]
+    elapsed = timed(lambda: [storage.find_records("name", v, 20) for v in names])
+    print(f"  by name substring (e.g. {names[0]!r}): {elapsed * 1e6 / len(names):.0f} us/lookup")
+    record("by_name", elapsed / len(names), "s")
+    elapsed = timed(lambda: [storage.find_records("name", v, 20) for v in ("ra", "an", "pr")])
+    print(f"  by name prefix: {elapsed * 1e6 / 3:.0f} us/lookup")
+    with open("data/bookings.txt", "a") as f:
+        for i in range(10000):
+            f.write(f"Username: late{i}, Room: 1, Name: Late Guest {i}, Phone: 8{i:09d}, Date: 2026-03-01\n")
+    elapsed = timed(lambda: storage.find_records("username", "late9999"))
+    print(f"  10000 appended records picked up by the next lookup in {elapsed * 1000:.0f} ms")
+    scan = timed(lambda: [r for r in storage.records("booking") if r["phone"] == phones[0]])
+    print(f"  (full log scan for one phone: {scan:.1f}s)")
+
+
+@benchmark("passwords")
+def bench_passwords(logins=40):
+    """KDF cost: logins per second per core, cold and cached"""
+    from concurrent.futures import ThreadPoolExecutor
+    import credentials
+    stored = [credentials.hash_password(f"pw{i}") for i in range(logins)]
+    cold = timed(lambda: [credentials._check(h, f"pw{i}") for i, h in enumerate(stored)])
+    cores = os.cpu_count() or 1
+    with ThreadPoolExecutor(cores * 4) as sessions:
+        pooled = timed(lambda: list(sessions.map(lambda i: credentials.verify_password(stored[i], f"pw{i}"),
+                                                 range(logins))))
+    cached = timed(lambda: [credentials.verify_password(h, f"pw{i}") for i, h in enumerate(stored)])
+    print(f"{credentials.KDF} {credentials._current_params()}")
+    print(f"  one core:            {logins / cold:8.1f} logins/s ({cold * 1000 / logins:.1f} ms each)")
+    print(f"  hash pool ({cores} cores): {logins / pooled:8.1f} logins/s")
+    print(f"  cached repeat login: {logins / cached:8.0f} logins/s")
+    record("cached_login", logins / cached, "/s")
+
+
+@benchmark("kitchen")
+def bench_kitchen(minutes=180, per_minute=2.0, chefs=36):
+    """Dinner-rush simulation: scheduler vs first-come-first-served"""
+    import datetime
+    import random
+    import kitchen
+    from catalog import get_catalog
+    rng = random.Random(11)
+    codes = list(get_catalog().items)
+    start = datetime.datetime(2026, 12, 24, 19, 0)
+    tickets, t = [], 0.0
+    while True:
+        t += rng.expovariate(per_minute)
+        if t >= minutes:
+            break
+        items = [(rng.choice(codes), rng.randint(1, 3)) for _ in range(rng.randint(1, 3))]
+        placed = start + datetime.timedelta(minutes=t)
+        promise = datetime.timedelta(minutes=rng.choice([30, 30, 45]))
+        tickets.append(kitchen.Ticket(str(len(tickets)), "guest", items, placed, placed + promise,
+                                      kitchen.prep_time(items)))
+    names = [f"chef{i}" for i in range(chefs)]
+    print(f"{len(tickets)} orders over {minutes} min, {chefs} chefs")
+    for label, queue in (("scheduler", kitchen.KitchenQueue()), ("fifo     ", kitchen.FifoQueue())):
+        begin = time.perf_counter()
+        plan = kitchen.schedule(tickets, names, start, queue)
+        elapsed = time.perf_counter() - begin
+        waits = sorted((s - t.placed).total_seconds() / 60 for t, _, s, _ in plan)
+        late = sum(1 for t, _, _, ready in plan if ready > t.promised)
+        span = (max(ready for *_, ready in plan) - start).total_seconds() / 3600
+        print(f"  {label}: avg wait {sum(waits) / len(waits):5.1f} min, p95 {waits[int(len(waits) * .95)]:5.1f} min, "
+              f"{late} late, {len(plan) / span:.0f} orders/h, planned in {elapsed * 1000:.1f} ms")
+    queue = kitchen.KitchenQueue()
+    ops = timed(lambda: [queue.push(t) for t in tickets * 20] and [queue.pop(start) for _ in tickets * 20])
+    print(f"  queue push+pop: {ops * 1e6 / (len(tickets) * 20):.2f} us/ticket")
+    record("queue_ticket", ops / (len(tickets) * 20), "s")
+
+
+@benchmark("venues")
+def bench_venues(years=5, occupancy=0.85, queries=2000):
+    """Several years of venue holds: first-free queries and new holds"""
+    import datetime
+    import random
+    import venues
+    from catalog import get_catalog
+    rng = random.Random(11)
+    first = datetime.date(2026, 1, 1)
+    days = (first.replace(year=first.year + years) - first).days
+    lines = []
+    for venue in get_catalog().venues:
+        for offset in range(days):
+            # December is close to fully booked
+            day = first + datetime.timedelta(days=offset)
+            if rng.random() < (0.98 if day.month == 12 else occupancy):
+                status = venues.CONFIRMED if rng.random() < 0.8 else venues.TENTATIVE
+                expires = "2099-01-01" if status == venues.TENTATIVE else ""
+                lines.append(f"{len(lines):x},{venue},{day.isoformat()},{status},guest,100,{expires}\n")
+    os.makedirs("data")
+    with open(os.path.join("data", venues.VENUES_FILE), "w") as f:
+        f.writelines(lines)
+    load = timed(venues.VenueCalendar, "data")
+    calendar = venues.VenueCalendar("data")
+    print(f"{len(lines)} holds over {years} years: loaded in {load:.3f}s")
+    decembers = [(datetime.date(first.year + y, 12, 1), datetime.date(first.year + y, 12, 31)) for y in range(years)]
+    halls = ("hall", "garden")
+
+    def indexed():
+        for i in range(queries):
+            start, end = decembers[i % years]
+            calendar.first_free(300, start, end, halls)
+
+    def scan():
+        # Walk every day and check every hold, as a plain list would
+        holds = list(calendar.holds.values())
+        for i in range(queries // 100):
+            start, end = decembers[i % years]
+            for venue in calendar.candidates(300, halls):
+                day = start
+                while day <= end and any(h.venue == venue.id and h.day == day for h in holds):
+                    day += datetime.timedelta(days=1)
+
+    fast = timed(indexed) / queries
+    slow = timed(scan) / (queries // 100)
+    print(f"  first free hall for 300 guests in December: {fast * 1e6:.1f} us indexed, "
+          f"{slow * 1e3:.1f} ms scanning ({slow / fast:.0f}x)")
+    record("first_free", fast, "s")
+    venue, day = calendar.first_free(300, *decembers[0], halls)
+    print(f"  December {first.year}: {venue.name} on {day.isoformat()}")
+    free = [(v, first + datetime.timedelta(days=o)) for v in calendar.venues for o in range(days)
+            if calendar.holder(v, first + datetime.timedelta(days=o)) is None][:500]
+    elapsed = timed(lambda: [calendar.hold(v, d, "bench", 10, venues.CONFIRMED) for v, d in free])
+    print(f"  {len(free)} new holds (checked and logged under the file lock): {elapsed * 1e6 / len(free):.0f} us/hold")
+
+
+@benchmark("flows")
+def bench_flows(scales=SCALES, calls=1000):
+    """The main flows, driven through services.py on a generated hotel per scale"""
+    import datetime
+    import random
+    import credentials
+    import datagen
+    import reports
+    import services
+    from storage import TextStorage
+    stored = credentials.hash_password(datagen.PASSWORD)
+    for scale in scales:
+        root = f"data{scale}"
+        generated = timed(datagen.generate, root, scale, 1, stored)
+        size = sum(os.path.getsize(os.path.join(root, f)) for f in os.listdir(root))
+        print(f"{scale} customers ({size / 1e6:.0f} MB) generated in {generated:.1f}s")
+        rng = random.Random(scale)
+        users = [f"user{rng.randrange(scale)}" for _ in range(calls)]
+        storage = TextStorage(root)
+        opened = timed(storage.find_user, "user0")  # parses the users files
+
+        def signups():
+            for username in users:
+                try:
+                    services.signup(storage, "user", username, "pw")
+                except services.ServiceError:
+                    pass  # "Username already exists", as intended
+
+        login = timed(lambda: [services.authenticate(storage, u, datagen.PASSWORD) for u in users]) / calls
+        duplicate = timed(signups) / calls
+        first_page = timed(services.user_page, storage, "user", None, None, 20)
+        cursor = services.user_page(storage, "user", None, None, 20)["cursor"]
+        next_page = timed(services.user_page, storage, "user", None, cursor, 20)
+        roster = timed(services.staff_by_position, storage)
+        print(f"  users files parsed {opened * 1000:.0f} ms; login {login * 1e6:.0f} us (KDF cached), "
+              f"duplicate signup {duplicate * 1e6:.0f} us")
+        print(f"  admin: first page {first_page * 1000:.1f} ms, next page {next_page * 1000:.2f} ms, "
+              f"staff by position {roster * 1000:.0f} ms")
+
+        inventory = timed(services.get_inventory, storage)
+        kitchen = timed(services.get_kitchen, storage)
+        start = datetime.date.today() + datetime.timedelta(days=400)
+        stays = [(start + datetime.timedelta(days=rng.randrange(300)), rng.randint(1, 5)) for _ in range(calls)]
+
+        def bookings():
+            for username, (day, room) in zip(users, stays):
+                try:
+                    services.book_room(storage, username, room, "Bench Guest", "9876543210", day.isoformat(),
+                                       (day + datetime.timedelta(days=2)).isoformat())
+                except services.ServiceError:
+                    pass  # that room type is full that week
+
+        book = timed(bookings) / calls
+        order = timed(lambda: [services.order_food(storage, u, [("pepsi", 2), ("veg-combo", 1)], "Bench Guest",
+                                                   "9876543210") for u in users[:calls // 10]]) / (calls // 10)
+        print(f"  history loaded: rooms {inventory * 1000:.0f} ms, kitchen {kitchen * 1000:.0f} ms; "
+              f"book room {book * 1e6:.0f} us, food order {order * 1e6:.0f} us")
+
+        phones = [f"9{int(u[4:]) * 7919 % 10 ** 9:09d}" for u in users[:100]]
+        indexed = timed(storage.find_records, "phone", phones[0])
+        search = timed(lambda: [storage.find_records("phone", p) for p in phones]) / len(phones)
+        report = timed(lambda: reports.summarize(reports.build_report(root)))
+        storage.close()
+        print(f"  search index built {indexed:.2f}s, phone search {search * 1e6:.0f} us; report {report:.2f}s")
+        for metric, value, unit in (("generate", generated, "s"), ("open", opened, "s"), ("login", login, "s"),
+                                    ("signup_duplicate", duplicate, "s"), ("admin_first_page", first_page, "s"),
+                                    ("admin_next_page", next_page, "s"), ("staff_by_position", roster, "s"),
+                                    ("inventory_load", inventory, "s"), ("kitchen_load", kitchen, "s"),
+                                    ("book_room", book, "s"), ("order_food", order, "s"),
+                                    ("search_index", indexed, "s"), ("search_phone", search, "s"),
+                                    ("report", report, "s")):
+            record(f"{metric}@{scale}", value, unit)
+
+
+@benchmark("batch")
+def bench_batch(bookings=20000, orders=20000, events=500):
+    """batch.py imports: bookings, food orders and events in bulk vs one write each"""
+    import datetime
+    import io
+    import random
+    import batch
+    import datagen
+    from catalog import get_catalog
+    from storage import SqliteStorage, TextStorage, migrate_text_to_sqlite
+    rng = random.Random(1)
+    codes = list(get_catalog().items)
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    guest = {"name": "Bench Guest", "phone": "9876543210"}
+    operations = {"bookings": [], "orders": [], "events": []}
+    for _ in range(bookings):
+        day = start + datetime.timedelta(days=rng.randrange(700))
+        operations["bookings"].append({"op": "book_room", "username": f"user{rng.randrange(1000)}",
+                                       "room": rng.randint(1, 5), "check_in": day.isoformat(),
+                                       "check_out": (day + datetime.timedelta(days=rng.randint(1, 3))).isoformat(),
+                                       **guest})
+    for _ in range(orders):
+        items = "; ".join(f"{rng.choice(codes)} x{rng.randint(1, 3)}" for _ in range(rng.randint(1, 4)))
+        operations["orders"].append({"op": "order_food", "username": f"user{rng.randrange(1000)}", "items": items,
+                                     "delivery": rng.choice(["yes", "no"]), **guest})
+    for _ in range(events):
+        day = start + datetime.timedelta(days=rng.randrange(1000))
+        operations["events"].append({"op": "book_event", "username": f"user{rng.randrange(1000)}",
+                                     "event": rng.randint(1, 5), "date": day.isoformat(),
+                                     "guests": rng.randint(10, 200), **guest})
+    for backend in ("text", "sqlite"):
+        for mode, chunk in (("single", 1), ("bulk", batch.CHUNK)):
+            root = f"{backend}-{mode}"
+            datagen.generate(root, 1000, password_hash="x")
+            if backend == "sqlite":
+                migrate_text_to_sqlite(root)
+                storage = SqliteStorage(os.path.join(root, "hotel.db"))
+            else:
+                storage = TextStorage(root)
+            storage.find_user("user0")
+            line = []
+            for kind, ops in operations.items():
+                out = io.StringIO()
+                seconds = timed(lambda: batch.run(storage, enumerate(ops, 1), out, chunk))
+                applied = out.getvalue().count('"ok": true')
+                line.append(f"{kind} {len(ops) / seconds:,.0f}/s ({applied} applied)")
+                record(f"{backend}_{mode}_{kind}", len(ops) / seconds, "/s")
+            storage.close()
+            print(f"  {backend:6} {mode:6} " + ", ".join(line))
+
+
+@benchmark("properties")
+def bench_properties(count=4, customers=20000, signups=200):
+    """Cross-property occupancy, revenue and guest stays, in-process vs on a process pool"""
+    import coordinator
+    import datagen
+    import services
+    from properties import UsernameIndex, property_root
+    from storage import open_storage
+    for i in range(count):
+        datagen.generate(property_root("data", f"p{i}"), customers, seed=i, password_hash="x", prefix=f"p{i}-")
+    indexed = timed(UsernameIndex("data").rebuild)
+    print(f"{count} properties of {customers} customers; username index rebuilt in {indexed:.2f}s")
+    year = (f"{time.localtime().tm_year - 1}-01-01", f"{time.localtime().tm_year}-01-01")
+    coordinator.update_search_indexes("data")
+    cores = os.cpu_count() or 1
+    for query, args in (("occupancy", year), ("revenue", year), ("stays", ("p0-user1",))):
+        run_query = {"occupancy": coordinator.occupancy, "revenue": coordinator.revenue,
+                     "stays": coordinator.guest_stays}[query]
+        serial = timed(lambda: run_query("data", *args, workers=1))
+        pooled = timed(lambda: run_query("data", *args, workers=count))
+        print(f"  {query:9} in-process {serial * 1000:.0f} ms, pool of {count} on {cores} cores {pooled * 1000:.0f} ms")
+        record(f"{query}_serial", serial, "s")
+        record(f"{query}_pool", pooled, "s")
+    storage = open_storage(root="data", property_id="p0")
+    signup = timed(lambda: [services.signup(storage, "user", f"new{i}", "pw") for i in range(signups)]) / signups
+    claim = timed(storage.usernames.claim, [f"other{i}" for i in range(signups)], "p1")
+    storage.close()
+    print(f"  signup with a global username claim {signup * 1000:.2f} ms (KDF included), "
+          f"claim alone {claim * 1e6 / signups:.0f} us")
+    record("signup", signup, "s")
+
+
+STARTUP_CHILD = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main
+imported = time.perf_counter()
+storage = main.open_data()  # what main() does before the first login
+import accounts
+accounts.ensure_admin(storage)
+assert storage.find_user(sys.argv[2])
+heavy = [name for name in ("services", "billing", "kitchen", "venues") if name in sys.modules]
+assert not heavy, f"loaded at startup: {heavy}"
+print(imported - start, time.perf_counter() - imported, flush=True)
+storage.close()
+"""
+STARTUP_BUDGET = 0.3  # seconds from launch to the first login lookup, with the users snapshot
+
+
+def _cold_start(child):
+    """(wall clock, import main, open storage to first lookup) seconds of one terminal process"""
+    start = time.perf_counter()
+    out = subprocess.run(child, check=True, capture_output=True, text=True).stdout
+    wall = time.perf_counter() - start
+    imported, lookup = (float(x) for x in out.split())
+    return wall, imported, lookup
+
+
+@benchmark("startup")
+def bench_startup(users=100000, runs=5):
+    """Terminal cold start: python -X importtime, then wall clock to the first login lookup"""
+    from userdir import SNAPSHOT_FILE
+    here = os.path.dirname(os.path.abspath(__file__))
+    write_user_files(users, users // 20)
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {here!r}); "
+                            "import main"], check=True, capture_output=True, text=True).stderr
+    imports = {}  # module imported by main itself -> cumulative seconds
+    for line in trace.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        if name.startswith("   ") and not name.startswith("    "):
+            imports[name.strip()] = int(cumulative) / 1e6
+        elif name.strip() == "main":
+            total = int(cumulative) / 1e6
+    print(f"import main {total * 1000:.1f} ms; slowest of its imports: " + ", ".join(
+        f"{name} {seconds * 1000:.1f}" for name, seconds in sorted(imports.items(), key=lambda i: -i[1])[:5]))
+    record("import_main", total, "s")
+    child = [sys.executable, "-c", STARTUP_CHILD, here, f"user{users - 1}"]
+    snapshot = os.path.join("data", SNAPSHOT_FILE)
+    cold = []
+    for _ in range(runs):
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+        cold.append(_cold_start(child))  # parses the users files, and saves the snapshot on close
+    warm = [_cold_start(child) for _ in range(runs)]
+    for label, times in (("parsing the users files", cold), ("from the users snapshot", warm)):
+        wall, imported, lookup = min(times)
+        print(f"  {label}: open to first lookup {lookup * 1000:7.2f} ms, import {imported * 1000:.1f} ms, "
+              f"process {wall * 1000:.0f} ms")
+    record("first_lookup_parsed", min(t[2] for t in cold), "s")
+    record("first_lookup", min(t[2] for t in warm), "s")
+    wall = min(t[0] for t in warm)
+    record("cold_start", wall, "s")
+    if wall > STARTUP_BUDGET:
+        raise SystemExit(f"cold start took {wall:.3f} s, over the {STARTUP_BUDGET} s budget")
+
+
+def run(names, scales=SCALES):
+    global _running
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Choose from {', '.join(BENCHMARKS)}")
+            continue
+        print(f"\n=== {name} ===")
+        _running = name
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                if name == "flows":
+                    BENCHMARKS[name](scales)
+                else:
+                    BENCHMARKS[name]()
+            finally:
+                os.chdir(cwd)
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def save_results(path):
+    with open(path, "w") as f:
+        json.dump({"commit": _commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(), "cpus": os.cpu_count(), "results": RESULTS}, f, indent=1)
+
+
+def compare(path, threshold):
+    """Print how each metric moved since the run saved in path; returns the regressions"""
+    with open(path) as f:
+        base = json.load(f)
+    print(f"\n=== compared with {base.get('commit') or path} ===")
+    regressions = []
+    for name, metrics in RESULTS.items():
+        for metric, (value, unit) in metrics.items():
+            old = base["results"].get(name, {}).get(metric)
+            if old is None or not old[0] or not value:
+                continue
+            # > 1 means worse, whichever way the unit points
+            ratio = old[0] / value if unit in HIGHER_IS_BETTER else value / old[0]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"  {name}.{metric}: {old[0]:.4g} -> {value:.4g} {unit} ({ratio:.2f}x){flag}")
+            if flag:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hotel benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--scale", help="customer counts for the flows benchmark, e.g. 1e3,1e5,1e7")
+    parser.add_argument("--json", help="save the recorded results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to check against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="how many times worse a metric may get before it counts as a regression")
+    args = parser.parse_args()
+    scales = tuple(int(float(x)) for x in args.scale.split(",")) if args.scale else SCALES
+    run(args.names, scales)
+    if args.json:
+        save_results(args.json)
+    if args.compare:
+        regressions = compare(args.compare, args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,244 @@
+"""Pricing and invoices for room bookings, food orders and events.
+
+Discount and delivery rules come from catalog.json:
+    - 10% off food orders above ₹1000
+    - 20% off birthday parties of 10 or more guests
+    - ₹50 delivery, only for food orders of at least ₹200
+
+batch_totals() prices every record in the logs at once for month-end
+billing. Each record is parsed in a plain Python loop into flat columns;
+only the arithmetic on those columns (line amounts, discounts, per-day
+sums) runs in NumPy when it is installed, or over the stdlib arrays
+otherwise. Parsing is most of the run time either way.
+
+Run: python billing.py [data_dir]
+"""
+import sys
+from array import array
+
+from catalog import get_catalog, rupees
+from inventory import parse_date
+from venues import closed_holds
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BillingError(Exception):
+    pass
+
+
+def parse_items(text):
+    """Parse 'veg-combo x2; pepsi x1' into [(code, quantity)]"""
+    items = []
+    for part in (text or "").split(";"):
+        code, _, quantity = part.strip().rpartition(" x")
+        if not code:
+            code, quantity = part.strip(), "1"
+        if code:
+            try:
+                items.append((code, int(quantity)))
+            except ValueError:
+                items.append((code, 1))
+    return items
+
+
+def format_items(items):
+    return "; ".join(f"{code} x{quantity}" for code, quantity in items)
+
+
+def _discount_rules(catalog):
+    order_rule = event_rule = None
+    for rule in catalog.discounts:
+        if "min_total" in rule:
+            order_rule = rule
+        elif "event" in rule:
+            event_rule = rule
+    return order_rule, event_rule
+
+
+def _invoice(lines, discounts=(), delivery=0):
+    subtotal = sum(line[3] for line in lines)
+    discount = sum(amount for _, amount in discounts)
+    return {
+        "lines": lines,
+        "subtotal": subtotal,
+        "discounts": list(discounts),
+        "delivery": delivery,
+        "total": round(subtotal - discount + delivery, 2),
+    }
+
+
+def price_food_order(items, delivery=False):
+    """Invoice for [(item code, quantity)]; raises BillingError if invalid"""
+    catalog = get_catalog()
+    if not items:
+        raise BillingError("Order has no items.")
+    lines = []
+    for code, quantity in items:
+        if code not in catalog.items:
+            raise BillingError(f"Unknown menu item: {code}")
+        if quantity <= 0:
+            raise BillingError(f"Quantity for {code} must be at least 1.")
+        unit = catalog.item_price(code)
+        lines.append((catalog.items[code].name, quantity, unit, unit * quantity))
+    subtotal = sum(line[3] for line in lines)
+    discounts = []
+    order_rule, _ = _discount_rules(catalog)
+    if order_rule and subtotal > order_rule["min_total"]:
+        discounts.append((order_rule["label"], round(subtotal * order_rule["percent"] / 100, 2)))
+    fee = 0
+    if delivery:
+        if subtotal < catalog.delivery["min_order"]:
+            raise BillingError(f"Delivery needs a minimum order of {rupees(catalog.delivery['min_order'])}.")
+        fee = catalog.delivery["fee"]
+    return _invoice(lines, discounts, fee)
+
+
+def price_booking(room, check_in, check_out):
+    catalog = get_catalog()
+    nights = (check_out - check_in).days
+    unit = catalog.room_price(room)
+    return _invoice([(f"{catalog.rooms[room].name} ({check_in} to {check_out})", nights, unit, unit * nights)])
+
+
+def price_event(event, guests):
+    catalog = get_catalog()
+    unit = catalog.event_price(event)
+    discounts = []
+    _, event_rule = _discount_rules(catalog)
+    if event_rule and event == event_rule["event"] and guests >= event_rule["min_guests"]:
+        discounts.append((event_rule["label"], round(unit * event_rule["percent"] / 100, 2)))
+    return _invoice([(f"{catalog.events[event].name} ({guests} guests)", 1, unit, unit)], discounts)
+
+
+def format_invoice(invoice):
+    lines = ["=====~INVOICE~====="]
+    for description, quantity, unit, amount in invoice["lines"]:
+        lines.append(f"{description} x{quantity} @ {rupees(unit)} = {rupees(amount)}")
+    lines.append(f"Subtotal: {rupees(invoice['subtotal'])}")
+    for label, amount in invoice["discounts"]:
+        lines.append(f"Discount ({label}): -{rupees(amount)}")
+    if invoice["delivery"]:
+        lines.append(f"Delivery: {rupees(invoice['delivery'])}")
+    lines.append(f"TOTAL: {rupees(invoice['total'])}")
+    return "\n".join(lines)
+
+
+# --- batch billing ---
+
+def _day_index(days, key):
+    index = days.get(key)
+    if index is None:
+        index = days[key] = len(days)
+    return index
+
+
+def _sum_by_day(day_ids, amounts, n_days):
+    if numpy is not None:
+        return numpy.bincount(numpy.frombuffer(day_ids, dtype=numpy.int32),
+                              weights=numpy.frombuffer(amounts, dtype=numpy.float64),
+                              minlength=n_days).tolist()
+    totals = [0.0] * n_days
+    for day, amount in zip(day_ids, amounts):
+        totals[day] += amount
+    return totals
+
+
+def _food_amounts(order_ids, prices, quantities, delivery, n_orders, order_rule, fee, min_order):
+    """Per-order totals from flat (order, price, quantity) item columns"""
+    if numpy is not None:
+        lines = numpy.frombuffer(prices, dtype=numpy.float64) * numpy.frombuffer(quantities, dtype=numpy.int32)
+        subtotal = numpy.bincount(numpy.frombuffer(order_ids, dtype=numpy.int32), weights=lines, minlength=n_orders)
+        total = subtotal.copy()
+        if order_rule:
+            total -= numpy.where(subtotal > order_rule["min_total"], subtotal * order_rule["percent"] / 100, 0)
+        wants = numpy.frombuffer(delivery, dtype=numpy.int8).astype(bool)
+        total += numpy.where(wants & (subtotal >= min_order), fee, 0)
+        return array("d", total.tolist())
+    subtotal = array("d", bytes(8 * n_orders))
+    for order, price, quantity in zip(order_ids, prices, quantities):
+        subtotal[order] += price * quantity
+    total = array("d", subtotal)
+    for i, amount in enumerate(subtotal):
+        if order_rule and amount > order_rule["min_total"]:
+            total[i] -= amount * order_rule["percent"] / 100
+        if delivery[i] and amount >= min_order:
+            total[i] += fee
+    return total
+
+
+def batch_totals(storage):
+    """Price every booking, food order and event in storage.
+
+    Returns {kind: {day: total}}; records without a date are billed under
+    'undated'. Records that cannot be priced are counted under 'skipped'.
+    Events whose venue hold was cancelled or has lapsed are not billed.
+    """
+    catalog = get_catalog()
+    order_rule, event_rule = _discount_rules(catalog)
+    result = {"skipped": 0}
+
+    days, day_ids, amounts = {}, array("i"), array("d")
+    for record in storage.records("booking"):
+        check_in, check_out = parse_date(record.get("date")), parse_date(record.get("checkout"))
+        try:
+            room = int(record.get("item", ""))
+            price = catalog.room_price(room)
+        except (ValueError, KeyError):
+            result["skipped"] += 1
+            continue
+        nights = (check_out - check_in).days if check_in and check_out else 1
+        day_ids.append(_day_index(days, record.get("date") or "undated"))
+        amounts.append(price * nights)
+    result["booking"] = dict(zip(days, _sum_by_day(day_ids, amounts, len(days))))
+
+    days, order_days = {}, array("i")
+    order_ids, prices, quantities, delivery = array("i"), array("d"), array("i"), array("b")
+    for record in storage.records("food"):
+        items = parse_items(record.get("items"))
+        if not items or any(code not in catalog.items for code, _ in items):
+            result["skipped"] += 1
+            continue
+        order = len(order_days)
+        for code, quantity in items:
+            order_ids.append(order)
+            prices.append(catalog.item_price(code))
+            quantities.append(quantity)
+        delivery.append(1 if record.get("delivery") == "yes" else 0)
+        order_days.append(_day_index(days, record.get("date") or "undated"))
+    totals = _food_amounts(order_ids, prices, quantities, delivery, len(order_days), order_rule,
+                           catalog.delivery["fee"], catalog.delivery["min_order"])
+    result["food"] = dict(zip(days, _sum_by_day(order_days, totals, len(days))))
+
+    days, day_ids, amounts = {}, array("i"), array("d")
+    closed = closed_holds(storage.root)
+    for record in storage.records("event"):
+        if record.get("hold") in closed:
+            continue
+        try:
+            event = int(record.get("item", ""))
+            price = catalog.event_price(event)
+            guests = int(record.get("guests") or 0)
+        except (ValueError, KeyError):
+            result["skipped"] += 1
+            continue
+        if event_rule and event == event_rule["event"] and guests >= event_rule["min_guests"]:
+            price -= price * event_rule["percent"] / 100
+        day_ids.append(_day_index(days, record.get("date") or "undated"))
+        amounts.append(price)
+    result["event"] = dict(zip(days, _sum_by_day(day_ids, amounts, len(days))))
+    return result
+
+
+if __name__ == "__main__":
+    from storage import open_storage
+    totals = batch_totals(open_storage(root=sys.argv[1] if len(sys.argv) > 1 else "data"))
+    for kind in ("booking", "food", "event"):
+        print(f"\n=== {kind} totals ===")
+        for day, total in sorted(totals[kind].items()):
+            print(f"{day}: {rupees(round(total, 2))}")
+        print(f"Total: {rupees(round(sum(totals[kind].values()), 2))}")
+    print(f"\nSkipped records: {totals['skipped']}")
@@ -0,0 +1,248 @@
+"""Room, menu and event catalog loaded from catalog.json.
+
+The catalog is parsed once into small __slots__ records. Every menu
+screen is rendered once into a single string and cached; show() writes
+it in one call. Editing catalog.json is picked up within CHECK_SECONDS;
+the file is not stat()ed more often than that, since bookings and
+orders look the catalog up several times each.
+"""
+import json
+import os
+import sys
+import time
+
+from userdir import file_stamp
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+CHECK_SECONDS = 1.0
+
+RULE = "~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~"
+
+
+def _amount(value):
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:,.2f}"
+    return f"{int(value):,}"
+
+
+def rupees(price_min, price_max=None):
+    if price_max is None or price_max == price_min:
+        return f"₹{_amount(price_min)}"
+    return f"₹{_amount(price_min)} - ₹{_amount(price_max)}"
+
+
+class Room:
+    __slots__ = ("number", "name", "price_min", "price_max", "count", "bed", "view", "amenities", "occupancy")
+
+    def __init__(self, data):
+        self.number = data["number"]
+        self.name = data["name"]
+        self.price_min, self.price_max = data["price"]
+        self.count = data["count"]
+        self.bed = data["bed"]
+        self.view = data["view"]
+        self.amenities = tuple(data["amenities"])
+        self.occupancy = data["occupancy"]
+
+
+class MenuItem:
+    __slots__ = ("code", "name", "category", "price_min", "price_max", "prep", "includes")
+
+    def __init__(self, data, category):
+        self.code = data["code"]
+        self.name = data["name"]
+        self.category = category
+        self.price_min, self.price_max = data["price"]
+        self.prep = data.get("prep", 10)  # minutes of kitchen time
+        self.includes = tuple(data.get("includes", ()))
+
+
+class FoodCategory:
+    __slots__ = ("number", "title", "label", "sections")
+
+    def __init__(self, data):
+        self.number = data["number"]
+        self.title = data["title"]
+        self.label = data["label"]
+        self.sections = tuple(
+            (section["title"], tuple(MenuItem(item, self.number) for item in section["items"]))
+            for section in data["sections"]
+        )
+
+    def items(self):
+        for _, items in self.sections:
+            yield from items
+
+
+class EventPackage:
+    __slots__ = ("number", "name", "price_min", "price_max", "venue_kinds", "features")
+
+    def __init__(self, data):
+        self.number = data["number"]
+        self.name = data["name"]
+        self.price_min, self.price_max = data["price"]
+        self.venue_kinds = tuple(data["venues"])
+        self.features = tuple(data["features"])
+
+
+class Venue:
+    __slots__ = ("id", "name", "kind", "capacity")
+
+    def __init__(self, data):
+        self.id = data["id"]
+        self.name = data["name"]
+        self.kind = data["kind"]
+        self.capacity = data["capacity"]
+
+
+class Catalog:
+    def __init__(self, data):
+        self.rooms = {r["number"]: Room(r) for r in data["rooms"]}
+        self.hotel_facilities = tuple(data["hotel_facilities"])
+        self.food = {c["number"]: FoodCategory(c) for c in data["food"]}
+        self.items = {item.code: item for category in self.food.values() for item in category.items()}
+        self.discounts = data["discounts"]
+        self.delivery = data["delivery"]
+        self.kitchen = data["kitchen"]
+        self.timing = tuple(data["timing"])
+        self.events = {e["number"]: EventPackage(e) for e in data["events"]}
+        self.venues = {v["id"]: Venue(v) for v in data["venues"]}
+        self.hold_days = data["hold_days"]  # how long a tentative hold lasts
+        self.event_pricing = tuple(data["event_pricing"])
+
+    @classmethod
+    def load(cls, path=CATALOG_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    # Price lookups. Ranged prices ("₹150-200") are quoted at the lower
+    # bound; the upper bound is the variant/portion surcharge ceiling.
+
+    def item_price(self, code):
+        return self.items[code].price_min
+
+    def room_price(self, number):
+        return self.rooms[number].price_min
+
+    def event_price(self, number):
+        return self.events[number].price_min
+
+
+# --- screens ---
+
+def render_rooms(catalog):
+    lines = ["", "=== Available Rooms ==="]
+    for room in catalog.rooms.values():
+        lines.append(f"{room.number}. {room.name} ({rupees(room.price_min, room.price_max)})")
+    return lines
+
+
+def render_room(catalog, number):
+    room = catalog.rooms[number]
+    lines = [
+        "=====~FACILITY~=====",
+        f"{room.name} ({rupees(room.price_min, room.price_max)})",
+        f"--Bed--: {room.bed}",
+        f"--View--: {room.view}",
+        " ~~~~~AMENITIES~~~~~ ",
+    ]
+    lines += [f"   {i}. {amenity}" for i, amenity in enumerate(room.amenities, 1)]
+    lines.append(f"   {len(room.amenities) + 1}.--occupancy--: {room.occupancy}")
+    lines += [RULE, "*****ADDITIONAL FACILITY******"]
+    lines += [f"!`````{facility}`````!" for facility in catalog.hotel_facilities]
+    lines.append("------------------------------------------------------------")
+    return lines
+
+
+def render_food_details(catalog):
+    lines = ["available  types of food  "]
+    lines += [f"{c.number}.{c.label}" for c in catalog.food.values()]
+    lines.append("__DISCOUNTS__")
+    lines += [d["label"] for d in catalog.discounts]
+    delivery = catalog.delivery
+    lines += [
+        "__DELIVERY__",
+        f"Available within {delivery['radius_km']} km radius",
+        f"Charges: {rupees(delivery['fee'])} (min order {rupees(delivery['min_order'])})",
+        "__TIMING__",
+    ]
+    lines += [f"- {timing}" for timing in catalog.timing]
+    return lines
+
+
+def render_food(catalog, number):
+    category = catalog.food[number]
+    lines = [f"===={category.title}===="]
+    for title, items in category.sections:
+        lines.append(f":-{title}-:")
+        for item in items:
+            lines.append(f"- {item.name} ({rupees(item.price_min, item.price_max)}) [{item.code}]")
+            lines += [f"    {i}.{name}" for i, name in enumerate(item.includes, 1)]
+        lines.append(":-----------------:")
+    return lines
+
+
+def render_event_details(catalog):
+    lines = ["******EVENT TYPES********"]
+    lines += [f"{e.number}.{e.name}" for e in catalog.events.values()]
+    lines.append("**********event pricing**********")
+    lines += [f" {pricing}" for pricing in catalog.event_pricing]
+    return lines
+
+
+def render_event(catalog, number):
+    event = catalog.events[number]
+    lines = [f"{event.name} ({rupees(event.price_min, event.price_max)})", "PROVIDE TO FACILITY OF ORGANIZATION"]
+    lines += list(event.features)
+    return lines
+
+
+RENDERERS = {
+    "rooms": render_rooms,
+    "room": render_room,
+    "food": render_food_details,
+    "food_type": render_food,
+    "events": render_event_details,
+    "event": render_event,
+}
+
+_state = {"path": CATALOG_FILE, "stamp": None, "checked": 0.0, "catalog": None, "screens": {}}
+
+
+def current_path():
+    return _state["path"]
+
+
+def use(path):
+    """Load the catalog from path from now on, e.g. a property's own catalog.json"""
+    if path != _state["path"]:
+        _state.update(path=path, stamp=None, checked=0.0, catalog=None, screens={})
+
+
+def get_catalog():
+    """The loaded catalog, reloaded (and screens dropped) if the file changed"""
+    now = time.monotonic()
+    if _state["catalog"] is not None and now - _state["checked"] < CHECK_SECONDS:
+        return _state["catalog"]
+    stamp = file_stamp(_state["path"])
+    if _state["catalog"] is None or stamp != _state["stamp"]:
+        _state["catalog"] = Catalog.load(_state["path"])
+        _state["stamp"] = stamp
+        _state["screens"] = {}
+    _state["checked"] = now
+    return _state["catalog"]
+
+
+def screen(name, *args):
+    """The rendered text of one screen, from the cache when possible"""
+    catalog = get_catalog()
+    key = (name,) + args
+    text = _state["screens"].get(key)
+    if text is None:
+        text = "\n".join(RENDERERS[name](catalog, *args)) + "\n"
+        _state["screens"][key] = text
+    return text
+
+
+def show(name, *args):
+    sys.stdout.write(screen(name, *args))
@@ -0,0 +1,225 @@
+"""Queries across every property, fanned out on a process pool.
+
+Run: python coordinator.py [--data data] [--workers N] [--json] occupancy START END
+     python coordinator.py ... revenue START END
+     python coordinator.py ... stays USERNAME
+     python coordinator.py ... list | reindex
+
+Each property's share of a query runs in a worker process that opens the
+property's data directory (with its own catalog) and returns a small
+summary; the coordinator merges the summaries. So the work is spread
+over the cores, and the answer for N properties costs about what the
+largest property costs.
+
+    occupancy   room-nights booked vs available between START and END
+    revenue     room, food and event sales dated between START and END
+    stays       a guest's room bookings at any property, newest first
+    reindex     rebuild the shared username index from the users files and
+                bring each property's search index up to date
+
+Queries only read the properties: the workers open them read-only, so
+they neither create files nor checkpoint a journal. stays uses a property's search index
+as far as it goes and indexes the rest in memory, so run reindex now and
+then to keep it quick.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import billing
+import catalog
+from inventory import parse_date
+from properties import UsernameIndex, data_root, list_properties
+from services import ServiceError
+from storage import TextStorage, open_storage
+from venues import closed_holds
+
+
+def _occupancy(storage, start, end):
+    start, end = parse_date(start), parse_date(end)
+    booked = Counter()
+    for record in storage.records("booking"):
+        check_in, check_out = parse_date(record.get("date")), parse_date(record.get("checkout"))
+        if check_in and check_out:
+            nights = (min(check_out, end) - max(check_in, start)).days
+            if nights > 0:
+                booked[str(record.get("item"))] += nights
+    days = (end - start).days
+    rooms = {room.name: {"booked": booked[str(number)], "capacity": room.count * days}
+             for number, room in catalog.get_catalog().rooms.items()}
+    return {"rooms": rooms, "booked": sum(r["booked"] for r in rooms.values()),
+            "capacity": sum(r["capacity"] for r in rooms.values())}
+
+
+def _price(kind, record):
+    if kind == "booking":
+        return billing.price_booking(int(record["item"]), parse_date(record["date"]),
+                                     parse_date(record["checkout"]))["total"]
+    if kind == "food":
+        return billing.price_food_order(billing.parse_items(record["items"]),
+                                        record.get("delivery") == "yes")["total"]
+    return billing.price_event(int(record["item"]), int(record["guests"]))["total"]
+
+
+def _revenue(storage, start, end):
+    totals = {"booking": 0, "food": 0, "event": 0}
+    skipped = 0
+    closed = closed_holds(storage.root)
+    for kind in totals:
+        for record in storage.records(kind):
+            if not start <= record.get("date", "") < end:  # ISO dates sort as text
+                continue
+            if kind == "event" and record.get("hold") in closed:
+                continue  # cancelled or lapsed
+            try:
+                totals[kind] += _price(kind, record)
+            except (KeyError, TypeError, ValueError, AttributeError, billing.BillingError):
+                skipped += 1  # old or damaged record
+    return {**totals, "total": sum(totals.values()), "skipped": skipped}
+
+
+def _stays(storage, username, limit):
+    # Read-only: a text property's search.idx is read if it is there, and
+    # whatever it lacks is indexed in memory
+    return [record for _, record in storage.find_records("username", username, limit, kinds=("booking",))]
+
+
+QUERIES = {"occupancy": _occupancy, "revenue": _revenue, "stays": _stays}
+
+
+def _run_query(job):
+    """(property id, result) of one query at one property; runs in a pool worker"""
+    root, property_id, query, args = job
+    previous = catalog.current_path()
+    storage = open_storage(root=root, property_id=property_id, read_only=True)
+    try:
+        return property_id, QUERIES[query](storage, *args)
+    finally:
+        storage.close()
+        catalog.use(previous)
+
+
+def fan_out(root, query, *args, workers=None):
+    """{property id: result} of query at every property under root"""
+    jobs = [(root, property_id, query, args) for property_id in list_properties(root)]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return dict(map(_run_query, jobs))
+    with ProcessPoolExecutor(workers) as pool:
+        return dict(pool.map(_run_query, jobs))
+
+
+def update_search_indexes(root):
+    """Bring the search index of every text property under root up to date"""
+    previous = catalog.current_path()
+    try:
+        for property_id in list_properties(root):
+            storage = open_storage(root=root, property_id=property_id)
+            try:
+                if isinstance(storage, TextStorage):
+                    storage.index.catch_up()  # saved on close
+            finally:
+                storage.close()
+    finally:
+        catalog.use(previous)
+
+
+def _period(start, end):
+    first, last = parse_date(start), parse_date(end)
+    if first is None or last is None or last <= first:
+        raise ServiceError("Give a start and end date (YYYY-MM-DD), the end after the start.")
+    return first.isoformat(), last.isoformat()
+
+
+def occupancy(root, start, end, workers=None):
+    """Room-nights booked and available in [start, end), per property and overall"""
+    per_property = fan_out(root, "occupancy", *_period(start, end), workers=workers)
+    booked = sum(p["booked"] for p in per_property.values())
+    capacity = sum(p["capacity"] for p in per_property.values())
+    return {"properties": per_property, "booked": booked, "capacity": capacity,
+            "rate": booked / capacity if capacity else 0.0}
+
+
+def revenue(root, start, end, workers=None):
+    """Sales dated in [start, end), per property and overall"""
+    per_property = fan_out(root, "revenue", *_period(start, end), workers=workers)
+    overall = Counter()
+    for totals in per_property.values():
+        overall.update(totals)
+    return {"properties": per_property, **{key: overall[key] for key in ("booking", "food", "event", "total",
+                                                                          "skipped")}}
+
+
+def guest_stays(root, username, limit=1000, workers=None):
+    """A guest's room bookings at every property, newest first"""
+    username = (username or "").strip()
+    if not username:
+        raise ServiceError("Enter a username.")
+    stays = [{"property": property_id, **record}
+             for property_id, records in fan_out(root, "stays", username, limit, workers=workers).items()
+             for record in records]
+    stays.sort(key=lambda stay: stay.get("date", ""), reverse=True)
+    return {"username": username, "home": UsernameIndex(root).owner(username), "stays": stays}
+
+
+def _print(query, result):
+    if query == "occupancy":
+        for property_id, row in result["properties"].items():
+            rate = row["booked"] / row["capacity"] if row["capacity"] else 0.0
+            print(f"{property_id}: {row['booked']} of {row['capacity']} room-nights ({rate:.1%})")
+        print(f"All properties: {result['booked']} of {result['capacity']} room-nights ({result['rate']:.1%})")
+    elif query == "revenue":
+        for property_id, row in result["properties"].items():
+            print(f"{property_id}: rooms {row['booking']:,.2f}, food {row['food']:,.2f}, "
+                  f"events {row['event']:,.2f}, total {row['total']:,.2f}")
+        print(f"All properties: {result['total']:,.2f} ({result['skipped']} records could not be priced)")
+    else:
+        print(f"{result['username']} (account at {result['home'] or 'no property'}): {len(result['stays'])} stays")
+        for stay in result["stays"]:
+            print(f"  [{stay['property']}] {stay.get('date', '')} to {stay.get('checkout', '')} "
+                  f"room {stay['item']} - {stay['name']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Occupancy, revenue and guest stays across properties")
+    parser.add_argument("query", choices=["occupancy", "revenue", "stays", "list", "reindex"])
+    parser.add_argument("args", nargs="*", help="START END for occupancy and revenue, USERNAME for stays")
+    parser.add_argument("--data", default=data_root(), help="root of the properties")
+    parser.add_argument("--workers", type=int, default=None, help="processes (1 = no pool)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+    if args.query == "list":
+        print("\n".join(list_properties(args.data)) or "No properties.")
+        return 0
+    if args.query == "reindex":
+        clashes = UsernameIndex(args.data).rebuild()
+        for username, owners in clashes:
+            print(f"{username} is at {', '.join(owners)}; kept for {owners[0]}")
+        print(f"Username index rebuilt, {len(clashes)} clashes.")
+        update_search_indexes(args.data)
+        print("Search indexes up to date.")
+        return 0
+    wanted = 1 if args.query == "stays" else 2
+    if len(args.args) != wanted:
+        parser.error(f"{args.query} takes {'USERNAME' if wanted == 1 else 'START END'}")
+    run = {"occupancy": occupancy, "revenue": revenue, "stays": guest_stays}[args.query]
+    start = time.perf_counter()
+    try:
+        result = run(args.data, *args.args, workers=args.workers)
+    except ServiceError as e:
+        print(e)
+        return 1
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print(args.query, result)
+        print(f"({len(list_properties(args.data))} properties in {time.perf_counter() - start:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
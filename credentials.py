@@ -0,0 +1,129 @@
+"""Salted password hashing and verification.
+
+Stored format (no commas, so it fits the users files):
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2$<iterations>$<salt>$<hash>
+Anything else is a legacy plaintext password; it still verifies, and
+needs_upgrade() tells the caller to store a proper hash. DISABLED_PASSWORD
+never verifies; it marks accounts (e.g. imported staff) with no password
+set yet.
+
+Cost is tuned with HOTEL_KDF (scrypt|pbkdf2), HOTEL_SCRYPT_N and
+HOTEL_PBKDF2_ITERATIONS. Hashing runs on a small thread pool (hashlib
+releases the GIL) bounded to the CPU count, so a burst of logins never
+takes more than the machine's cores. Successful checks are remembered
+in a small in-memory LRU so repeated logins skip the KDF.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+KDF = os.environ.get("HOTEL_KDF", "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2")
+SCRYPT_N = int(os.environ.get("HOTEL_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(os.environ.get("HOTEL_PBKDF2_ITERATIONS", 200000))
+SALT_BYTES = 16
+DISABLED_PASSWORD = "!"
+CACHE_SIZE = 4096
+
+_pool = None  # started by the first hash, so a client that never hashes never imports concurrent.futures
+_pool_lock = threading.Lock()
+
+# Keys are keyed digests of (stored hash, password) under a per-process
+# secret, so the cache never holds anything that works outside this process
+_cache_key = os.urandom(32)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="hotel-hash")
+        return _pool
+
+
+def _derive(kdf, params, password, salt):
+    if kdf == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+    (iterations,) = params
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def _current_params():
+    if KDF == "scrypt":
+        return (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return (PBKDF2_ITERATIONS,)
+
+
+def _parse(stored):
+    """(kdf, params, salt, hash) or None for a legacy plaintext password"""
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            return "scrypt", tuple(int(x) for x in parts[1:4]), _unb64(parts[4]), _unb64(parts[5])
+        if parts[0] == "pbkdf2" and len(parts) == 4:
+            return "pbkdf2", (int(parts[1]),), _unb64(parts[2]), _unb64(parts[3])
+    except ValueError:
+        pass
+    return None
+
+
+@metrics.timed("password.hash")
+def hash_password(password):
+    salt = os.urandom(SALT_BYTES)
+    params = _current_params()
+    digest = _hash_pool().submit(_derive, KDF, params, password, salt).result()
+    return "$".join([KDF, *(str(x) for x in params), _b64(salt), _b64(digest)])
+
+
+def needs_upgrade(stored):
+    """True for plaintext rows and hashes made with other cost settings"""
+    parsed = _parse(stored)
+    return parsed is None or parsed[0] != KDF or parsed[1] != _current_params()
+
+
+def _check(stored, password):
+    if stored == DISABLED_PASSWORD:
+        return False
+    parsed = _parse(stored)
+    if parsed is None:
+        return hmac.compare_digest(stored.encode(), password.encode())
+    kdf, params, salt, digest = parsed
+    return hmac.compare_digest(_derive(kdf, params, password, salt), digest)
+
+
+def verify_password(stored, password):
+    """Constant-time check of password against a stored hash (or plaintext)"""
+    key = hmac.new(_cache_key, f"{stored}\0{password}".encode(), hashlib.sha256).digest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            metrics.cache("password", True)
+            return True
+    metrics.cache("password", False)
+    if not _hash_pool().submit(_check, stored, password).result():
+        return False
+    with _cache_lock:
+        _cache[key] = True
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return True
+
@@ -0,0 +1,149 @@
+"""Synthetic hotel data for benchmarks and load tests.
+
+Run: python datagen.py [--data data] [--scale 100000] [--seed 1] [--property id]
+
+Writes admins, staff and customers plus booking, food order and event
+logs in the same formats the app writes: regulars who come back often,
+a few years of dates, and a skew towards popular rooms and dishes.
+--scale is the number of customers; staff and the logs are sized from
+it (see SHAPE), so 10**3 to 10**7 all give a plausible hotel. Every
+account's password is "password" (one shared hash, so generating ten
+million users does not take ten million KDF runs).
+
+Lines are streamed to disk in blocks, so memory stays flat at any scale.
+With --property the hotel is one property of several under --data (see
+properties.py): its usernames start with "<id>-" so they stay unique
+across properties, and the shared username index is rebuilt.
+"""
+import argparse
+import datetime
+import os
+import random
+
+import credentials
+from catalog import get_catalog
+from journal import JOURNAL_FILE
+from properties import UsernameIndex, property_root
+from search import INDEX_FILE
+from storage import RECORD_FILES, USER_FILES, format_record
+from userdir import SNAPSHOT_FILE
+
+POSITIONS = ["chef", "waiter", "receptionist", "housekeeper", "manager"]
+FIRST = ["Ravi", "Anita", "Sanjay", "Priya", "Amit", "Neha", "Rahul", "Pooja", "Arjun", "Kavya",
+         "Vikram", "Meera", "Rohan", "Divya", "Karan", "Sneha", "Aditya", "Isha", "Nikhil", "Tara"]
+LAST = ["Kumar", "Roy", "Sharma", "Das", "Gupta", "Singh", "Bose", "Iyer", "Nair", "Mehta",
+        "Rao", "Patel", "Shah", "Joshi", "Reddy", "Khan", "Sen", "Pillai", "Verma", "Ghosh"]
+# Records per customer in each log, and staff per customer
+SHAPE = {"staff": 0.05, "booking": 2.0, "food": 3.0, "event": 0.2}
+REGULARS = 0.05  # share of customers who come back again and again
+BLOCK = 50000
+PASSWORD = "password"
+
+
+def _write(path, lines):
+    with open(path, "w") as f:
+        block = []
+        for line in lines:
+            block.append(line)
+            if len(block) >= BLOCK:
+                f.writelines(block)
+                block = []
+        f.writelines(block)
+
+
+def _guest(rng, customers, prefix):
+    """(username, client name, phone) of a customer; half the records come from regulars"""
+    regulars = max(1, int(customers * REGULARS))
+    i = rng.randrange(regulars) if rng.random() < 0.5 else rng.randrange(customers)
+    return f"{prefix}user{i}", f"{FIRST[i % 20]} {LAST[i // 20 % 20]} {i}", f"9{i * 7919 % 10 ** 9:09d}"
+
+
+def _bookings(rng, customers, count, start, days, prefix):
+    rooms = list(get_catalog().rooms)
+    for _ in range(count):
+        username, name, phone = _guest(rng, customers, prefix)
+        check_in = start + datetime.timedelta(days=rng.randrange(days))
+        nights = 1 + int(rng.expovariate(0.5))
+        yield format_record("booking", {
+            "username": username, "item": rooms[min(int(rng.expovariate(0.6)), len(rooms) - 1)],
+            "name": name, "phone": phone, "date": check_in.isoformat(),
+            "checkout": (check_in + datetime.timedelta(days=nights)).isoformat()})
+
+
+def _food(rng, customers, count, start, days, prefix):
+    catalog = get_catalog()
+    codes = list(catalog.items)
+    minimum = catalog.delivery["min_order"]
+    for n in range(count):
+        username, name, phone = _guest(rng, customers, prefix)
+        items = [(codes[min(int(rng.expovariate(0.15)), len(codes) - 1)], rng.randint(1, 3))
+                 for _ in range(rng.randint(1, 4))]
+        # As the app would: delivery only for orders over the minimum
+        delivery = rng.random() < 0.3 and sum(catalog.item_price(c) * q for c, q in items) >= minimum
+        when = datetime.datetime.combine(start + datetime.timedelta(days=rng.randrange(days)),
+                                         datetime.time(rng.randrange(7, 23), rng.randrange(60)))
+        yield format_record("food", {
+            "username": username, "item": catalog.items[items[0][0]].category, "name": name, "phone": phone,
+            "date": when.date().isoformat(), "items": "; ".join(f"{c} x{q}" for c, q in items),
+            "delivery": "yes" if delivery else "no", "time": when.time().isoformat(timespec="seconds"),
+            "order_id": f"{n:08x}"})
+
+
+def _events(rng, customers, count, start, days, prefix):
+    catalog = get_catalog()
+    events = list(catalog.events)
+    for _ in range(count):
+        username, name, phone = _guest(rng, customers, prefix)
+        event = rng.choice(events)
+        kinds = catalog.events[event].venue_kinds
+        venue = rng.choice([v for v in catalog.venues.values() if v.kind in kinds])
+        yield format_record("event", {
+            "username": username, "item": event, "name": name, "phone": phone,
+            "date": (start + datetime.timedelta(days=rng.randrange(days))).isoformat(),
+            "guests": rng.randint(10, venue.capacity), "venue": venue.id})
+
+
+def generate(root="data", customers=100000, seed=1, password_hash=None, years=3, prefix=""):
+    """Fill root with a hotel of `customers` customers; returns the line count per file.
+
+    Every username starts with prefix.
+    """
+    os.makedirs(root, exist_ok=True)
+    for stale in (JOURNAL_FILE, INDEX_FILE, SNAPSHOT_FILE):  # they describe the files being replaced
+        if os.path.exists(os.path.join(root, stale)):
+            os.remove(os.path.join(root, stale))
+    rng = random.Random(seed)
+    stored = password_hash or credentials.hash_password(PASSWORD)
+    staff = max(5, int(customers * SHAPE["staff"]))
+    counts = {"admin": 3, "staff": staff, "user": customers}
+    _write(os.path.join(root, USER_FILES["admin"]), (f"{prefix}admin{i},{stored}\n" for i in range(3)))
+    _write(os.path.join(root, USER_FILES["staff"]),
+           (f"{prefix}staff{i},{stored},{POSITIONS[i % 5]}\n" for i in range(staff)))
+    _write(os.path.join(root, USER_FILES["user"]), (f"{prefix}user{i},{stored}\n" for i in range(customers)))
+    start = datetime.date.today() - datetime.timedelta(days=365 * years)
+    days = 365 * years
+    makers = {"booking": _bookings, "food": _food, "event": _events}
+    for kind, make in makers.items():
+        counts[kind] = int(customers * SHAPE[kind])
+        _write(os.path.join(root, RECORD_FILES[kind]), make(rng, customers, counts[kind], start, days, prefix))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic hotel data")
+    parser.add_argument("--data", default="data", help="data directory (existing files are replaced)")
+    parser.add_argument("--scale", type=float, default=100000, help="number of customers, e.g. 1e6")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--property", help="generate this property of several under --data")
+    args = parser.parse_args()
+    root, prefix = args.data, ""
+    if args.property:
+        root, prefix = property_root(args.data, args.property), f"{args.property}-"
+    counts = generate(root, int(args.scale), args.seed, prefix=prefix)
+    if args.property:
+        UsernameIndex(args.data).rebuild()
+    print(", ".join(f"{n} {kind}" for kind, n in counts.items()) + f" written to {root}")
+
+
+if __name__ == "__main__":
+    main()
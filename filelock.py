@@ -0,0 +1,143 @@
+"""Multi-process safe writes for the data files.
+
+Every data file gets a sidecar "<file>.lock" that is locked exclusively
+around each write, so several front-desk terminals can share one data
+directory. Full rewrites go to a temp file that is renamed over the
+original, so a reader (or a crash) never sees a half-written file.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# flock locks belong to the open file, so threads of one process each need
+# the in-process lock as well
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def locked(path):
+    """Hold the exclusive lock for path (creating its folder if needed)"""
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    with _thread_lock(path):
+        with open(path + ".lock", "a+") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+
+def append_lines(path, lines, sync=False):
+    """Append lines to path under its lock; fsync if sync is set"""
+    with locked(path):
+        with open(path, "a") as f:
+            f.writelines(lines)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def write_atomic(path, lines):
+    """Replace path with lines via write-temp-then-rename.
+
+    The caller should hold locked(path) if other writers may append.
+    """
+    import tempfile  # only rewrites need it; appends are the common case
+    folder = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class GroupCommitWriter:
+    """Batch appends from many threads into one locked write and one fsync.
+
+    append() blocks until its line is durable. While one batch is being
+    written and synced, new lines queue up and go out together in the
+    next batch, so the fsync cost is shared by everyone waiting.
+    """
+
+    def __init__(self, path, write=None):
+        self.path = path
+        self._write = write or append_lines  # write(path, lines, sync)
+        self._cond = threading.Condition()
+        self._pending = []
+        self._next_batch = 0  # batch number the pending lines will commit as
+        self._committed = -1
+        self._writing = False
+        self._failed = (None, None)  # (batch, error) of the last failed write
+
+    def append(self, line):
+        with self._cond:
+            self._pending.append(line)
+            batch = self._next_batch
+            while self._committed < batch:
+                if self._writing:
+                    self._cond.wait()
+                else:
+                    self._write_pending()
+            failed_batch, error = self._failed
+            if failed_batch == batch:
+                raise error
+
+    def _write_pending(self):
+        # Called with the condition held; released during the disk write
+        lines, self._pending = self._pending, []
+        batch = self._next_batch
+        self._next_batch += 1
+        self._writing = True
+        self._cond.release()
+        try:
+            self._write(self.path, lines, sync=True)
+        except OSError as e:
+            self._failed = (batch, e)
+        finally:
+            self._cond.acquire()
+            self._writing = False
+            self._committed = batch
+            self._cond.notify_all()
@@ -0,0 +1,130 @@
+"""Room inventory and per-night availability.
+
+Each room type keeps an array of booked-room counts, one slot per night.
+Checking a date range is a C-level max() over an array slice, so no query
+ever scans the booking history.
+"""
+import datetime
+from array import array
+from itertools import accumulate
+
+from catalog import get_catalog
+
+
+def parse_date(text):
+    """Parse YYYY-MM-DD, returning None if it is not a valid date"""
+    try:
+        return datetime.date.fromisoformat(text.strip())
+    except (ValueError, AttributeError):
+        return None
+
+
+class RoomInventory:
+    def __init__(self, counts=None):
+        # Rooms of each type; defaults to the counts in the catalog
+        self.counts = dict(counts or {n: room.count for n, room in get_catalog().rooms.items()})
+        self.base = None  # ordinal of the first night held in the arrays
+        self.nights = {room: array("i") for room in self.counts}
+        self.position = None  # how far into the bookings log the arrays are (see storage.records_since)
+
+    def _span(self, check_in, check_out):
+        """Array slice bounds for the nights check_in .. check_out - 1"""
+        start, end = check_in.toordinal(), check_out.toordinal()
+        if self.base is None:
+            self.base = start
+        if start < self.base:
+            pad = self.base - start
+            for room, nights in self.nights.items():
+                self.nights[room] = array("i", bytes(pad * nights.itemsize)) + nights
+            self.base = start
+        size = end - self.base
+        for nights in self.nights.values():
+            if len(nights) < size:
+                nights.frombytes(bytes((size - len(nights)) * nights.itemsize))
+        return start - self.base, end - self.base
+
+    def available(self, room, check_in, check_out):
+        """Number of rooms of this type free for every night of the stay"""
+        if room not in self.counts or check_out <= check_in:
+            return 0
+        if self.base is None:
+            return self.counts[room]
+        # Read-only: nights outside the arrays have nothing booked, so
+        # they are not added for a query
+        nights = self.nights[room]
+        start = max(check_in.toordinal() - self.base, 0)
+        end = min(check_out.toordinal() - self.base, len(nights))
+        return self.counts[room] - (max(nights[start:end]) if start < end else 0)
+
+    def free_rooms(self, check_in, check_out):
+        """{room type: rooms free} for the whole stay"""
+        return {room: self.available(room, check_in, check_out) for room in self.counts}
+
+    def _take(self, room, check_in, check_out):
+        start, end = self._span(check_in, check_out)
+        nights = self.nights[room]
+        for night in range(start, end):
+            nights[night] += 1
+
+    def reserve(self, room, check_in, check_out):
+        """Take one room for the stay; False if any night is full"""
+        if self.available(room, check_in, check_out) <= 0:
+            return False
+        self._take(room, check_in, check_out)
+        return True
+
+    def release(self, room, check_in, check_out):
+        start, end = self._span(check_in, check_out)
+        nights = self.nights[room]
+        for night in range(start, end):
+            nights[night] = max(0, nights[night] - 1)
+
+    def _stays(self, bookings):
+        """(room, check-in, check-out) of each booking record with a valid stay.
+
+        Records without valid dates (bookings made before dates were
+        recorded) are skipped.
+        """
+        for record in bookings:
+            try:
+                room = int(record.get("item", ""))
+            except ValueError:
+                continue
+            check_in = parse_date(record.get("date"))
+            check_out = parse_date(record.get("checkout"))
+            if room in self.counts and check_in and check_out and check_out > check_in:
+                yield room, check_in, check_out
+
+    def add_bookings(self, bookings):
+        """Count booking records written since the arrays were built, e.g. by another process"""
+        for room, check_in, check_out in self._stays(bookings):
+            self._take(room, check_in, check_out)
+
+    @classmethod
+    def from_bookings(cls, bookings, counts=None):
+        """Build the occupancy arrays from booking records in one pass.
+
+        Uses a difference array (+1 at check-in, -1 at check-out) and a
+        single running sum per room type, so a history of n bookings costs
+        O(n + nights) rather than O(n * nights).
+        """
+        inventory = cls(counts)
+        stays = []
+        first, last = None, None
+        for room, check_in, check_out in inventory._stays(bookings):
+            start, end = check_in.toordinal(), check_out.toordinal()
+            stays.append((room, start, end))
+            first = start if first is None else min(first, start)
+            last = end if last is None else max(last, end)
+        if first is None:
+            return inventory
+        size = last - first + 1
+        diffs = {room: [0] * size for room in inventory.counts}
+        for room, start, end in stays:
+            diff = diffs[room]
+            diff[start - first] += 1
+            diff[end - first] -= 1
+        inventory.base = first
+        for room, diff in diffs.items():
+            inventory.nights[room] = array("i", accumulate(diff[:-1]))
+        return inventory
@@ -0,0 +1,236 @@
+"""Write-ahead journal under the text storage files.
+
+Every append to a users file or a record log is first written to
+data/journal.wal as one checksummed frame, and only then to the file:
+
+    <crc32 of payload, 8 hex digits> <payload length> <JSON payload>\\n
+    payload: {"file": "bookings.txt", "offset": <file size before>, "data": "..."}
+
+A frame that fails its checksum or is cut short is the torn tail of a
+write that never finished (and was never acknowledged); reading stops
+there. Atomic rewrites of a file (compaction, password changes) log
+{"file": ..., "replaced": true} so older frames for it are ignored.
+
+A checkpoint takes every file's lock, replays the journal and empties
+it. Replay is idempotent, using the recorded offsets:
+    - file already at or past offset + len(data): applied, skip
+    - file shorter than offset: rewritten since, skip
+    - file ends part-way through data: truncate to offset, write data
+So whatever was logged is in the files afterwards, and a torn line at
+the end of a file is completed or cut off. Checkpoints run when a
+journal is opened (crash recovery), and from a background thread once
+the journal passes CHECKPOINT_BYTES or every CHECKPOINT_SECONDS; that
+bounds the work recovery ever has to do.
+
+HOTEL_CRASH_AT=<point> (wal-torn, wal, target-torn, target) with
+HOTEL_CRASH_AFTER=<n> kills the process at that point of the n-th
+write; tests/test_crash.py and bench.py crash use it for fault injection.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+
+import metrics
+from filelock import locked
+
+JOURNAL_FILE = "journal.wal"
+CHECKPOINT_BYTES = 4 * 1024 * 1024
+CHECKPOINT_SECONDS = 30.0
+
+OPEN_FLAGS = getattr(os, "O_BINARY", 0)  # no newline translation on Windows
+
+CRASH_AT = os.environ.get("HOTEL_CRASH_AT")
+CRASH_AFTER = int(os.environ.get("HOTEL_CRASH_AFTER", "1"))
+_writes = 0
+
+
+def _crash(point):
+    if CRASH_AT == point and _writes >= CRASH_AFTER:
+        os._exit(70)
+
+
+def encode_frame(payload):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return b"%08x %d " % (zlib.crc32(body), len(body)) + body + b"\n"
+
+
+def read_frames(path):
+    """Valid payloads from the start of a journal, up to the first bad frame"""
+    frames = []
+    if not os.path.exists(path):
+        return frames
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                crc, length, body = raw.rstrip(b"\n").split(b" ", 2)
+                if not raw.endswith(b"\n") or int(length) != len(body) or int(crc, 16) != zlib.crc32(body):
+                    break
+                frames.append(json.loads(body))
+            except ValueError:
+                break
+    return frames
+
+
+def _read_at(fd, size, offset):
+    # os.pread is POSIX-only; the O_APPEND writes ignore the seek
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _last_line_end(fd, size):
+    """Offset just past the last newline in the first size bytes of fd"""
+    end = size
+    while end > 0:
+        start = max(0, end - 65536)
+        newline = _read_at(fd, end - start, start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+class Journal:
+    """The write-ahead journal for one data directory"""
+
+    def __init__(self, root, files, background=True):
+        self.root = root
+        self.files = sorted(files)  # names relative to root, locked in this order
+        self.path = os.path.join(root, JOURNAL_FILE)
+        self.last_recovery = None  # (seconds, frames) of the checkpoint at open
+        self._wake = threading.Event()
+        self._closed = False
+        os.makedirs(root, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | OPEN_FLAGS, 0o644)
+        start = time.perf_counter()
+        frames = self.checkpoint()
+        self.last_recovery = (time.perf_counter() - start, frames)
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="hotel-journal", daemon=True)
+            self._thread.start()
+
+    def _log(self, payload, sync):
+        frame = encode_frame(payload)
+        if CRASH_AT == "wal-torn" and _writes >= CRASH_AFTER:
+            os.write(self._fd, frame[:len(frame) // 2])
+            _crash("wal-torn")
+        # One O_APPEND write per frame, so frames from several processes
+        # never interleave; a checkpoint holds every file lock, so no
+        # frame can be logged while it empties the journal
+        os.write(self._fd, frame)
+        if sync:
+            os.fsync(self._fd)
+        if metrics.enabled:
+            metrics.count("file_bytes", len(frame), file=JOURNAL_FILE, op="write")
+        if os.fstat(self._fd).st_size >= CHECKPOINT_BYTES:
+            self._wake.set()
+
+    def write(self, path, lines, sync=False):
+        """Append lines to path through the journal; the caller holds locked(path)"""
+        global _writes
+        _writes += 1
+        text = "".join(lines)
+        data = text.encode()
+        fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT | OPEN_FLAGS, 0o644)
+        try:
+            offset = os.fstat(fd).st_size
+            if offset and _read_at(fd, 1, offset - 1) != b"\n":
+                # Torn line from a writer that died mid-append: it was
+                # never acknowledged, so cut it off
+                offset = _last_line_end(fd, offset)
+                os.ftruncate(fd, offset)
+            self._log({"file": os.path.relpath(path, self.root), "offset": offset, "data": text}, sync)
+            _crash("wal")
+            if CRASH_AT == "target-torn" and _writes >= CRASH_AFTER:
+                os.write(fd, data[:len(data) // 2])
+                _crash("target-torn")
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        if metrics.enabled:
+            metrics.count("file_bytes", len(data), file=os.path.basename(path), op="write")
+        _crash("target")
+
+    def append(self, path, lines, sync=False):
+        with locked(path):
+            self.write(path, lines, sync)
+
+    def replaced(self, path):
+        """Record that path was atomically rewritten; the caller holds locked(path)"""
+        self._log({"file": os.path.relpath(path, self.root), "replaced": True}, True)
+
+    def checkpoint(self):
+        """Replay the journal into the files, sync them and empty the journal.
+
+        Returns the number of frames replayed.
+        """
+        held = []
+        try:
+            for name in self.files:
+                lock = locked(os.path.join(self.root, name))
+                lock.__enter__()
+                held.append(lock)
+            with locked(self.path):  # against other processes' checkpoints
+                frames = read_frames(self.path)
+                last_replace = {}
+                for i, frame in enumerate(frames):
+                    if frame.get("replaced"):
+                        last_replace[frame["file"]] = i
+                handles = {}  # file -> open file, kept for the whole replay
+                try:
+                    for i, frame in enumerate(frames):
+                        if frame.get("replaced") or i < last_replace.get(frame["file"], -1):
+                            continue
+                        self._redo(frame, handles)
+                    for f in handles.values():
+                        f.flush()
+                        os.fsync(f.fileno())
+                finally:
+                    for f in handles.values():
+                        f.close()
+                if os.fstat(self._fd).st_size:
+                    os.ftruncate(self._fd, 0)
+                    os.fsync(self._fd)
+                return len(frames)
+        finally:
+            for lock in reversed(held):
+                lock.__exit__(None, None, None)
+
+    def _redo(self, frame, handles):
+        f = handles.get(frame["file"])
+        if f is None:
+            path = os.path.join(self.root, frame["file"])
+            f = handles[frame["file"]] = open(path, "rb+" if os.path.exists(path) else "wb+")
+        data = frame["data"].encode()
+        offset = frame["offset"]
+        size = f.seek(0, os.SEEK_END)
+        if size >= offset + len(data) or size < offset:
+            return  # applied, or the file was rewritten since
+        f.seek(offset)
+        if not data.startswith(f.read()):
+            return  # other writes followed a write that never finished
+        f.seek(offset)
+        f.truncate()
+        f.write(data)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(CHECKPOINT_SECONDS)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                if os.fstat(self._fd).st_size:
+                    self.checkpoint()
+            except OSError:
+                pass  # try again next round
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.checkpoint()
+        os.close(self._fd)
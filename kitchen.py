@@ -0,0 +1,258 @@
+"""Kitchen queue and chef scheduling for food orders.
+
+Every food order becomes a ticket with a promised time (from the
+catalog's kitchen settings) and a prep time (the sum of its dishes' prep
+minutes). When a chef is free they take the next ticket:
+    - a ticket that must start within URGENT_WINDOW to keep its promise
+      goes first (earliest latest-start time), otherwise
+    - the shortest ticket goes first, which keeps average wait lowest.
+Tickets that can no longer make their promise are not "urgent" any more
+and just wait their turn by prep time. Both orders are kept as heaps, so
+taking a ticket is O(log n).
+
+Finished tickets are logged to kitchen.txt in the data directory, one
+line per order: <order id>,done,<chef>,<time>.
+"""
+import datetime
+import heapq
+import itertools
+import os
+import threading
+
+from billing import parse_items
+from catalog import get_catalog
+from filelock import append_lines
+from inventory import parse_date
+
+KITCHEN_FILE = "kitchen.txt"
+URGENT_WINDOW = datetime.timedelta(minutes=5)
+
+
+class Ticket:
+    __slots__ = ("order_id", "username", "items", "placed", "promised", "prep")
+
+    def __init__(self, order_id, username, items, placed, promised, prep):
+        self.order_id = order_id
+        self.username = username
+        self.items = items
+        self.placed = placed
+        self.promised = promised
+        self.prep = prep  # datetime.timedelta
+
+    @property
+    def latest_start(self):
+        return self.promised - self.prep
+
+
+def prep_time(items):
+    """Kitchen time for an order; several portions of a dish cook together"""
+    catalog = get_catalog()
+    minutes = sum(catalog.items[code].prep if code in catalog.items else 10 for code in {code for code, _ in items})
+    return datetime.timedelta(minutes=minutes)
+
+
+def ticket_from_record(record):
+    """Build a ticket from a food order record, or None for old records"""
+    day = parse_date(record.get("date"))
+    items = parse_items(record.get("items"))
+    if not day or not items or not record.get("order_id") or not record.get("time"):
+        return None
+    try:
+        placed = datetime.datetime.combine(day, datetime.time.fromisoformat(record["time"]))
+    except ValueError:
+        return None
+    settings = get_catalog().kitchen
+    minutes = settings["delivery_promise_minutes"] if record.get("delivery") == "yes" else settings["promise_minutes"]
+    return Ticket(record["order_id"], record.get("username"), items, placed,
+                  placed + datetime.timedelta(minutes=minutes), prep_time(items))
+
+
+class KitchenQueue:
+    """Pending tickets, keyed by promised time and by prep duration"""
+
+    def __init__(self):
+        self._live = {}  # seq -> ticket still waiting
+        self._by_deadline = []  # (latest start, seq); stale once seq leaves _live
+        self._by_prep = []  # (prep, promised, seq)
+        self._count = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._live)
+
+    def push(self, ticket):
+        with self.lock:
+            seq = next(self._count)
+            self._live[seq] = ticket
+            heapq.heappush(self._by_deadline, (ticket.latest_start, seq))
+            heapq.heappush(self._by_prep, (ticket.prep, ticket.promised, seq))
+
+    def pop(self, now):
+        """The ticket a chef who is free at `now` should cook next"""
+        with self.lock:
+            if not self._live:
+                return None
+            deadlines = self._by_deadline
+            # Drop taken tickets and ones already too late to save
+            while deadlines and (deadlines[0][1] not in self._live or deadlines[0][0] < now):
+                heapq.heappop(deadlines)
+            if deadlines and deadlines[0][0] <= now + URGENT_WINDOW:
+                seq = heapq.heappop(deadlines)[1]
+            else:
+                while self._by_prep[0][-1] not in self._live:
+                    heapq.heappop(self._by_prep)
+                seq = heapq.heappop(self._by_prep)[-1]
+            return self._live.pop(seq)
+
+    def remove(self, order_id):
+        with self.lock:
+            for seq, ticket in self._live.items():
+                if ticket.order_id == order_id:
+                    del self._live[seq]
+                    return True
+        return False
+
+    def tickets(self):
+        with self.lock:
+            return list(self._live.values())
+
+
+def schedule(tickets, chefs, start, queue=None):
+    """Plan who cooks what: [(ticket, chef, start, ready)] in start order.
+
+    Tickets are released into the queue as they are placed; whenever a
+    chef frees up they take queue.pop(). Pass queue=FifoQueue() to
+    compare against first-come-first-served.
+    """
+    if not chefs:
+        return []
+    queue = queue if queue is not None else KitchenQueue()
+    arrivals = sorted(tickets, key=lambda t: t.placed)
+    free = [(start, chef) for chef in sorted(chefs)]
+    heapq.heapify(free)
+    plan = []
+    i = 0
+    while i < len(arrivals) or len(queue):
+        now, chef = heapq.heappop(free)
+        if not len(queue) and arrivals[i].placed > now:
+            now = arrivals[i].placed  # kitchen idle until the next order
+        while i < len(arrivals) and arrivals[i].placed <= now:
+            queue.push(arrivals[i])
+            i += 1
+        ticket = queue.pop(now)
+        ready = now + ticket.prep
+        plan.append((ticket, chef, now, ready))
+        heapq.heappush(free, (ready, chef))
+    return plan
+
+
+class FifoQueue:
+    """First-come-first-served queue with the KitchenQueue interface"""
+
+    def __init__(self):
+        self._heap = []
+        self._count = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, ticket):
+        heapq.heappush(self._heap, (ticket.placed, next(self._count), ticket))
+
+    def pop(self, now):
+        return heapq.heappop(self._heap)[-1] if self._heap else None
+
+
+class Kitchen:
+    """Today's open tickets for one data directory.
+
+    Other processes take orders and mark them done too, so plan() and
+    complete() first read whatever was appended to the food log and
+    kitchen.txt since the last look, and drop tickets left from an
+    earlier day.
+    """
+
+    def __init__(self, storage, root):
+        self.storage = storage
+        self.path = os.path.join(root, KITCHEN_FILE)
+        self.lock = threading.Lock()
+        self.queue = KitchenQueue()
+        self.day = datetime.date.today()
+        self.done = set()  # order ids logged as done
+        self.seen = set()  # order ids queued or done, so no order is queued twice
+        self.food_position = None  # see storage.records_since
+        self.done_offset = 0  # bytes of kitchen.txt read
+        self.refresh()
+
+    def refresh(self):
+        """Catch up with orders and completions logged since the last call"""
+        with self.lock:
+            today = datetime.date.today()
+            if today != self.day:
+                old = self.queue
+                self.queue, self.day = KitchenQueue(), today
+                self.done, self.seen = set(), set()
+                for ticket in old.tickets():
+                    if ticket.placed.date() == today:
+                        self.queue.push(ticket)
+                        self.seen.add(ticket.order_id)
+            for order_id in self._read_done():
+                self.done.add(order_id)
+                self.seen.add(order_id)
+                self.queue.remove(order_id)
+            records, end = self.storage.records_since("food", self.food_position)
+            if records is None:  # the food log was rewritten: queue it again
+                self.queue, self.seen = KitchenQueue(), set(self.done)
+                records, end = self.storage.records_since("food")
+            today = today.isoformat()
+            for record in records:
+                if record.get("date") == today and record.get("order_id") not in self.seen:
+                    ticket = ticket_from_record(record)
+                    if ticket:
+                        self._push(ticket)
+            self.food_position = end
+
+    def _read_done(self):
+        """Order ids in the lines appended to kitchen.txt since the last read"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            if f.seek(0, os.SEEK_END) < self.done_offset:
+                self.done_offset = 0  # rewritten
+            f.seek(self.done_offset)
+            done = []
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # a line still being written
+                self.done_offset += len(raw)
+                if raw.strip():
+                    done.append(raw.decode("utf-8", errors="replace").split(",")[0])
+            return done
+
+    def chefs(self):
+        return [u for u, _ in self.storage.each_user("staff", "chef")]
+
+    def _push(self, ticket):
+        # Caller holds self.lock
+        if ticket.order_id not in self.seen:
+            self.seen.add(ticket.order_id)
+            self.queue.push(ticket)
+
+    def add(self, record):
+        ticket = ticket_from_record(record)
+        if ticket:
+            with self.lock:
+                self._push(ticket)
+        return ticket
+
+    def plan(self, now=None):
+        self.refresh()
+        return schedule(self.queue.tickets(), self.chefs(), now or datetime.datetime.now(), KitchenQueue())
+
+    def complete(self, order_id, chef):
+        """Take an order off the queue and log it as done; False if unknown"""
+        self.refresh()
+        if not self.queue.remove(order_id):
+            return False
+        append_lines(self.path, [f"{order_id},done,{chef},{datetime.datetime.now().isoformat(timespec='seconds')}\n"])
+        return True
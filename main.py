@@ -1,509 +1,589 @@
-import os
-from getpass import getpass
-import datetime
-
-# File paths
-ADMIN_FILE = "data/admins.txt"
-STAFF_FILE = "data/staff.txt"
-USERS_FILE = "data/users.txt"
-
-def ensure_data_directory():
-    """Create data directory if it doesn't exist"""
-    if not os.path.exists("data"):
-        os.makedirs("data")
-
-def load_users(file_path):
-    if not os.path.exists(file_path):
-        return {}
-    users = {}
-    with open(file_path, "r") as f:
-        for line in f:
-            if line.strip():  # Skip empty lines
-                parts = line.strip().split(",")
-                if file_path == STAFF_FILE and len(parts) >= 3:
-                    username, password, position = parts[:3]
-                    users[username] = {"password": password, "position": position}
-                elif len(parts) >= 2:  # admin and regular users
-                    username, password = parts[:2]
-                    users[username] = {"password": password}
-    return users
-
-def save_user(username, password, file_path, position=None):
-    ensure_data_directory()  # Ensure directory exists before saving
-    with open(file_path, "a") as f:
-        if file_path == STAFF_FILE:
-            f.write(f"{username},{password},{position}\n")
-        else:  # admin and regular users
-            f.write(f"{username},{password}\n")
-
-def signup():
-    print("\n=== Sign Up ===")
-    print("1. Sign up as Staff")
-    print("2. Sign up as Customer")
-    choice = input("Enter choice (1-2): ")
-    
-    if choice not in ["1", "2"]:
-        print("Invalid choice. Please select 1 or 2.")
-        return
-        
-    while True:
-        username = input("Enter username: ").strip()
-        if not username:
-            print("Username cannot be empty.")
-            continue
-            
-        # Check all files for existing username
-        all_users = {}
-        all_users.update(load_users(ADMIN_FILE))
-        all_users.update(load_users(STAFF_FILE))
-        all_users.update(load_users(USERS_FILE))
-        
-        if username in all_users:
-            print("Username already exists. Please choose another.")
-            continue
-            
-        password = getpass("Enter password: ")
-        if not password:
-            print("Password cannot be empty.")
-            continue
-            
-        confirm_password = getpass("Confirm password: ")
-        
-        if password != confirm_password:
-            print("Passwords don't match. Try again.")
-            continue
-        
-        if choice == "1":  # Staff signup
-            position = input("Enter position (chef/waiter/receptionist/housekeeper/manager): ").lower().strip()
-            while position not in ["chef", "waiter", "receptionist", "housekeeper", "manager"]:
-                print("Invalid position. Please enter 'chef', 'waiter', 'receptionist', 'housekeeper', or 'manager'.")
-                position = input("Enter position (chef/waiter/receptionist/housekeeper/manager): ").lower().strip()
-            save_user(username, password, STAFF_FILE, position)
-        else:  # Customer signup
-            save_user(username, password, USERS_FILE)
-            
-        print("Signup successful!")
-        break
-
-def login():
-    print("\n=== Login ===")
-    username = input("Enter username: ").strip()
-    if not username:
-        print("Username cannot be empty.")
-        return None
-        
-    password = getpass("Enter password: ")
-    if not password:
-        print("Password cannot be empty.")
-        return None
-    
-    # Check admin file first
-    admins = load_users(ADMIN_FILE)
-    if username in admins:
-        if admins[username]["password"] == password:
-            return {"username": username, "role": "admin"}
-        else:
-            print("Incorrect password.")
-            return None
-    
-    # Check staff file
-    staff = load_users(STAFF_FILE)
-    if username in staff:
-        if staff[username]["password"] == password:
-            return {"username": username, "role": "staff", "position": staff[username]["position"]}
-        else:
-            print("Incorrect password.")
-            return None
-    
-    # Check regular users file
-    users = load_users(USERS_FILE)
-    if username in users:
-        if users[username]["password"] == password:
-            return {"username": username, "role": "user"}
-        else:
-            print("Incorrect password.")
-            return None
-    
-    print("Username not found.")
-    return None
-
-def admin_menu():
-    while True:
-        print("\n=== Admin Menu ===")
-        print("1. View all users")
-        print("2. Make user admin")
-        print("3. Delete user")
-        print("4. View staff by position")
-        print("5. Update staff position")
-        print("6. Logout")
-        
-        choice = input("Enter choice (1-6): ")
-        
-        if choice == "1":
-            print("\nAdmins:")
-            for username in load_users(ADMIN_FILE):
-                print(f"Username: {username} (Admin)")
-                
-            print("\nStaff:")
-            for username, data in load_users(STAFF_FILE).items():
-                print(f"Username: {username}, Position: {data['position']}")
-                
-            print("\nUsers:")
-            for username in load_users(USERS_FILE):
-                print(f"Username: {username} (User)")
-        
-        elif choice == "4":
-            staff = load_users(STAFF_FILE)
-            positions = ["chef", "waiter", "receptionist", "housekeeper", "manager"]
-            
-            for position in positions:
-                print(f"\n{position.title()}s:")
-                for username, data in staff.items():
-                    if data['position'] == position:
-                        print(f"Username: {username}")
-        
-        elif choice == "5":
-            username = input("Enter staff username to update position: ").strip()
-            staff = load_users(STAFF_FILE)
-            if username in staff:
-                new_position = input("Enter new position (chef/waiter/receptionist/housekeeper/manager): ").lower().strip()
-                if new_position in ["chef", "waiter", "receptionist", "housekeeper", "manager"]:
-                    with open(STAFF_FILE, "w") as f:
-                        for user, data in staff.items():
-                            position = new_position if user == username else data["position"]
-                            f.write(f"{user},{data['password']},{position}\n")
-                    print(f"Updated {username}'s position to {new_position}.")
-                else:
-                    print("Invalid position.")
-            else:
-                print("Staff member not found.")
-        
-        elif choice == "6":
-            break
-        else:
-            print("Invalid choice. Please select 1-6.")
-
-def main():
-    ensure_data_directory()
-    
-    # Create admin account if it doesn't exist
-    if not os.path.exists(ADMIN_FILE):
-        save_user("admin", "admin123", ADMIN_FILE)
-        print("Admin account created with username: admin and password: admin123")
-    
-    while True:
-        print("\n=== Welcome ===")
-        print("1. Login")
-        print("2. Sign Up")
-        print("3. Exit")
-        
-        choice = input("Enter choice (1-3): ")
-        
-        if choice == "1":
-            user = login()
-            if user and user["role"] == "admin":
-                admin_menu()
-            elif user:
-                print(f"Welcome {user['username']}!")
-                if user["role"] == "staff":
-                    print(f"You are logged in as {user['position']}")
-                user_menu(user)
-            
-        elif choice == "2":
-            signup()
-            
-        elif choice == "3":
-            print("Goodbye!")
-            break
-        else:
-            print("Invalid choice. Please select 1-3.")
-
-def rooms():
-    """Display available room types and their basic information"""
-    print("\n=== Available Rooms ===")
-    print("1. Tower Exclusive (₹18,000 - ₹25,000)")
-    print("2. ITC ONE (Single Occupancy) (₹25,000 - ₹35,000)")
-    print("3. LUXURY SUITE (₹40,000 - ₹60,000)")
-    print("4. ITC ROYAL (₹30,000 - ₹50,000)")
-    print("5. TOWER EXCLUSIVE (single occupancy) (₹40,000 - ₹60,000)")
-
-def user_menu(user):
-    while True:
-        print("\n=== User Menu ===")
-        print("1. View Rooms")
-        print("2. Book a Room")
-        print("3. Logout")
-        
-        choice = input("Enter choice (1-3): ")
-        
-        if choice == "1":
-            rooms()
-        elif choice == "2":
-            book_room(user)
-        elif choice == "3":
-            break
-        else:
-            print("Invalid choice. Please select 1-3.")
-            
-
-def book_room(user):
-    rooms()
-    try:
-        select = int(input("select the rooms (1-5): "))
-        if select not in range(1, 6):
-            print("Invalid selection. Please choose a room number between 1-5.")
-            return
-            
-        match select:
-            case 1:
-                print("=====~FACILITY~=====")
-                print("Tower Exclusive  (₹18,000 - ₹25,000)")
-                print("--Bed--: King-size  ")
-                print("--View--: City/East Kolkata Wetlands ")
-                print(" ~~~~~AMENITIES~~~~~ ")
-                print("   1. Complimentary Wi-Fi")
-                print("   2. Flat-screen TV ")
-                print("   3. Minibar")
-                print("   4. 24-hour room service")
-                print("   6.--occupancy--: 2 adults, 2 children (below 12 years)")
-            case 2:
-                print("=====~FACILITY~=====")
-                print("ITC ONE (Single Occupancy) (₹25,000 - ₹35,000)")
-                print("--Bed--: King-size/twin  ")
-                print("--View--: City/East Kolkata Wetlands ")
-                print(" ~~~~~AMENITIES~~~~~ ")
-                print("   1. Complimentary Wi-Fi")
-                print("   2. Flat-screen TV ")
-                print("   3. Minibar")
-                print("   4. 24-hour room service")
-                print("   6.--occupancy--: 2 adults, 1 children (below 12 years)")
-            case 3:
-                print("=====~FACILITY~=====")
-                print("LUXURY SUITE (₹40,000 - ₹60,000)")
-                print("--Bed--: King-size  ")
-                print("--View--: City/East Kolkata Wetlands ")
-                print(" ~~~~~AMENITIES~~~~~ ")
-                print("   1. Complimentary Wi-Fi")
-                print("   2. Flat-screen TV ")
-                print("   3. Minibar")
-                print("   4. 24-hour room service")
-                print("   5. Private balcony")
-                print("   6.--occupancy--: 2 adults, 2 children (below 12 years)")
-            case 4:
-                print("=====~FACILITY~=====")
-                print("ITC ROYAL (₹30,000 - ₹50,000)")
-                print("--Bed--: King-size/twin  ")
-                print("--View--: City/East Kolkata Wetlands ")
-                print(" ~~~~~AMENITIES~~~~~ ")
-                print("   1. Complimentary Wi-Fi")
-                print("   2. Flat-screen TV ")
-                print("   3. Minibar")
-                print("   4. 24-hour room service")
-                print("   5. Kitchenette")
-                print("   6.--occupancy--: 2 adults, 2 children (below 12 years)")
-            case 5:
-                print("=====~FACILITY~=====")
-                print("TOWER EXCLUSIVE (single occupancy) (₹40,000 - ₹60,000)")
-                print("--Bed--: single  ")
-                print("--View--: City/East Kolkata Wetlands ")
-                print(" ~~~~~AMENITIES~~~~~ ")
-                print("   1. Complimentary Wi-Fi")
-                print("   2. Flat-screen TV ")
-                print("   3. Minibar")
-                print("   4. 24-hour room service")
-                print("   5.--occupancy--: 1 adult")
-                
-        print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-        print("*****ADDITIONAL FACILITY******")
-        print("!````fitness center````!")
-        print("!`````spa`````!")
-        print("!`````pool`````!")
-        print('!`````restaurant`````!')
-        print("!`````bar`````!")
-        print("!`````meeting spaces`````!")
-        print('!`````business centre`````!')
-        print("------------------------------------------------------------")
-        
-        # Fill the booking and enquiries for booked room
-        name = input("Enter the name of the client: ").strip()
-        if not name:
-            print("Name cannot be empty.")
-            return
-            
-        phone = input("Enter the phone number: ").strip()
-        while not phone.isdigit() or len(phone) != 10:
-            print("Invalid input, please enter a 10 digit number:")
-            phone = input("Enter the phone number: ").strip()
-        print("Valid number:", phone)
-        
-        # Save booking details to file with username
-        ensure_data_directory()
-        with open("data/bookings.txt", "a") as f:
-            f.write(f"Username: {user['username']}, Room: {select}, Name: {name}, Phone: {phone}\n")
-        print("Booking details saved successfully!")
-        
-    except ValueError:
-        print("Please  enter a valid room number (1-5)")
-def foods_details():
-    print("available  types of food  ")
-    print("1.drinks")
-    print("2.vegitarian food")
-    print("3.non vegitarian food")
-    print("4.chainese food")
-    
-    print("__DISCOUNTS__")
-    print("10% off on orders above ₹1000")
-    print("20% off on birthday parties (min 10 people)")
-    print("__DELIVERY__")
-    print("Available within 5 km radius")
-    print("Charges: ₹50 (min order ₹200)")
-    print("__TIMING__")
-    print("- Monday to Thursday: 11am - 11pm")
-    print("- Friday to Sunday: 11am - 12am")
-    
-def foods_order():
-    print("!~~~~~~~~~~~~~~~~~~~~~MANU CARD~~~~~~~~~~~~~~~~~~~~~~~!")
-    foods_details()
-    select=int(input("select the type of food"))
-    match select:
-     case 1:
-         print("====BEVERAGES BRAND====")
-         print(":-soft drinks-:")
-         print("-coca-cola (₹150)")
-         print("- Pepsi (₹120)")
-         print("- Sprite (₹100)")
-         print(":-----------------:")
-    
-         print(":-juices-:")
-         print("- Fresh Orange Juice (₹200)")
-         print("- Fresh Mango Juice (₹250)")
-         print(":------------------:")
-    
-         print(" :-Tea/Coffee-:")
-         print("- Nescafe Coffee (₹80)")
-         print("- Tata Tea (₹60)")
-         print("- Green Tea (₹50)")
-         print(":-----------------:")
-     case 2:
-        print("====APPETIZERS====")
-        print("vagitarian food")
-        print("- Vegetable Samosas (₹150)")
-        print("- Paneer Tikka (₹200)")
-        print("- Palak Paneer (₹250)")
-        print("- Vegetable Biryani (₹200)")
-        print(" Veg Combo (₹500)")
-        print("1.Vegetable Biryani")
-        print("2.Paneer Tikka")
-        print("3.Gulab Jamun")
-        print(":------------------:")
-     case 3:
-        print("non vegiterian food")
-        print("- Fish Fingers (₹350)")
-        print("- Chicken Tikka Masala (₹400)")
-        print("- Fish Curry (₹450)")
-        print("Non-Veg Combo (₹700)")
-        print("1.Chicken Tikka Masala")
-        print("2.Fish Fingers")
-        print("3.Ras Malai")
-        print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-     case 4:
-        print(":-chainese food-:")
-        print("manchurian{veg/non veg}(₹150-200/₹200-250)")
-        print("chowmein{veg/non veg}(₹100-150/₹150-200)")
-        print("fried rice{veg/non veg}(₹80-120/₹120-180)")
-        print(" veg spring rolls(₹80-120)")
-        print("1.Veg/Chicken Hakka Noodles (₹100-150)")
-        print("2. Szechuan Fried Rice (₹150-200)")
-        print("3. Chili Chicken (₹200-250)")
-        print("4. Paneer Chilli (₹200-250)")
-        print("5. Gobi Manchurian (₹150-200)")
-        name = input("Enter the name of the client: ").strip()
-        if not name:
-            print("Name cannot be empty.")
-            return
-            
-        phone = input("Enter the phone number: ").strip()
-        while not phone.isdigit() or len(phone) != 10:
-            print("Invalid input, please enter a 10 digit number:")
-            phone = input("Enter the phone number: ").strip()
-        print("Valid number:", phone)
-        
-        # Save booking details to file with username
-        ensure_data_directory()
-        with open("data/food.txt", "a") as f:
-            f.write(f"Username: {name['username']}, food {select}, Name: {name}, Phone: {phone}\n")
-        print("your order successfully!")
-def event_details():
-    print("******EVENT TYPES********")
-    print("1.BIRTHDAY PARTIES")
-    print("2.WEDINGS EVENT")
-    print("3.ANNIVERSARIES EVENT")
-    print("4.HOLIDAY PARTIES (chistmas,new years etc)")
-    print("5.CONFRENCE EVENT")
-    
-    print("**********event pricing**********")
-    print(" Per-person pricing (e.g., $50-$100)")
-    print("Flat-rate pricing (e.g., $1,000-$5,000)")
-    print(" Package pricing (e.g., $500-$2,000)")
-def event_booking():
-    selection=int(input("select the you orgnized event: enter the 1-5 number  of selection "))
-    event_booking()
-    match selection:
-        case 1:
-            print("BIRTHDAY PARTIES(charge(RS-30000))")
-            print("provide to birthday decoretion ( ( RS.500-RS.2,000))")
-            print("catring price according to members ")
-            print("ENTERTAINMENT(live music,DJ,etc)")
-            print("photography provide to organization side ")
-        case 2:
-            print("WEDINGS EVENT(100000-700000)")
-            print("PROVIDE TO FACILITY OF ORGANIZATION")
-            print("unik decorations of weding")
-            print("entertanment (live music,DJ,etc)")
-            print(' Photography')
-            print( "Catering")
-            print("Banquet Halls")
-            print("a beautyful decoreted garden")
-        case 3:
-           print("ANNIVERSARIES EVENT(100000-200000)")
-           print("PROVIDE TO FACILITY OF ORGANIZATION")
-           print("unik decorations of ANNIVERSARIE")
-           print("entertanment (live music,DJ,etc)")
-           print(' Photography')
-           print( "Catering")
-           print("Private Dining Rooms")
-           print("a beautyful decoreted garden") 
-        case 4:
-           print("HOLIDAY PARTIES (chistmas,new years (50000-80000) ")
-           print("PROVIDE TO FACILITY OF ORGANIZATION")
-           print("unik decorations of  HOLIDAY PARTIES")
-           print("entertanment (live music,DJ,etc)")
-           print(' Photography')
-           print( "Catering")
-           print("DISCO ")
-           print("a beautyful decoreted garden") 
-        case 5:
-           print("CONFRENCE EVENT (50000-60000)")
-           print("PROVIDE TO FACILITY OF ORGANIZATION")
-           print("unik decorations of CONFRENCE EVENT")
-           print("Conference Rooms")
-           print(' Photography')
-           print( "Catering")
-           name = input("Enter the name of the client: ").strip()  
-           phone = input("Enter the phone number: ").strip()
-           while not phone.isdigit() or len(phone) != 10:
-            print("Invalid input, please enter a 10 digit number:")
-            phone = input("Enter the phone number: ").strip()
-            print("Valid number:", phone)
-            date=input("enter the date of event")
-            guests=input("enter the num of guests")
-            
-        
-        # Save booking details to file with username
-            ensure_data_directory()
-            with open("data/event.txt", "a") as f:
-             f.write(f"Username: {name['username']}, event {selection}, Name: {name}, Phone: {phone},date: {date},guests: { guests}\n")
-           print("your order successfully!")
-        
-if __name__ == "__main__":
+import os
+from getpass import getpass
+import datetime
+from storage import ITEM_LABELS, open_storage
+import properties
+
+# Heavier modules (services, billing, catalog, metrics) are imported by the
+# functions that use them, so the terminal starts quickly; logins and the
+# account screens only need accounts
+
+storage = None  # opened by main()
+
+def open_data():
+    """The terminal's storage"""
+    # Text files under HOTEL_DATA (default data/) unless HOTEL_STORAGE=sqlite;
+    # HOTEL_PROPERTY=<id> serves one property of several (see properties.py)
+    return open_storage(root=properties.data_root())
+
+def signup():
+    import accounts
+    print("\n=== Sign Up ===")
+    print("1. Sign up as Staff")
+    print("2. Sign up as Customer")
+    choice = input("Enter choice (1-2): ")
+    
+    if choice not in ["1", "2"]:
+        print("Invalid choice. Please select 1 or 2.")
+        return
+        
+    while True:
+        try:
+            username = accounts.check_new_username(storage, input("Enter username: "))
+        except accounts.ServiceError as e:
+            print(e)
+            continue
+            
+        password = getpass("Enter password: ")
+        if not password:
+            print("Password cannot be empty.")
+            continue
+            
+        confirm_password = getpass("Confirm password: ")
+        
+        if password != confirm_password:
+            print("Passwords don't match. Try again.")
+            continue
+        
+        position = None
+        if choice == "1":  # Staff signup
+            while True:
+                try:
+                    position = accounts.check_position(
+                        input("Enter position (chef/waiter/receptionist/housekeeper/manager): "))
+                    break
+                except accounts.ServiceError as e:
+                    print(e)
+        try:
+            accounts.signup(storage, choice, username, password, position)
+        except accounts.ServiceError as e:
+            print(e)
+            continue
+            
+        print("Signup successful!")
+        break
+
+def login():
+    import accounts
+    print("\n=== Login ===")
+    username = input("Enter username: ").strip()
+    if not username:
+        print("Username cannot be empty.")
+        return None
+        
+    password = getpass("Enter password: ")
+    if not password:
+        print("Password cannot be empty.")
+        return None
+    
+    try:
+        session = accounts.login(storage, username, password)
+    except accounts.ServiceError as e:
+        print(e)
+        return None
+    user = session["user"]
+    user["token"] = session["token"]
+    return user
+
+def logout(user):
+    import accounts
+    accounts.logout(storage, user["token"])
+
+def ask_new_password():
+    password = getpass("Enter new password: ")
+    if password != getpass("Confirm new password: "):
+        print("Passwords don't match.")
+        return None
+    return password
+
+def change_password(user):
+    import accounts
+    print("\n=== Change Password ===")
+    old_password = getpass("Enter current password: ")
+    new_password = ask_new_password()
+    if new_password is None:
+        return
+    try:
+        accounts.change_password(storage, user["username"], old_password, new_password, user["token"])
+    except accounts.ServiceError as e:
+        print(e)
+        return
+    print("Password changed.")
+
+def forgot_password():
+    import accounts
+    print("\n=== Forgot Password ===")
+    print("Ask an admin for a reset code.")
+    username = input("Enter username: ").strip()
+    code = input("Enter reset code: ").strip()
+    password = ask_new_password()
+    if password is None:
+        return
+    try:
+        accounts.reset_password(storage, username, code, password)
+    except accounts.ServiceError as e:
+        print(e)
+        return
+    print("Password reset. You can log in now.")
+
+PAGE_SIZE = 20
+
+def show_pages(role, position=None):
+    """Print a role (or one staff position) a page at a time"""
+    import accounts
+    cursor = total = None
+    while True:
+        page = accounts.user_page(storage, role, position, cursor, PAGE_SIZE)
+        total = total or page["total"]
+        for row in page["users"]:
+            if role == "staff":
+                print(f"Username: {row['username']}, Position: {row['position']}")
+            else:
+                print(f"Username: {row['username']} ({role.title()})")
+        cursor = page["cursor"]
+        if cursor is None or input(f"-- {total} in all; Enter for more, q to stop: ").strip().lower() == "q":
+            break
+
+def admin_menu(user):
+    import accounts
+    while True:
+        print("\n=== Admin Menu ===")
+        print("1. View all users")
+        print("2. Make user admin")
+        print("3. Delete user")
+        print("4. View staff by position")
+        print("5. Update staff position")
+        print("6. Search guest history")
+        print("7. Import staff roster (CSV)")
+        print("8. Export staff roster (CSV)")
+        print("9. Issue password reset code")
+        print("10. Performance metrics")
+        print("11. Logout")
+        
+        choice = input("Enter choice (1-11): ")
+        
+        if choice == "1":
+            for role in ("admin", "staff", "user"):
+                print(f"\n{role.title()}s:")
+                show_pages(role)
+        
+        elif choice == "2":
+            username = input("Enter username to make admin: ").strip()
+            try:
+                accounts.promote_user(storage, username)
+                print(f"{username} is now an admin.")
+            except accounts.ServiceError as e:
+                print(e)
+        
+        elif choice == "3":
+            username = input("Enter username to delete: ").strip()
+            if input(f"Delete {username}? (y/n): ").strip().lower() != "y":
+                continue
+            try:
+                accounts.delete_user(storage, username, user["username"])
+                print(f"Deleted {username}.")
+            except accounts.ServiceError as e:
+                print(e)
+        
+        elif choice == "4":
+            for position in accounts.POSITIONS:
+                print(f"\n{position.title()}s ({storage.count_users('staff', position)}):")
+                show_pages("staff", position)
+        
+        elif choice == "5":
+            username = input("Enter staff username to update position: ").strip()
+            found = storage.find_user(username)
+            if found and found[0] == "staff":
+                new_position = input("Enter new position (chef/waiter/receptionist/housekeeper/manager): ").lower().strip()
+                try:
+                    accounts.update_staff_position(storage, username, new_position)
+                    print(f"Updated {username}'s position to {new_position}.")
+                except accounts.ServiceError as e:
+                    print(e)
+            else:
+                print("Staff member not found.")
+        
+        elif choice == "6":
+            search_history()
+        elif choice == "7":
+            path = input("Roster file (username,position[,password] per line): ").strip()
+            try:
+                result = accounts.import_staff(storage, accounts.read_roster(path))
+            except accounts.ServiceError as e:
+                print(e)
+                continue
+            print(f"Added {result['added']}, updated {result['updated']}, skipped {len(result['skipped'])}.")
+            for number, reason in result["skipped"][:20]:
+                print(f"  row {number}: {reason}")
+        elif choice == "8":
+            path = input("Save roster to: ").strip()
+            try:
+                print(f"Exported {accounts.write_roster(storage, path)} staff to {path}.")
+            except accounts.ServiceError as e:
+                print(e)
+        elif choice == "9":
+            username = input("Enter username: ").strip()
+            try:
+                reset = accounts.issue_password_reset(storage, username)
+            except accounts.ServiceError as e:
+                print(e)
+                continue
+            print(f"Reset code for {username}: {reset['code']} (valid {reset['expires_in'] // 3600} hours)")
+        elif choice == "10":
+            show_metrics()
+        elif choice == "11":
+            logout(user)
+            break
+        else:
+            print("Invalid choice. Please select 1-11.")
+
+def show_metrics():
+    """Latency and cache figures so far, and the cProfile switch"""
+    import metrics
+    snap = metrics.snapshot()
+    if not metrics.enabled:
+        print("Metrics are off (set HOTEL_METRICS=1, or start profiling below).")
+    for op, row in snap["operations"].items():
+        p99 = f"{row['p99'] * 1000:g} ms" if row["p99"] is not None else "> 10 s"
+        print(f"  {op:<30} {row['count']:>7} calls  mean {row['mean'] * 1000:8.3f} ms  p99 <= {p99}")
+    for name, rate in snap["cache_hit_rates"].items():
+        print(f"  {name} cache hit rate: {rate:.1%}")
+    for name, value in snap["counters"].items():
+        if name.startswith("file_bytes"):
+            print(f"  {name}: {value} bytes")
+    if input("Profiling is " + ("on" if metrics.profiling() else "off") + ". Toggle? (y/n): ").strip().lower() == "y":
+        if metrics.profiling():
+            stats = metrics.stop_profile(os.path.join(storage.root, "profile.pstats"))
+            print(metrics.profile_report(stats, 15))
+            if stats is not None:
+                print(f"Full profile saved to {os.path.join(storage.root, 'profile.pstats')}")
+        else:
+            metrics.start_profile()
+            print("Profiling every timed operation until you switch it off here.")
+
+def search_history():
+    import services
+    fields = {"1": "phone", "2": "username", "3": "name"}
+    field = fields.get(input("Search by 1. Phone 2. Username 3. Client name: ").strip())
+    if field is None:
+        print("Invalid choice. Please select 1-3.")
+        return
+    try:
+        results = services.search_records(storage, field, input(f"Enter {field}: "))
+    except services.ServiceError as e:
+        print(e)
+        return
+    if not results:
+        print("No matching records.")
+    for row in results:
+        print(f"[{row['kind']}] {row.get('date', '')} {ITEM_LABELS[row['kind']]} {row['item']} - {row['name']} ({row['phone']}), "
+              f"user {row['username']}")
+
+def main():
+    import accounts
+    global storage
+    storage = open_data()
+    try:
+        # Create admin account if it doesn't exist
+        admin = accounts.ensure_admin(storage)
+        if admin:
+            print(f"Admin account created with username: {admin} and password: admin123")
+    
+        while True:
+            print("\n=== Welcome ===")
+            print("1. Login")
+            print("2. Sign Up")
+            print("3. Forgot Password")
+            print("4. Exit")
+        
+            choice = input("Enter choice (1-4): ")
+        
+            if choice == "1":
+                user = login()
+                if user and user["role"] == "admin":
+                    admin_menu(user)
+                elif user:
+                    print(f"Welcome {user['username']}!")
+                    if user["role"] == "staff":
+                        print(f"You are logged in as {user['position']}")
+                    user_menu(user)
+            
+            elif choice == "2":
+                signup()
+            
+            elif choice == "3":
+                forgot_password()
+            
+            elif choice == "4":
+                print("Goodbye!")
+                break
+            else:
+                print("Invalid choice. Please select 1-4.")
+    finally:
+        storage.close()  # also saves the users snapshot for the next start
+
+def rooms():
+    """Display available room types and their basic information"""
+    import catalog
+    catalog.show("rooms")
+
+def ask_stay_dates():
+    from inventory import parse_date
+    check_in = parse_date(input("Enter check-in date (YYYY-MM-DD): "))
+    while check_in is None:
+        print("Invalid date, please use YYYY-MM-DD.")
+        check_in = parse_date(input("Enter check-in date (YYYY-MM-DD): "))
+    check_out = parse_date(input("Enter check-out date (YYYY-MM-DD): "))
+    while check_out is None or check_out <= check_in:
+        print("Check-out must be a valid date after check-in.")
+        check_out = parse_date(input("Enter check-out date (YYYY-MM-DD): "))
+    return check_in, check_out
+
+def check_availability():
+    import catalog
+    import services
+    check_in, check_out = ask_stay_dates()
+    print(f"\n=== Availability {check_in} to {check_out} ===")
+    for room, free in services.availability(storage, check_in.isoformat(), check_out.isoformat()).items():
+        print(f"{room}. {catalog.get_catalog().rooms[room].name}: {free} available")
+
+def user_menu(user):
+    while True:
+        print("\n=== User Menu ===")
+        print("1. View Rooms")
+        print("2. Book a Room")
+        print("3. Check Availability")
+        print("4. Order Food")
+        print("5. Kitchen Queue")
+        print("6. Book an Event")
+        print("7. Find a Venue")
+        print("8. Change Password")
+        print("9. Logout")
+        
+        choice = input("Enter choice (1-9): ")
+        
+        if choice == "1":
+            rooms()
+        elif choice == "2":
+            book_room(user)
+        elif choice == "3":
+            check_availability()
+        elif choice == "4":
+            foods_order(user)
+        elif choice == "5":
+            kitchen_queue(user)
+        elif choice == "6":
+            event_booking(user)
+        elif choice == "7":
+            find_venue()
+        elif choice == "8":
+            change_password(user)
+        elif choice == "9":
+            logout(user)
+            break
+        else:
+            print("Invalid choice. Please select 1-9.")
+            
+
+def book_room(user):
+    import billing
+    import catalog
+    import services
+    rooms()
+    try:
+        select = int(input("select the rooms (1-5): "))
+        if select not in catalog.get_catalog().rooms:
+            print("Invalid selection. Please choose a room number between 1-5.")
+            return
+            
+        catalog.show("room", select)
+        
+        # Fill the booking and enquiries for booked room
+        name = input("Enter the name of the client: ").strip()
+        if not name:
+            print("Name cannot be empty.")
+            return
+            
+        phone = input("Enter the phone number: ").strip()
+        while not services.valid_phone(phone):
+            print("Invalid input, please enter a 10 digit number:")
+            phone = input("Enter the phone number: ").strip()
+        print("Valid number:", phone)
+        
+        check_in, check_out = ask_stay_dates()
+        
+        # Save booking details with username
+        try:
+            booking = services.book_room(storage, user["username"], select, name, phone,
+                                         check_in.isoformat(), check_out.isoformat())
+        except services.ServiceError as e:
+            print(e)
+            return
+        print("Booking details saved successfully!")
+        print(billing.format_invoice(booking["invoice"]))
+        
+    except ValueError:
+        print("Please  enter a valid room number (1-5)")
+def foods_details():
+    import catalog
+    catalog.show("food")
+    
+def foods_order(user):
+    import billing
+    import catalog
+    import services
+    print("!~~~~~~~~~~~~~~~~~~~~~MANU CARD~~~~~~~~~~~~~~~~~~~~~~~!")
+    foods_details()
+    menu = catalog.get_catalog()
+    items = []
+    while True:
+        try:
+            select = int(input("select the type of food (0 to finish): "))
+        except ValueError:
+            print("Please enter a valid food number (1-4)")
+            continue
+        if select == 0:
+            break
+        if select not in menu.food:
+            print("Invalid selection. Please choose a food number between 1-4.")
+            continue
+        catalog.show("food_type", select)
+        code = input("Enter the item code (shown in [ ]): ").strip().lower()
+        if code not in menu.items:
+            print("Unknown menu item.")
+            continue
+        quantity = input("Enter the quantity: ").strip()
+        while not quantity.isdigit() or int(quantity) < 1:
+            print("Invalid input, please enter a number of 1 or more:")
+            quantity = input("Enter the quantity: ").strip()
+        items.append((code, int(quantity)))
+    
+    if not items:
+        print("No items ordered.")
+        return
+    delivery = input("Delivery? (y/n): ").strip().lower() == "y"
+    
+    name = input("Enter the name of the client: ").strip()
+    if not name:
+        print("Name cannot be empty.")
+        return
+        
+    phone = input("Enter the phone number: ").strip()
+    while not services.valid_phone(phone):
+        print("Invalid input, please enter a 10 digit number:")
+        phone = input("Enter the phone number: ").strip()
+    print("Valid number:", phone)
+    
+    # Save the order with username and send it to the kitchen
+    try:
+        order = services.order_food(storage, user["username"], items, name, phone, delivery)
+    except services.ServiceError as e:
+        print(e)
+        return
+    print("your order successfully!")
+    print(billing.format_invoice(order["invoice"]))
+    print(f"Order {order['record']['order_id']} will be ready by {order['ready_by'][11:]}")
+
+def kitchen_queue(user):
+    import services
+    if user.get("position") not in ("chef", "manager"):
+        print("Only chefs and managers can view the kitchen queue.")
+        return
+    try:
+        plan = services.kitchen_plan(storage)
+    except services.ServiceError as e:
+        print(e)
+        return
+    if not plan:
+        print("No open orders.")
+        return
+    print("\n=== Kitchen Queue ===")
+    for row in plan:
+        print(f"Order {row['order_id']}: {row['items']} -> {row['chef']}, "
+              f"start {row['start'][11:]}, ready {row['ready'][11:]} (promised {row['promised'][11:]})")
+    order_id = input("Enter order id to mark done (blank to go back): ").strip()
+    if order_id:
+        try:
+            services.complete_order(storage, order_id, user["username"])
+            print(f"Order {order_id} marked done.")
+        except services.ServiceError as e:
+            print(e)
+
+def event_details():
+    import catalog
+    catalog.show("events")
+def event_booking(user):
+    import billing
+    import catalog
+    import services
+    from inventory import parse_date
+    event_details()
+    try:
+        selection = int(input("select the you orgnized event: enter the 1-5 number  of selection "))
+    except ValueError:
+        print("Please enter a valid event number (1-5)")
+        return
+    if selection not in catalog.get_catalog().events:
+        print("Invalid selection. Please choose an event number between 1-5.")
+        return
+    catalog.show("event", selection)
+
+    name = input("Enter the name of the client: ").strip()
+    if not name:
+        print("Name cannot be empty.")
+        return
+    phone = input("Enter the phone number: ").strip()
+    while not services.valid_phone(phone):
+        print("Invalid input, please enter a 10 digit number:")
+        phone = input("Enter the phone number: ").strip()
+    print("Valid number:", phone)
+    date = parse_date(input("enter the date of event (YYYY-MM-DD): "))
+    if date is None:
+        print("Invalid date, please use YYYY-MM-DD.")
+        return
+    guests = input("enter the num of guests: ").strip()
+
+    # Offer the first free suitable venue on or after the chosen date
+    try:
+        venue = services.find_venue(storage, guests, date.isoformat(),
+                                    (date + datetime.timedelta(days=60)).isoformat(), selection)
+    except services.ServiceError as e:
+        print(e)
+        return
+    if venue is None:
+        print("Sorry, no suitable venue is free in the next 60 days.")
+        return
+    print(f"{venue['name']} (up to {venue['capacity']} guests) is free on {venue['date']}.")
+    if input("Book it? (y/n): ").strip().lower() != "y":
+        return
+    confirmed = input("Confirm now, or hold it for a few days? (c/h): ").strip().lower() != "h"
+    try:
+        booking = services.book_event(storage, user["username"], selection, name, phone, venue["date"],
+                                      guests, venue["venue"], confirmed)
+    except services.ServiceError as e:
+        print(e)
+        return
+    hold = booking["hold"]
+    if confirmed:
+        print("your order successfully!")
+    else:
+        print(f"Venue held until {hold['expires']} (hold {hold['hold_id']}).")
+    print(billing.format_invoice(booking["invoice"]))
+
+def find_venue():
+    import services
+    guests = input("Number of guests: ").strip()
+    start = input("From date (YYYY-MM-DD): ").strip()
+    end = input("To date (YYYY-MM-DD): ").strip()
+    try:
+        venue = services.find_venue(storage, guests, start, end)
+    except services.ServiceError as e:
+        print(e)
+        return
+    if venue is None:
+        print("No venue is free for that many guests in those dates.")
+    else:
+        print(f"First free: {venue['name']} (up to {venue['capacity']} guests) on {venue['date']}")
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
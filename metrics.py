@@ -0,0 +1,261 @@
+"""Latency histograms, counters and cache hit rates for the hot paths.
+
+Recording is off unless HOTEL_METRICS=1 or enable() is called; while it
+is off an instrumented call costs one flag check.
+
+    @metrics.timed("login")               # latency histogram per operation
+    def authenticate(...): ...
+    with metrics.timer("users_compact"): ...
+    metrics.count("file_bytes", n, file="bookings.txt", op="write")
+    metrics.cache("userdir", hit=True)    # hit rate per cache
+
+prometheus() renders everything in the Prometheus text format and
+snapshot() as a dict; HOTEL_METRICS_JSON=<path> (or start_snapshots())
+writes that dict to a file every HOTEL_METRICS_INTERVAL seconds.
+
+start_profile() switches on cProfile capture for every timed operation,
+on whichever thread runs it, until stop_profile() merges the per-thread
+profiles and returns the pstats.Stats. cProfile and pstats are only
+imported then, so importing this module stays cheap for the clients.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+from filelock import write_atomic
+
+# Upper bounds of the latency buckets, in seconds
+BOUNDS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+          0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+enabled = os.environ.get("HOTEL_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_histograms = {}  # operation -> [bucket counts..., +Inf count], [sum, count]
+_counters = {}  # (name, ((label, value), ...)) -> value
+_profiling = False
+_generation = 0  # bumped by start_profile(), so threads drop profiles from earlier runs
+_profiles = []  # one cProfile.Profile per thread that ran a timed call while profiling
+_local = threading.local()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(operation, seconds):
+    """Add one latency sample to operation's histogram"""
+    with _lock:
+        entry = _histograms.get(operation)
+        if entry is None:
+            entry = _histograms[operation] = ([0] * (len(BOUNDS) + 1), [0.0, 0])
+        entry[0][bisect.bisect_left(BOUNDS, seconds)] += 1
+        entry[1][0] += seconds
+        entry[1][1] += 1
+
+
+def count(name, n=1, **labels):
+    if not enabled:
+        return
+    key = (name, tuple(labels.items()))  # callers pass labels in a fixed order
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def cache(name, hit):
+    if not enabled:
+        return
+    key = ("cache_requests", (("cache", name), ("result", "hit" if hit else "miss")))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + 1
+
+
+def _profiled(func, args, kwargs):
+    profile = getattr(_local, "profile", None)
+    if profile is None or _local.generation != _generation:
+        import cProfile
+        profile = _local.profile = cProfile.Profile()
+        _local.generation = _generation
+        _local.depth = 0
+        with _lock:
+            _profiles.append(profile)
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    if depth == 0:
+        profile.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _local.depth = depth
+        if depth == 0:
+            profile.disable()
+
+
+def timed(operation):
+    """Decorator: record the latency of every call as operation"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                if _profiling:
+                    return _profiled(func, args, kwargs)
+                return func(*args, **kwargs)
+            finally:
+                observe(operation, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class timer:
+    """Context manager: record the latency of the block as operation"""
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter() if enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            observe(self.operation, time.perf_counter() - self.start)
+
+
+def start_profile():
+    global _profiling, _generation
+    with _lock:
+        _profiles.clear()
+        _generation += 1
+    _profiling = True
+    enable()
+
+
+def profiling():
+    return _profiling
+
+
+def stop_profile(path=None):
+    """Stop capturing; returns the merged pstats.Stats (also dumped to path)"""
+    global _profiling
+    import io
+    import pstats
+    _profiling = False
+    with _lock:
+        profiles = list(_profiles)
+        _profiles.clear()
+    stats = None
+    for profile in profiles:
+        profile.create_stats()
+        if not profile.stats:
+            continue
+        if stats is None:
+            stats = pstats.Stats(profile, stream=io.StringIO())
+        else:
+            stats.add(profile)
+    if stats is not None and path:
+        stats.dump_stats(path)
+    return stats
+
+
+def profile_report(stats, limit=20):
+    """The top limit functions of stats by cumulative time, as text"""
+    if stats is None:
+        return "No timed operations ran while profiling."
+    import io
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _quantile(buckets, total, q):
+    """Upper bound of the bucket holding the q-th sample (None: above the last bound)"""
+    rank = q * total
+    seen = 0
+    for bound, n in zip(BOUNDS, buckets):
+        seen += n
+        if seen >= rank:
+            return bound
+    return None
+
+
+def snapshot():
+    with _lock:
+        histograms = {op: (list(b), list(s)) for op, (b, s) in _histograms.items()}
+        counters = dict(_counters)
+    operations = {}
+    for op, (buckets, (total, n)) in sorted(histograms.items()):
+        operations[op] = {"count": n, "seconds": total, "mean": total / n if n else 0.0,
+                          "p50": _quantile(buckets, n, 0.5), "p99": _quantile(buckets, n, 0.99)}
+    rendered = {}
+    caches = {}
+    for (name, labels), value in sorted(counters.items()):
+        label_text = ",".join(f"{k}={v}" for k, v in labels)
+        rendered[f"{name}{{{label_text}}}" if labels else name] = value
+        if name == "cache_requests":
+            labels = dict(labels)
+            hits, misses = caches.get(labels["cache"], (0, 0))
+            caches[labels["cache"]] = (hits + value, misses) if labels["result"] == "hit" else (hits, misses + value)
+    return {"time": time.time(), "enabled": enabled, "operations": operations, "counters": rendered,
+            "cache_hit_rates": {name: hits / (hits + misses) for name, (hits, misses) in caches.items()}}
+
+
+def _labels(pairs):
+    return ",".join(f'{k}="{v}"' for k, v in pairs)
+
+
+def prometheus():
+    """Every metric in the Prometheus text exposition format"""
+    with _lock:
+        histograms = {op: (list(b), list(s)) for op, (b, s) in _histograms.items()}
+        counters = dict(_counters)
+    lines = ["# TYPE hotel_operation_seconds histogram"]
+    for op, (buckets, (total, n)) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, c in zip(BOUNDS + ("+Inf",), buckets):
+            cumulative += c
+            lines.append(f'hotel_operation_seconds_bucket{{op="{op}",le="{bound}"}} {cumulative}')
+        lines.append(f'hotel_operation_seconds_sum{{op="{op}"}} {total}')
+        lines.append(f'hotel_operation_seconds_count{{op="{op}"}} {n}')
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE hotel_{name}_total counter")
+        for (other, labels), value in sorted(counters.items()):
+            if other == name:
+                lines.append(f"hotel_{name}_total{{{_labels(labels)}}} {value}" if labels
+                             else f"hotel_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path):
+    write_atomic(path, [json.dumps(snapshot(), indent=1)])
+
+
+def start_snapshots(path, interval=60.0):
+    """Write snapshot() to path every interval seconds from a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(path)
+            except OSError:
+                pass  # try again next round
+    thread = threading.Thread(target=run, name="hotel-metrics", daemon=True)
+    thread.start()
+    return thread
+
+
+if os.environ.get("HOTEL_METRICS_JSON"):
+    enable()
+    start_snapshots(os.environ["HOTEL_METRICS_JSON"], float(os.environ.get("HOTEL_METRICS_INTERVAL", 60)))
@@ -0,0 +1,148 @@
+"""Several hotels (properties) under one data root.
+
+    data/usernames.txt                  the shared username index
+    data/properties/<id>/               one property's data directory: users,
+                                        logs, venues, kitchen and journal
+    data/properties/<id>/catalog.json   its rooms, menu and events (optional;
+                                        the bundled catalog.json otherwise)
+
+A process serves one property: HOTEL_PROPERTY=<id> (or --property) picks
+it and HOTEL_DATA the root. Without a property the root itself is the
+data directory, exactly as for a single hotel.
+
+Usernames are one namespace across all properties. An account lives at
+one property, and usernames.txt maps each username to it with lines of
+"username,property" ("username," releases the name). A signup claims its
+name there, under the index's lock, before the user is written, so two
+properties can never both take it. coordinator.py runs queries across
+every property.
+"""
+import os
+import re
+import threading
+
+from catalog import CATALOG_FILE
+from filelock import locked, write_atomic
+from storage import USER_FILES
+from userdir import read_user_file
+
+PROPERTIES_DIR = "properties"
+INDEX_FILE = "usernames.txt"
+PROPERTY_ID = re.compile(r"[a-z0-9][a-z0-9_-]*$")
+
+
+def data_root():
+    return os.environ.get("HOTEL_DATA", "data")
+
+
+def current_property():
+    """The property this process serves (HOTEL_PROPERTY), or None for a single hotel"""
+    return os.environ.get("HOTEL_PROPERTY") or None
+
+
+def property_root(root, property_id):
+    if not PROPERTY_ID.match(property_id or ""):
+        raise ValueError(f"Invalid property id {property_id!r}: use lower-case letters, digits, - and _")
+    return os.path.join(root, PROPERTIES_DIR, property_id)
+
+
+def list_properties(root):
+    folder = os.path.join(root, PROPERTIES_DIR)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder)
+                  if PROPERTY_ID.match(name) and os.path.isdir(os.path.join(folder, name)))
+
+
+def catalog_path(root, property_id):
+    """The property's own catalog.json, or the bundled one"""
+    path = os.path.join(property_root(root, property_id), "catalog.json")
+    return path if os.path.exists(path) else CATALOG_FILE
+
+
+class UsernameIndex:
+    """username -> property id, shared by every property under one root.
+
+    The file is append-only between rebuilds, so a refresh only reads the
+    lines other processes added since the last one.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.owners = {}
+        self._file = None  # (inode, bytes read) of the file behind owners
+
+    def _read(self, start):
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a line still being written is read next time
+        for line in data[:end].decode().splitlines():
+            username, _, owner = line.partition(",")
+            if owner:
+                self.owners[username] = owner
+            else:
+                self.owners.pop(username, None)
+        return start + end
+
+    def _refresh(self):
+        """Catch up with the file; the caller holds self.lock"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.owners, self._file = {}, None
+            return
+        if self._file is not None and self._file[0] == st.st_ino and self._file[1] <= st.st_size:
+            if self._file[1] < st.st_size:
+                self._file = (st.st_ino, self._read(self._file[1]))
+            return
+        self.owners = {}  # first read, or rebuilt since
+        self._file = (st.st_ino, self._read(0))
+
+    def owner(self, username):
+        with self.lock:
+            self._refresh()
+            return self.owners.get(username)
+
+    def claim(self, usernames, property_id):
+        """Claim usernames for property_id; returns those another property already has"""
+        with locked(self.path), self.lock:
+            self._refresh()
+            taken = [u for u in usernames if self.owners.get(u, property_id) != property_id]
+            new = [u for u in dict.fromkeys(usernames) if u not in self.owners]
+            if new:
+                with open(self.path, "a") as f:
+                    f.writelines(f"{u},{property_id}\n" for u in new)
+                self._refresh()
+            return taken
+
+    def release(self, username, property_id):
+        """Free username if property_id holds it"""
+        with locked(self.path), self.lock:
+            self._refresh()
+            if self.owners.get(username) == property_id:
+                with open(self.path, "a") as f:
+                    f.write(f"{username},\n")
+                self._refresh()
+
+    def rebuild(self):
+        """Rewrite the index from every property's users files.
+
+        Returns [(username, [property ids])] for names held by more than
+        one property; the first property (in id order) keeps the name.
+        """
+        owners, clashes = {}, {}
+        for property_id in list_properties(self.root):
+            folder = property_root(self.root, property_id)
+            for role, name in USER_FILES.items():
+                for username in read_user_file(os.path.join(folder, name), role == "staff"):
+                    first = owners.setdefault(username, property_id)
+                    if first != property_id:
+                        clashes.setdefault(username, {first}).add(property_id)
+        with locked(self.path), self.lock:
+            write_atomic(self.path, [f"{u},{p}\n" for u, p in owners.items()])
+            self._file = None
+            self._refresh()
+        return sorted((u, sorted(p)) for u, p in clashes.items())
@@ -0,0 +1,173 @@
+"""Reports over the booking, food order and event logs.
+
+Run: python reports.py [data_dir] [--workers N] [--top 10] [--json]
+
+The logs are read lazily line by line, so memory use does not grow with
+the file size. Big logs are cut into byte ranges that are scanned in
+parallel on a process pool; the per-chunk counters are then merged.
+Malformed lines are counted and skipped.
+"""
+import argparse
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import get_catalog
+from inventory import parse_date
+from storage import RECORD_FILES, parse_record
+
+# Logs smaller than this are scanned in-process
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+
+def read_records(path, start=0, end=None, stats=None):
+    """Yield parsed records for lines starting in the byte range [start, end).
+
+    A line that straddles start belongs to the previous range. Lines that
+    do not parse into at least a username and an item are skipped and
+    counted in stats["malformed"].
+    """
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # finish the line the previous range owns
+        position = f.tell()
+        for raw in f:
+            if end is not None and position >= end:
+                break
+            position += len(raw)
+            line = raw.decode("utf-8", errors="replace")
+            if not line.strip():
+                continue
+            record = parse_record(line)
+            if not record.get("username") or not record.get("item"):
+                if stats is not None:
+                    stats["malformed"] += 1
+                continue
+            yield record
+
+
+def chunk_ranges(path, chunks):
+    size = os.path.getsize(path)
+    step = max(1, -(-size // chunks))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def scan(kind, path, start=0, end=None):
+    """Count one byte range of one log; returns a dict of Counters"""
+    counts = {"customers": Counter(), "stats": Counter()}
+    if kind == "booking":
+        counts["bookings"], counts["nights"] = Counter(), Counter()
+    elif kind == "food":
+        counts["orders_per_day"] = Counter()
+    else:
+        counts["events"] = Counter()
+    stats = counts["stats"]
+    for record in read_records(path, start, end, stats):
+        stats["records"] += 1
+        counts["customers"][record["username"]] += 1
+        item = record["item"]
+        if kind == "booking":
+            counts["bookings"][item] += 1
+            check_in, check_out = parse_date(record.get("date")), parse_date(record.get("checkout"))
+            if check_in and check_out and check_out > check_in:
+                counts["nights"][item] += (check_out - check_in).days
+        elif kind == "food":
+            counts["orders_per_day"][record.get("date", "undated")] += 1
+        else:
+            counts["events"][item] += 1
+    return counts
+
+
+def _scan_job(job):
+    return job[0], scan(*job)
+
+
+def merge(into, counts):
+    for key, counter in counts.items():
+        into.setdefault(key, Counter()).update(counter)
+
+
+def build_report(root="data", workers=None, parallel_min_bytes=PARALLEL_MIN_BYTES):
+    jobs = []
+    for kind, name in RECORD_FILES.items():
+        path = os.path.join(root, name)
+        if not os.path.exists(path):
+            continue
+        size = os.path.getsize(path)
+        if size >= parallel_min_bytes and workers != 1:
+            chunks = (workers or os.cpu_count() or 1) * 4
+            jobs += [(kind, path, start, end) for start, end in chunk_ranges(path, chunks)]
+        else:
+            jobs.append((kind, path, 0, None))
+    totals = {}
+    if len(jobs) > 3:
+        with ProcessPoolExecutor(workers) as pool:
+            results = pool.map(_scan_job, jobs)
+            for kind, counts in results:
+                merge(totals.setdefault(kind, {}), counts)
+    else:
+        for job in jobs:
+            kind, counts = _scan_job(job)
+            merge(totals.setdefault(kind, {}), counts)
+    return totals
+
+
+def summarize(totals, top=10):
+    catalog = get_catalog()
+    customers = Counter()
+    for counts in totals.values():
+        customers.update(counts.get("customers", {}))
+    booking = totals.get("booking", {})
+    occupancy = {}
+    for number, room in catalog.rooms.items():
+        occupancy[room.name] = {
+            "bookings": booking.get("bookings", Counter())[str(number)],
+            "room_nights": booking.get("nights", Counter())[str(number)],
+        }
+    events = totals.get("event", {}).get("events", Counter())
+    return {
+        "occupancy": occupancy,
+        "top_customers": customers.most_common(top),
+        "orders_per_day": dict(sorted(totals.get("food", {}).get("orders_per_day", Counter()).items())),
+        "events": {event.name: events[str(number)] for number, event in catalog.events.items()},
+        "records": {kind: counts["stats"]["records"] for kind, counts in totals.items()},
+        "malformed": {kind: counts["stats"]["malformed"] for kind, counts in totals.items()},
+    }
+
+
+def print_report(summary):
+    print("\n=== Occupancy per room type ===")
+    for name, row in summary["occupancy"].items():
+        print(f"{name}: {row['bookings']} bookings, {row['room_nights']} room-nights")
+    print("\n=== Top customers ===")
+    for username, count in summary["top_customers"]:
+        print(f"{username}: {count}")
+    print("\n=== Food orders per day ===")
+    for day, count in summary["orders_per_day"].items():
+        print(f"{day}: {count}")
+    print("\n=== Events by type ===")
+    for name, count in summary["events"].items():
+        print(f"{name}: {count}")
+    print("\n=== Records ===")
+    for kind, count in summary["records"].items():
+        print(f"{kind}: {count} read, {summary['malformed'][kind]} malformed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking, food order and event reports")
+    parser.add_argument("data", nargs="?", default="data", help="data directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes for large logs (1 = no pool)")
+    parser.add_argument("--top", type=int, default=10, help="number of top customers")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    summary = summarize(build_report(args.data, args.workers), args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
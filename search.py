@@ -0,0 +1,364 @@
+"""Search over the booking, food order and event logs.
+
+Run: python search.py [--data data] (--phone P | --username U | --name N) [--limit 20]
+     python search.py [--data data] --rebuild
+
+RecordIndex (text backend) maps phone, username and client name to the
+byte offset of each matching line in its log, so a hit is one seek and
+one readline and no log is scanned to answer a query.
+
+    - Keys are stored as 64-bit hashes of (field, value) in sorted runs of
+      two parallel arrays (hashes, positions); a lookup is a bisect per
+      run. Hash collisions are harmless: every hit is checked against
+      the record it points at.
+    - Distinct client names are kept in a list. Name queries go through a
+      trigram index over that list (substring search) or, for one or two
+      letters, a sorted view of it (prefix search). Both are built on the
+      first name query.
+
+The logs are append-only, so the index only ever reads the new tail of
+each log: before every query it indexes whatever was appended since (by
+any process) into a small in-memory run. Saving appends that run to
+search.idx in the data directory as one marshal segment; once there are
+MAX_SEGMENTS segments they are merged into one. A log that shrank
+(rewritten by hand) is indexed again from the start. A read-only index
+uses search.idx if it is there but keeps everything else in memory.
+"""
+import argparse
+import bisect
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+from array import array
+
+import metrics
+from filelock import locked
+from storage import RECORD_FILES, open_storage, parse_record
+from userdir import file_stamp
+
+INDEX_FILE = "search.idx"
+INDEX_VERSION = 2
+KINDS = list(RECORD_FILES)  # kind code = position in this list
+FIELDS = ("phone", "username", "name")
+SAVE_EVERY = 1024 * 1024  # bytes of new log indexed between segment saves
+MAX_SEGMENTS = 16
+UNSORTED_NAMES = 4096  # new names searched linearly before the prefix view is rebuilt
+
+
+def normalize_name(name):
+    return " ".join(name.lower().split())
+
+
+def key_hash(field, value):
+    digest = hashlib.blake2b(f"{field}\0{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _sorted_run(hashes, positions):
+    order = sorted(range(len(hashes)), key=hashes.__getitem__)
+    return array("q", [hashes[i] for i in order]), array("q", [positions[i] for i in order])
+
+
+class RecordIndex:
+    """Phone, username and client name index over one data directory"""
+
+    def __init__(self, root="data", read_only=False):
+        self.root = root
+        self.read_only = read_only  # never write search.idx
+        self.path = os.path.join(root, INDEX_FILE)
+        self.logs = {kind: os.path.join(root, name) for kind, name in RECORD_FILES.items()}
+        self.lock = threading.RLock()
+        self._stamp = None  # search.idx as we last read or wrote it
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.ends = {kind: 0 for kind in KINDS}  # bytes of each log indexed so far
+        self.saved = dict(self.ends)  # what search.idx already covers
+        self.runs = []  # sorted (hashes, positions) from search.idx
+        self.tail = {}  # hash -> [positions] indexed since the last save
+        self.names = []  # distinct normalized client names, in first-seen order
+        self.name_ids = {}
+        self.names_saved = 0
+        self.segments = 0
+        self._trigrams = None  # trigram -> array of name ids
+        self._by_name = None  # name ids in name order, for prefix search
+        self._unsorted = []  # name ids added since _by_name was built
+
+    # --- persistence ---
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    segment = marshal.load(f)
+                except EOFError:
+                    break
+                except (ValueError, TypeError):
+                    segment = None
+                if not isinstance(segment, dict) or segment.get("version") != INDEX_VERSION or any(
+                        segment["logs"][kind][0] != self.ends[kind] for kind in KINDS):
+                    # Damaged or out of step: index the logs again and
+                    # replace the file on the next save
+                    self._reset()
+                    self.segments = MAX_SEGMENTS
+                    break
+                hashes, positions = array("q"), array("q")
+                hashes.frombytes(segment["hashes"])
+                positions.frombytes(segment["positions"])
+                self.runs.append((hashes, positions))
+                for name in segment["names"]:
+                    self.name_ids[name] = len(self.names)
+                    self.names.append(name)
+                for kind in KINDS:
+                    self.ends[kind] = segment["logs"][kind][1]
+                self.segments += 1
+        self.saved = dict(self.ends)
+        self.names_saved = len(self.names)
+        self._stamp = file_stamp(self.path)
+
+    def _tail_run(self):
+        hashes, positions = array("q"), array("q")
+        for h, found in self.tail.items():
+            hashes.extend([h] * len(found))
+            positions.extend(found)
+        return _sorted_run(hashes, positions)
+
+    def _segment(self, since, run, names):
+        return {"version": INDEX_VERSION, "logs": {kind: (since[kind], self.ends[kind]) for kind in KINDS},
+                "hashes": run[0].tobytes(), "positions": run[1].tobytes(), "names": names}
+
+    def save(self):
+        """Write what was indexed since the last save to search.idx"""
+        with self.lock:
+            if self.read_only or self.ends == self.saved:
+                return
+            run = self._tail_run()
+            with locked(self.path):
+                # If another process saved meanwhile, our segment would not
+                # follow on from the file's last one, so write it all out
+                if (self.segments + 1 >= MAX_SEGMENTS or not os.path.exists(self.path)
+                        or file_stamp(self.path) != self._stamp):
+                    self._rewrite(run)
+                else:
+                    with open(self.path, "ab") as f:
+                        marshal.dump(self._segment(self.saved, run, self.names[self.names_saved:]), f)
+                    self.runs.append(run)
+                    self.segments += 1
+                self.saved = dict(self.ends)
+                self.names_saved = len(self.names)
+                self.tail = {}
+                self._stamp = file_stamp(self.path)
+
+    def _rewrite(self, run):
+        """Merge every run into one and replace search.idx with it"""
+        hashes, positions = array("q"), array("q")
+        for h, p in self.runs + [run]:
+            hashes.extend(h)
+            positions.extend(p)
+        merged = _sorted_run(hashes, positions)
+        folder = os.path.dirname(self.path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=INDEX_FILE + ".", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(self._segment({kind: 0 for kind in KINDS}, merged, self.names), f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.runs = [merged]
+        self.segments = 1
+
+    # --- indexing ---
+
+    def _add(self, h, position):
+        found = self.tail.get(h)
+        if found is None:
+            self.tail[h] = [position]
+        else:
+            found.append(position)
+
+    def _add_name(self, name):
+        name_id = self.name_ids[name] = len(self.names)
+        self.names.append(name)
+        if self._trigrams is not None:
+            for gram in trigrams(name):
+                self._trigrams.setdefault(gram, array("i")).append(name_id)
+            self._unsorted.append(name_id)
+
+    def catch_up(self):
+        """Index whatever was appended to the logs since the last call"""
+        with self.lock:
+            added = 0
+            for code, kind in enumerate(KINDS):
+                path = self.logs[kind]
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                if size < self.ends[kind]:
+                    self._reset()  # a log was rewritten: start over
+                    self.segments = MAX_SEGMENTS
+                    return self.catch_up()
+                if size == self.ends[kind]:
+                    continue
+                position = self.ends[kind]
+                with open(path, "rb") as f:
+                    f.seek(position)
+                    for raw in f:
+                        if not raw.endswith(b"\n"):
+                            break  # a line still being written
+                        record = parse_record(raw.decode("utf-8", errors="replace"))
+                        tagged = position * 4 + code
+                        if record.get("phone"):
+                            self._add(key_hash("phone", record["phone"]), tagged)
+                        if record.get("username"):
+                            self._add(key_hash("username", record["username"]), tagged)
+                        if record.get("name"):
+                            name = normalize_name(record["name"])
+                            if name not in self.name_ids:
+                                self._add_name(name)
+                            self._add(key_hash("name", name), tagged)
+                        position += len(raw)
+                added += position - self.ends[kind]
+                metrics.count("file_bytes", position - self.ends[kind], file=RECORD_FILES[kind], op="read")
+                self.ends[kind] = position
+            if sum(self.ends.values()) - sum(self.saved.values()) >= SAVE_EVERY:
+                self.save()
+            return added
+
+    def rebuild(self):
+        with self.lock:
+            self._reset()
+            self.segments = MAX_SEGMENTS
+            self.catch_up()
+            self.save()
+
+    # --- queries ---
+
+    def _lookup(self, h):
+        found = list(self.tail.get(h, ()))
+        for hashes, positions in self.runs:
+            i = bisect.bisect_left(hashes, h)
+            while i < len(hashes) and hashes[i] == h:
+                found.append(positions[i])
+                i += 1
+        return found
+
+    def _build_name_views(self):
+        self._trigrams = {}
+        for name_id, name in enumerate(self.names):
+            for gram in trigrams(name):
+                posting = self._trigrams.get(gram)
+                if posting is None:
+                    posting = self._trigrams[gram] = array("i")
+                posting.append(name_id)
+        self._by_name = sorted(range(len(self.names)), key=self.names.__getitem__)
+        self._unsorted = []
+
+    def _name_matches(self, text, limit):
+        """Up to limit known names containing text (starting with it if shorter than 3)"""
+        if self._trigrams is None:
+            self._build_name_views()
+        names = self.names
+        if len(text) >= 3:
+            # Check the candidates of the rarest trigram
+            posting = min((self._trigrams.get(g, ()) for g in trigrams(text)), key=len)
+            found = []
+            for i in posting:
+                if text in names[i]:
+                    found.append(names[i])
+                    if len(found) == limit:
+                        break
+            return found
+        if len(self._unsorted) > UNSORTED_NAMES:
+            self._by_name = sorted(range(len(names)), key=names.__getitem__)
+            self._unsorted = []
+        by_name = self._by_name
+        i = bisect.bisect_left(by_name, text, key=names.__getitem__)
+        found = [names[i] for i in self._unsorted if names[i].startswith(text)][:limit]
+        while len(found) < limit and i < len(by_name) and names[by_name[i]].startswith(text):
+            found.append(names[by_name[i]])
+            i += 1
+        return found
+
+    def positions(self, field, value, names=50):
+        """[(tagged position, key)] of possibly matching records, newest first.
+
+        A name query looks at no more than `names` distinct matching names.
+        """
+        with self.lock:
+            self.catch_up()
+            if field == "name":
+                found = [(p, name) for name in self._name_matches(normalize_name(value), names)
+                         for p in self._lookup(key_hash("name", name))]
+            else:
+                value = str(value).strip()
+                found = [(p, value) for p in self._lookup(key_hash(field, value))]
+        # Within a log a larger offset is a newer record
+        found.sort(reverse=True)
+        return found
+
+    def find(self, field, value, limit=50, kinds=None):
+        """[(kind, record)] matching field (phone, username or name), newest first;
+        with kinds, only records of those kinds count towards the limit"""
+        if field not in FIELDS:
+            raise ValueError(f"Unknown search field: {field}")
+        results = []
+        files = {}
+        try:
+            for tagged, key in self.positions(field, value, limit):
+                if len(results) >= limit:
+                    break
+                kind = KINDS[tagged & 3]
+                if kinds is not None and kind not in kinds:
+                    continue
+                f = files.get(kind)
+                if f is None:
+                    f = files[kind] = open(self.logs[kind], "rb")
+                f.seek(tagged >> 2)
+                record = parse_record(f.readline().decode("utf-8", errors="replace"))
+                actual = record.get(field, "")
+                if (normalize_name(actual) if field == "name" else actual) == key:
+                    results.append((kind, record))
+        finally:
+            for f in files.values():
+                f.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up bookings, food orders and events")
+    parser.add_argument("--data", default="data", help="data directory")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--phone")
+    group.add_argument("--username")
+    group.add_argument("--name", help="part of the client name")
+    group.add_argument("--rebuild", action="store_true", help="index the logs again from scratch")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    storage = open_storage(root=args.data)
+    if args.rebuild:
+        if not hasattr(storage, "index"):
+            print("The SQLite backend keeps its own indexes.")
+            return
+        storage.index.rebuild()
+        print(f"Indexed {sum(storage.index.ends.values())} bytes of logs into {storage.index.path}")
+        return
+    field, value = next((f, getattr(args, f)) for f in FIELDS if getattr(args, f))
+    results = storage.find_records(field, value, args.limit)
+    storage.close()  # keeps what was indexed for next time
+    for kind, record in results:
+        print(f"{kind}: " + ", ".join(f"{key}={value}" for key, value in record.items()))
+    if not results:
+        print("No matching records.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""HTTP/JSON API for the hotel, stdlib asyncio only.
+
+Run: python server.py [--host 127.0.0.1] [--port 8080] [--workers 8] [--data data] [--property id]
+
+Connections are kept alive (HTTP/1.1) and parsed on the event loop;
+every operation touches the data files, so it runs on a bounded thread
+pool and the loop keeps serving other clients meanwhile.
+
+Endpoints (JSON bodies; send "Authorization: Bearer <token>" after login):
+    POST /login                     {username, password}; rate limited per username and address
+    POST /logout
+    POST /signup                    {role: staff|user, username, password, position}
+    POST /password/change           {old_password, new_password}; ends your other sessions
+    POST /password/reset            {username, code, password}, with a code from /admin/users/reset
+    GET  /admin/users               admin only; ?role=admin|staff|user[&position=][&cursor=][&limit=50] pages
+    POST /admin/users/promote       admin only, {username}
+    POST /admin/users/delete        admin only, {username}
+    POST /admin/users/reset         admin only, {username}, a one-time password reset code
+    POST /admin/staff/import        admin only, {rows: [[username, position, password?]]}
+    GET  /admin/staff/export        admin only, [[username, position]]
+    GET  /admin/staff               admin only, staff grouped by position
+    POST /admin/staff/position      admin only, {username, position}
+    GET  /admin/search              admin only, ?phone=... | ?username=... | ?name=... [&limit=50]
+    GET  /rooms/availability        ?check_in=YYYY-MM-DD&check_out=YYYY-MM-DD
+    POST /bookings                  {room, name, phone, check_in, check_out}
+    POST /food-orders               {items: [[code, quantity]], name, phone, delivery}
+    POST /events                    {event, name, phone, date, guests, venue, confirmed}
+    POST /events/confirm            {hold_id}, own holds unless staff or admin
+    POST /events/cancel             {hold_id}, own holds unless staff or admin
+    GET  /venues/free               ?guests=300&start=YYYY-MM-DD&end=YYYY-MM-DD&event=2
+    GET  /venues/calendar           ?venue=grand-banquet&start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET  /kitchen                   chefs and managers, today's planned queue
+    POST /kitchen/done              chefs and managers, {order_id}
+    GET  /metrics                   Prometheus text, no login; only with --metrics (or HOTEL_METRICS=1)
+    GET  /admin/metrics             admin only, the same as JSON with p50/p99 and cache hit rates
+    POST /admin/profile             admin only, {action: start|stop}; stop returns the top functions
+
+Sessions are kept in data/sessions.json across restarts (see sessions.py).
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import metrics
+import properties
+import services
+from services import RateLimited, ServiceError
+from storage import open_storage
+
+MAX_BODY = 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+           404: "Not Found", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+log = logging.getLogger("hotel.server")
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _text(args, key, default=None):
+    """args[key] if it is a string (or missing); JSON bodies can carry any type"""
+    value = args.get(key, default)
+    if value is not None and not isinstance(value, str):
+        raise ServiceError(f"{key} must be a string.")
+    return value
+
+
+def _number(args, key, default=None):
+    """args[key] as an int; query strings carry numbers as text"""
+    value = args.get(key, default)
+    if value is None or (isinstance(value, int) and not isinstance(value, bool)):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    raise ServiceError(f"{key} must be a whole number.")
+
+
+def _flag(args, key, default=False):
+    """args[key] as a bool; "false", "no" and "0" are false, as in batch files"""
+    value = args.get(key, default)
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ("1", "y", "yes", "true"):
+            return True
+        if value in ("", "0", "n", "no", "false"):
+            return False
+    elif value is None or isinstance(value, (bool, int)):
+        return bool(value)
+    raise ServiceError(f"{key} must be true or false.")
+
+
+class HotelServer:
+    def __init__(self, storage, workers=8, persist_sessions=True):
+        self.storage = storage
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hotel-io")
+        self.sessions = services.get_sessions(storage, persist=persist_sessions)
+        self.routes = {
+            ("POST", "/login"): (self.login, None),
+            ("POST", "/logout"): (self.logout, "any"),
+            ("POST", "/signup"): (self.signup, None),
+            ("POST", "/password/change"): (self.change_password, "any"),
+            ("POST", "/password/reset"): (self.reset_password, None),
+            ("GET", "/admin/users"): (self.admin_users, "admin"),
+            ("POST", "/admin/users/promote"): (self.admin_promote, "admin"),
+            ("POST", "/admin/users/delete"): (self.admin_delete, "admin"),
+            ("POST", "/admin/users/reset"): (self.admin_reset, "admin"),
+            ("GET", "/admin/staff"): (self.admin_staff, "admin"),
+            ("POST", "/admin/staff/import"): (self.admin_import, "admin"),
+            ("GET", "/admin/staff/export"): (self.admin_export, "admin"),
+            ("POST", "/admin/staff/position"): (self.admin_position, "admin"),
+            ("GET", "/admin/search"): (self.admin_search, "admin"),
+            ("GET", "/rooms/availability"): (self.availability, "any"),
+            ("POST", "/bookings"): (self.book_room, "any"),
+            ("POST", "/food-orders"): (self.order_food, "any"),
+            ("POST", "/events"): (self.book_event, "any"),
+            ("POST", "/events/confirm"): (self.confirm_event, "any"),
+            ("POST", "/events/cancel"): (self.cancel_event, "any"),
+            ("GET", "/venues/free"): (self.free_venue, "any"),
+            ("GET", "/venues/calendar"): (self.venue_calendar, "any"),
+            ("GET", "/kitchen"): (self.kitchen, "any"),
+            ("POST", "/kitchen/done"): (self.kitchen_done, "any"),
+            ("GET", "/admin/metrics"): (self.admin_metrics, "admin"),
+            ("POST", "/admin/profile"): (self.admin_profile, "admin"),
+        }
+        if metrics.enabled:
+            self.routes[("GET", "/metrics")] = (self.metrics, None)
+
+    # --- handlers: run on the worker pool, take (args, user) ---
+
+    def login(self, args, user):
+        return services.login(self.storage, _text(args, "username", ""), _text(args, "password", ""),
+                              args["peer"])
+
+    def logout(self, args, user):
+        return services.logout(self.storage, args["token"])
+
+    def change_password(self, args, user):
+        return services.change_password(self.storage, user["username"], _text(args, "old_password"),
+                                        _text(args, "new_password"), args["token"])
+
+    def reset_password(self, args, user):
+        return services.reset_password(self.storage, _text(args, "username", ""), _text(args, "code"),
+                                       _text(args, "password"), args["peer"])
+
+    def signup(self, args, user):
+        return services.signup(self.storage, _text(args, "role"), _text(args, "username"),
+                               _text(args, "password"), _text(args, "position"))
+
+    def admin_users(self, args, user):
+        if args.get("role"):
+            return services.user_page(self.storage, _text(args, "role"), _text(args, "position"),
+                                      _text(args, "cursor"), _number(args, "limit", 50))
+        return services.list_users(self.storage)
+
+    def admin_promote(self, args, user):
+        return services.promote_user(self.storage, _text(args, "username"))
+
+    def admin_delete(self, args, user):
+        return services.delete_user(self.storage, _text(args, "username"), user["username"])
+
+    def admin_reset(self, args, user):
+        return services.issue_password_reset(self.storage, _text(args, "username"))
+
+    def admin_import(self, args, user):
+        rows = args.get("rows")
+        if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+            raise HttpError(400, "rows must be a list of [username, position, password?] lists.")
+        return services.import_staff(self.storage, rows)
+
+    def admin_export(self, args, user):
+        return services.export_staff(self.storage)
+
+    def admin_staff(self, args, user):
+        return services.staff_by_position(self.storage)
+
+    def admin_position(self, args, user):
+        return services.update_staff_position(self.storage, _text(args, "username"), _text(args, "position"))
+
+    def admin_search(self, args, user):
+        field = next((f for f in services.SEARCH_FIELDS if args.get(f)), None)
+        return services.search_records(self.storage, field, _text(args, field), _number(args, "limit", 50))
+
+    def availability(self, args, user):
+        free = services.availability(self.storage, _text(args, "check_in"), _text(args, "check_out"))
+        return {str(room): count for room, count in free.items()}
+
+    def book_room(self, args, user):
+        return services.book_room(self.storage, user["username"], _number(args, "room"), _text(args, "name"),
+                                  _text(args, "phone"), _text(args, "check_in"), _text(args, "check_out"))
+
+    def order_food(self, args, user):
+        return services.order_food(self.storage, user["username"], args.get("items"),
+                                   _text(args, "name"), _text(args, "phone"), _flag(args, "delivery"))
+
+    def book_event(self, args, user):
+        return services.book_event(self.storage, user["username"], _number(args, "event"), _text(args, "name"),
+                                   _text(args, "phone"), _text(args, "date"), _number(args, "guests"),
+                                   _text(args, "venue"), _flag(args, "confirmed", True))
+
+    def _hold_owner(self, user):
+        return None if user["role"] in ("admin", "staff") else user["username"]
+
+    def confirm_event(self, args, user):
+        return services.confirm_event(self.storage, _text(args, "hold_id"), self._hold_owner(user))
+
+    def cancel_event(self, args, user):
+        return services.cancel_event(self.storage, _text(args, "hold_id"), self._hold_owner(user))
+
+    def free_venue(self, args, user):
+        return services.find_venue(self.storage, _number(args, "guests"), _text(args, "start"), _text(args, "end"),
+                                   _number(args, "event"))
+
+    def venue_calendar(self, args, user):
+        return services.venue_calendar(self.storage, _text(args, "venue"), _text(args, "start"), _text(args, "end"))
+
+    def _require_kitchen_staff(self, user):
+        if user.get("position") not in ("chef", "manager"):
+            raise HttpError(403, "Only chefs and managers can use the kitchen queue.")
+
+    def kitchen(self, args, user):
+        self._require_kitchen_staff(user)
+        return services.kitchen_plan(self.storage)
+
+    def kitchen_done(self, args, user):
+        self._require_kitchen_staff(user)
+        return services.complete_order(self.storage, _text(args, "order_id"), user["username"])
+
+    def metrics(self, args, user):
+        return metrics.prometheus()
+
+    def admin_metrics(self, args, user):
+        return metrics.snapshot()
+
+    def admin_profile(self, args, user):
+        if args.get("action") == "start":
+            metrics.start_profile()
+            return {"profiling": True}
+        if args.get("action") == "stop":
+            stats = metrics.stop_profile()
+            return {"profiling": False, "report": metrics.profile_report(stats, _number(args, "limit", 20))}
+        raise HttpError(400, "action must be start or stop.")
+
+    # --- HTTP plumbing ---
+
+    async def dispatch(self, method, target, headers, body, peer=None):
+        url = urlsplit(target)
+        route = self.routes.get((method, url.path))
+        if route is None:
+            raise HttpError(404, f"No route for {method} {url.path}")
+        handler, access = route
+        user = None
+        auth = headers.get("authorization", "")
+        token = auth[7:] if auth.startswith("Bearer ") else ""
+        if access:
+            user = self.sessions.user(token)
+            if user is None:
+                raise HttpError(401, "Login required.")
+            if access == "admin" and user["role"] != "admin":
+                raise HttpError(403, "Admin only.")
+        args = dict(parse_qsl(url.query))
+        if body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HttpError(400, "Body must be JSON.")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "Body must be a JSON object.")
+            args.update(payload)
+        # Set by the server, never taken from the request body
+        args["token"], args["peer"] = token, peer
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, handler, args, user)
+
+    async def handle(self, reader, writer):
+        peer = (writer.get_extra_info("peername") or ("unknown",))[0]
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                length = int(headers.get("content-length") or 0)
+                try:
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HttpError(413, "Request body too large.")
+                    body = await reader.readexactly(length) if length else b""
+                    status, result = 200, await self.dispatch(method, target, headers, body, peer)
+                except HttpError as e:
+                    status, result = e.status, {"error": str(e)}
+                except RateLimited as e:
+                    status, result = 429, {"error": str(e), "retry_after": round(e.retry_after, 1)}
+                except ServiceError as e:
+                    status, result = 400, {"error": str(e)}
+                except Exception:
+                    # The details are for the operator, not the client
+                    log.exception("%s %s failed", method, target)
+                    status, result = 500, {"error": "Internal error."}
+                if isinstance(result, str):
+                    data, content_type = result.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(result).encode(), "application/json"
+                writer.write(
+                    f"{version} {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away or sent garbage; drop the connection
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080, ready=None):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        address = server.sockets[0].getsockname()
+        print(f"Serving on http://{address[0]}:{address[1]}", flush=True)
+        if ready:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hotel HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="threads for blocking disk I/O")
+    parser.add_argument("--data", default=properties.data_root(), help="data directory (the root, with --property)")
+    parser.add_argument("--property", default=properties.current_property(),
+                        help="serve this property of several (see properties.py)")
+    parser.add_argument("--metrics", action="store_true", help="record metrics and serve GET /metrics")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+    storage = open_storage(root=args.data, group_commit=True, property_id=args.property)
+    admin = services.ensure_admin(storage)
+    if admin:
+        print(f"Admin account created with username: {admin} and password: admin123")
+    server = HotelServer(storage, args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Goodbye!")
+    finally:
+        server.sessions.close()
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""Business operations shared by the terminal menus and the HTTP server.
+
+Bookings, food orders and events are here; accounts and logins are in
+accounts.py and re-exported.
+
+Nothing here prompts or prints: every function takes plain values,
+returns plain data and raises ServiceError with a user-facing message
+when the request is not valid.
+"""
+import contextlib
+import threading
+import weakref
+
+import datetime
+import secrets
+
+import billing
+import metrics
+# Accounts, logins and sessions live in accounts.py, which the terminal
+# loads on its own at startup; they are re-exported here
+from accounts import (POSITIONS, SIGNUP_ROLES, RateLimited, ServiceError, _check_text, authenticate,
+                      change_password, check_new_username, check_position, delete_user,
+                      ensure_admin, export_staff, get_sessions, import_staff, issue_password_reset,
+                      list_users, login, logout, promote_user, read_roster, reset_password,
+                      session_user, signup, staff_by_position, update_staff_position, user_page,
+                      write_roster)
+from catalog import get_catalog
+from inventory import RoomInventory, parse_date
+from kitchen import Kitchen
+from venues import CONFIRMED, TENTATIVE, VenueCalendar, VenueError
+
+MAX_STAY_NIGHTS = 90
+MAX_QUERY_NIGHTS = 366  # longest range availability() answers for
+BOOKING_HORIZON_DAYS = 730  # how far ahead a stay can start
+
+
+def valid_phone(phone):
+    return phone.isdigit() and len(phone) == 10
+
+
+def _require_phone(phone):
+    phone = str(phone).strip()
+    if not valid_phone(phone):
+        raise ServiceError("Invalid input, please enter a 10 digit number")
+    return phone
+
+
+def _require_name(name):
+    name = str(name or "").strip()
+    if not name:
+        raise ServiceError("Name cannot be empty.")
+    return _check_text(name, "Name")
+
+
+def _require_choice(value, choices, label):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ServiceError(f"Please enter a valid {label} number (1-{len(choices)})")
+    if value not in choices:
+        raise ServiceError(f"Invalid selection. Please choose a {label} number between 1-{len(choices)}.")
+    return value
+
+
+# One inventory, kitchen and venue calendar per storage backend, built on first use
+_inventories = weakref.WeakKeyDictionary()
+_kitchens = weakref.WeakKeyDictionary()
+_calendars = weakref.WeakKeyDictionary()
+_booking_lock = threading.Lock()
+_kitchen_lock = threading.Lock()
+_calendar_lock = threading.Lock()
+
+
+def get_inventory(storage):
+    with _booking_lock:
+        return _inventory(storage)
+
+
+def _inventory(storage):
+    """storage's room inventory, caught up with bookings other processes wrote; hold _booking_lock"""
+    inventory = _inventories.get(storage)
+    if inventory is not None:
+        records, end = storage.records_since("booking", inventory.position)
+        if records is not None:
+            inventory.add_bookings(records)
+            inventory.position = end
+            return inventory
+    records, end = storage.records_since("booking")  # first use, or the log was rewritten
+    inventory = _inventories[storage] = RoomInventory.from_bookings(records)
+    inventory.position = end
+    return inventory
+
+
+def get_kitchen(storage):
+    with _kitchen_lock:
+        kitchen = _kitchens.get(storage)
+        if kitchen is None:
+            kitchen = _kitchens[storage] = Kitchen(storage, storage.root)
+        return kitchen
+
+
+def get_calendar(storage):
+    with _calendar_lock:
+        calendar = _calendars.get(storage)
+        if calendar is None:
+            calendar = _calendars[storage] = VenueCalendar(storage.root)
+        return calendar
+
+
+def _undo_if_unwritten(storage, kind, undo):
+    """Inside storage.batch(), run undo if the batch's kind records are never written"""
+    batch = storage.current_batch()
+    if batch is not None:
+        batch.undo.append((kind, undo))
+
+
+SEARCH_FIELDS = ("phone", "username", "name")
+
+
+@metrics.timed("search")
+def search_records(storage, field, value, limit=50):
+    """Bookings, food orders and events for a guest, newest first"""
+    if field not in SEARCH_FIELDS:
+        raise ServiceError("Search by phone, username or name.")
+    value = str(value or "").strip()
+    if not value:
+        raise ServiceError("Enter something to search for.")
+    try:
+        limit = max(1, min(int(limit), 1000))
+    except (TypeError, ValueError):
+        raise ServiceError("Limit must be a number.")
+    return [{"kind": kind, **record} for kind, record in storage.find_records(field, value, limit)]
+
+
+def stay_dates(check_in, check_out, longest=MAX_STAY_NIGHTS):
+    check_in, check_out = parse_date(check_in), parse_date(check_out)
+    if check_in is None:
+        raise ServiceError("Invalid date, please use YYYY-MM-DD.")
+    if check_out is None or check_out <= check_in:
+        raise ServiceError("Check-out must be a valid date after check-in.")
+    if (check_out - check_in).days > longest:
+        raise ServiceError(f"Check-out can be at most {longest} nights after check-in.")
+    return check_in, check_out
+
+
+def _bookable(check_in):
+    today = datetime.date.today()
+    if check_in < today:
+        raise ServiceError("Check-in cannot be in the past.")
+    if check_in > today + datetime.timedelta(days=BOOKING_HORIZON_DAYS):
+        raise ServiceError(f"Rooms can be booked up to {BOOKING_HORIZON_DAYS} days ahead.")
+
+
+@metrics.timed("availability")
+def availability(storage, check_in, check_out):
+    check_in, check_out = stay_dates(check_in, check_out, MAX_QUERY_NIGHTS)
+    with _booking_lock:
+        return _inventory(storage).free_rooms(check_in, check_out)
+
+
+@metrics.timed("book_room")
+def book_room(storage, username, room, name, phone, check_in, check_out):
+    rooms = get_catalog().rooms
+    room = _require_choice(room, rooms, "room")
+    name = _require_name(name)
+    phone = _require_phone(phone)
+    check_in, check_out = stay_dates(check_in, check_out)
+    _bookable(check_in)
+    record = {"username": username, "item": room, "name": name, "phone": phone,
+              "date": check_in.isoformat(), "checkout": check_out.isoformat()}
+    batch = storage.current_batch()
+    # A batch holding the reserve lock has caught up already, and no one
+    # else can append to the log until it is written
+    caught_up = batch is not None and "booking" in batch.holding
+    with contextlib.ExitStack() as held:
+        # Other processes book from the same log: hold its reserve lock from
+        # the capacity check until the booking is written (for a batch,
+        # until the batch is), and catch up with their bookings under it
+        if batch is None:
+            held.enter_context(storage.locked_log("booking"))
+        elif not caught_up:
+            batch.holding.add("booking")
+            batch.held.enter_context(storage.locked_log("booking"))
+            batch.held.callback(_skip_own_bookings, storage)
+        with _booking_lock:
+            inventory = _inventories.get(storage) if caught_up else None
+            if inventory is None:
+                inventory = _inventory(storage)
+            if not inventory.reserve(room, check_in, check_out):
+                raise ServiceError(f"Sorry, no {rooms[room].name} room is free for those dates.")
+            try:
+                storage.add_record("booking", record)
+            except OSError:
+                inventory.release(room, check_in, check_out)
+                raise
+            if batch is None:
+                inventory.position = storage.log_end("booking")  # already counted
+            _undo_if_unwritten(storage, "booking", lambda: _release_room(inventory, room, check_in, check_out))
+    return {"record": record, "invoice": billing.price_booking(room, check_in, check_out)}
+
+
+def _skip_own_bookings(storage):
+    """After a batch of bookings is written, move the inventory past them: reserve counted them already"""
+    with _booking_lock:
+        inventory = _inventories.get(storage)
+        if inventory is not None:
+            inventory.position = storage.log_end("booking")
+
+
+def _release_room(inventory, room, check_in, check_out):
+    with _booking_lock:
+        inventory.release(room, check_in, check_out)
+
+
+def _order_items(items):
+    """Accept 'code x2; code x1', [[code, qty]] or [{code, quantity}]"""
+    if isinstance(items, str):
+        return billing.parse_items(items)
+    parsed = []
+    for item in items or []:
+        if isinstance(item, dict):
+            item = (item.get("code"), item.get("quantity", 1))
+        try:
+            code, quantity = item
+            parsed.append((str(code), int(quantity)))
+        except (TypeError, ValueError):
+            raise ServiceError(f"Invalid order item: {item}")
+    return parsed
+
+
+@metrics.timed("order_food")
+def order_food(storage, username, items, name, phone, delivery=False):
+    items = _order_items(items)
+    name = _require_name(name)
+    phone = _require_phone(phone)
+    try:
+        invoice = billing.price_food_order(items, delivery)
+    except billing.BillingError as e:
+        raise ServiceError(str(e))
+    catalog = get_catalog()
+    now = datetime.datetime.now()
+    record = {"username": username, "item": catalog.items[items[0][0]].category, "name": name,
+              "phone": phone, "date": now.date().isoformat(), "items": billing.format_items(items),
+              "delivery": "yes" if delivery else "no", "time": now.time().isoformat(timespec="seconds"),
+              "order_id": secrets.token_hex(4)}
+    storage.add_record("food", record)
+    kitchen = get_kitchen(storage)
+    ticket = kitchen.add(record)
+    _undo_if_unwritten(storage, "food", lambda: kitchen.queue.remove(record["order_id"]))
+    return {"record": record, "invoice": invoice, "ready_by": ticket.promised.isoformat(timespec="minutes")}
+
+
+def kitchen_plan(storage):
+    """Today's open food orders with the chef and start/ready time planned for each"""
+    kitchen = get_kitchen(storage)
+    plan = kitchen.plan()
+    if not plan and len(kitchen.queue):
+        raise ServiceError(f"No chefs on staff to cook the {len(kitchen.queue)} open orders.")
+    return [
+        {"order_id": t.order_id, "items": billing.format_items(t.items), "chef": chef,
+         "start": start.isoformat(timespec="minutes"), "ready": ready.isoformat(timespec="minutes"),
+         "promised": t.promised.isoformat(timespec="minutes")}
+        for t, chef, start, ready in plan
+    ]
+
+
+def complete_order(storage, order_id, chef):
+    if not get_kitchen(storage).complete(order_id, chef):
+        raise ServiceError("Order not found in the kitchen queue.")
+    return {"order_id": order_id, "chef": chef}
+
+
+def _require_day(date):
+    day = parse_date(date)
+    if day is None:
+        raise ServiceError("Invalid date, please use YYYY-MM-DD.")
+    return day
+
+
+def _require_guests(guests):
+    try:
+        guests = int(guests)
+    except (TypeError, ValueError):
+        raise ServiceError("Number of guests must be a number.")
+    if guests <= 0:
+        raise ServiceError("Number of guests must be a number.")
+    return guests
+
+
+@metrics.timed("find_venue")
+def find_venue(storage, guests, start, end=None, event=None):
+    """Earliest free venue for guests between start and end (inclusive).
+
+    With an event number only the venue kinds that event allows are
+    considered. Returns {venue, name, capacity, date} or None.
+    """
+    guests = _require_guests(guests)
+    start = _require_day(start)
+    end = _require_day(end) if end else start
+    if end < start:
+        raise ServiceError("End date must not be before the start date.")
+    kinds = None
+    if event is not None:
+        kinds = get_catalog().events[_require_choice(event, get_catalog().events, "event")].venue_kinds
+    found = get_calendar(storage).first_free(guests, start, end, kinds)
+    if found is None:
+        return None
+    venue, day = found
+    return {"venue": venue.id, "name": venue.name, "capacity": venue.capacity, "date": day.isoformat()}
+
+
+def venue_calendar(storage, venue, start, end):
+    calendar = get_calendar(storage)
+    if venue not in calendar.venues:
+        raise ServiceError("Unknown venue.")
+    return [hold.as_dict() for hold in calendar.calendar(venue, _require_day(start), _require_day(end))]
+
+
+@metrics.timed("book_event")
+def book_event(storage, username, event, name, phone, date, guests, venue=None, confirmed=True):
+    """Hold a venue for the event and log the booking.
+
+    Without a venue the smallest free one that suits the event and fits
+    the guests is picked. An unconfirmed booking is a tentative hold
+    that lapses unless confirm_event() is called in time.
+    """
+    events = get_catalog().events
+    event = _require_choice(event, events, "event")
+    name = _require_name(name)
+    phone = _require_phone(phone)
+    day = _require_day(date)
+    guests = _require_guests(guests)
+    calendar = get_calendar(storage)
+    if venue is None:
+        found = calendar.first_free(guests, day, day, events[event].venue_kinds)
+        if found is None:
+            raise ServiceError(f"Sorry, no venue for {guests} guests is free on {day.isoformat()}.")
+        venue = found[0].id
+    elif venue in calendar.venues and calendar.venues[venue].kind not in events[event].venue_kinds:
+        raise ServiceError(f"{calendar.venues[venue].name} is not used for {events[event].name}.")
+    try:
+        hold = calendar.hold(venue, day, username, guests, CONFIRMED if confirmed else TENTATIVE)
+    except VenueError as e:
+        raise ServiceError(str(e))
+    record = {"username": username, "item": event, "name": name, "phone": phone,
+              "date": day.isoformat(), "guests": guests, "venue": venue, "hold": hold.hold_id}
+    try:
+        storage.add_record("event", record)
+    except OSError:
+        calendar.cancel(hold.hold_id)
+        raise
+    _undo_if_unwritten(storage, "event", lambda: calendar.cancel(hold.hold_id))
+    return {"record": record, "hold": hold.as_dict(), "invoice": billing.price_event(event, guests)}
+
+
+def _change_hold(storage, hold_id, change, username=None):
+    """Confirm or cancel a hold; with username, only that user's own hold"""
+    calendar = get_calendar(storage)
+    calendar.refresh()
+    hold = calendar.holds.get(hold_id)
+    if hold is None or (username is not None and hold.username != username):
+        raise ServiceError("Hold not found or already lapsed.")
+    try:
+        return getattr(calendar, change)(hold_id).as_dict()
+    except VenueError as e:
+        raise ServiceError(str(e))
+
+
+def confirm_event(storage, hold_id, username=None):
+    return _change_hold(storage, hold_id, "confirm", username)
+
+
+def cancel_event(storage, hold_id, username=None):
+    return _change_hold(storage, hold_id, "cancel", username)
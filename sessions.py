@@ -0,0 +1,246 @@
+"""Login sessions, password reset codes and login rate limits.
+
+A session token is "<session id>.<expiry>.<signature>", where the
+signature is an HMAC of the id and expiry under the store's secret.
+Checking a token is a signature check and one dict lookup; a forged or
+expired token is turned away before the lookup. Live sessions sit in an
+LRU ordered dict, capped at MAX_SESSIONS (the least recently used one is
+logged out first), and expire SESSION_TTL after login.
+
+With a path, the sessions and pending reset codes are saved there (at
+most every SAVE_SECONDS, and on close) so a restart keeps everyone
+logged in. The file holds session ids but no signatures, so it cannot be
+used to log in without the secret, which comes from HOTEL_SESSION_SECRET
+or a session.key file beside it.
+
+RateLimiter is a token bucket per key (a username or a client address):
+each attempt takes a token, tokens refill at a fixed rate, and an empty
+bucket rejects the attempt before any user lookup or password hashing.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from filelock import locked, write_atomic
+
+SESSIONS_FILE = "sessions.json"
+KEY_FILE = "session.key"
+SESSION_TTL = 12 * 3600
+MAX_SESSIONS = 100000
+SAVE_SECONDS = 60.0
+RESET_TTL = 24 * 3600
+
+
+def _sign(secret, message):
+    digest = hmac.new(secret, message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def _load_secret(root):
+    secret = os.environ.get("HOTEL_SESSION_SECRET")
+    if secret:
+        return secret.encode()
+    if root is None:
+        return os.urandom(32)
+    path = os.path.join(root, KEY_FILE)
+    with locked(path):
+        if not os.path.exists(path):
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        with open(path) as f:
+            return bytes.fromhex(f.read().strip())
+
+
+class SessionStore:
+    """Signed session tokens in an LRU/TTL cache, optionally saved to disk"""
+
+    def __init__(self, root=None, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.path = os.path.join(root, SESSIONS_FILE) if root is not None else None
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.secret = _load_secret(root)
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # session id -> (expires, user dict)
+        self.by_user = {}  # username -> {session ids}
+        self.resets = {}  # username -> (digest of code, expires)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return  # damaged: everyone logs in again
+        now = time.time()
+        for sid, expires, user in state.get("sessions", []):
+            if expires > now:
+                self._add(sid, expires, user)
+        self.resets = {u: (d, e) for u, (d, e) in state.get("resets", {}).items() if e > now}
+
+    def save(self):
+        if self.path is None:
+            return
+        with self.lock:
+            state = json.dumps({"sessions": [[sid, expires, user] for sid, (expires, user) in self.sessions.items()],
+                                "resets": self.resets})
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        with locked(self.path):
+            write_atomic(self.path, [state])
+
+    def _changed(self):
+        """Called with the lock held after any change"""
+        self._dirty = True
+        return self.path is not None and time.monotonic() - self._saved_at >= SAVE_SECONDS
+
+    def _add(self, sid, expires, user):
+        self.sessions[sid] = (expires, user)
+        self.by_user.setdefault(user["username"], set()).add(sid)
+
+    def _drop(self, sid):
+        expires, user = self.sessions.pop(sid)
+        sids = self.by_user.get(user["username"])
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self.by_user[user["username"]]
+
+    def create(self, user):
+        """Start a session for user and return its token"""
+        sid = secrets.token_urlsafe(18)
+        expires = int(time.time() + self.ttl)
+        with self.lock:
+            self._add(sid, expires, dict(user))
+            while len(self.sessions) > self.max_sessions:
+                self._drop(next(iter(self.sessions)))
+            save = self._changed()
+        if save:
+            self.save()
+        return f"{sid}.{expires:x}.{_sign(self.secret, f'{sid}.{expires:x}')}"
+
+    def _session_id(self, token):
+        """The session id of a well-signed, unexpired token, else None"""
+        try:
+            sid, expires, signature = token.split(".")
+            if int(expires, 16) <= time.time():
+                return None
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, _sign(self.secret, f"{sid}.{expires}")):
+            return None
+        return sid
+
+    def user(self, token):
+        """The user dict behind token, or None if it is not a live session"""
+        sid = self._session_id(token or "")
+        if sid is None:
+            return None
+        with self.lock:
+            entry = self.sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._drop(sid)
+                return None
+            self.sessions.move_to_end(sid)
+            return entry[1]
+
+    def end(self, token):
+        """Log out one session; returns whether it was live"""
+        sid = self._session_id(token or "")
+        with self.lock:
+            if sid is None or sid not in self.sessions:
+                return False
+            self._drop(sid)
+            save = self._changed()
+        if save:
+            self.save()
+        return True
+
+    def end_user(self, username, keep=None):
+        """Log out every session of username, except the one for token keep"""
+        keep = self._session_id(keep or "")
+        with self.lock:
+            sids = [sid for sid in self.by_user.get(username, ()) if sid != keep]
+            for sid in sids:
+                self._drop(sid)
+            save = sids and self._changed()
+        if save:
+            self.save()
+        return len(sids)
+
+    def issue_reset(self, username, ttl=RESET_TTL):
+        """A one-time code that lets username set a new password"""
+        code = "-".join(secrets.token_hex(3) for _ in range(3))
+        with self.lock:
+            self.resets[username] = (_sign(self.secret, f"reset.{username}.{code}"), time.time() + ttl)
+            save = self._changed()
+        if save:
+            self.save()
+        return code
+
+    def use_reset(self, username, code):
+        """True (and the code is spent) if code is username's live reset code"""
+        with self.lock:
+            entry = self.resets.get(username)
+            if entry is None or entry[1] <= time.time():
+                return False
+            if not hmac.compare_digest(entry[0], _sign(self.secret, f"reset.{username}.{code.strip()}")):
+                return False
+            del self.resets[username]
+            save = self._changed()
+        if save:
+            self.save()
+        return True
+
+    def close(self):
+        if self._dirty:
+            self.save()
+
+
+class RateLimiter:
+    """Token buckets: burst attempts at once, then one every 1/rate seconds"""
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()  # key -> [tokens, time of last update]
+
+    def take(self, key):
+        """Spend a token for key; returns 0 if allowed, else seconds to wait"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [float(self.burst), now]
+                if len(self.buckets) > self.max_keys:
+                    # Forgetting an idle key only ever gives it a full bucket
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return (1 - bucket[0]) / self.rate
+            bucket[0] -= 1
+            return 0
+
+    def refund(self, key):
+        """Give back the token of an attempt that turned out fine"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + 1)
@@ -0,0 +1,805 @@
+"""Storage backends for users, room bookings, food orders and events.
+
+TextStorage keeps the original data/*.txt layout. SqliteStorage keeps the
+same data in one SQLite database so updates are single-row writes. Pick one
+with open_storage() or the HOTEL_STORAGE environment variable.
+
+Both backends have batch(): inside it, this thread's save_user() and
+add_record() calls are held back and written together when the block
+ends, one journaled append per file or one SQLite transaction.
+"""
+import contextlib
+import os
+import sys
+import threading
+
+import metrics
+from credentials import DISABLED_PASSWORD
+from filelock import GroupCommitWriter, locked, write_atomic
+from journal import Journal
+from userdir import SNAPSHOT_FILE, UserDirectory, file_stamp, read_user_file, user_line
+
+USER_FILES = {"admin": "admins.txt", "staff": "staff.txt", "user": "users.txt"}
+RECORD_FILES = {"booking": "bookings.txt", "food": "food.txt", "event": "event.txt"}
+ITEM_LABELS = {"booking": "Room", "food": "Food", "event": "Event"}
+
+# A users file is compacted once it has this many more lines than twice its users
+COMPACT_SLACK = 1000
+
+# Optional record fields, in the order they are written to the text logs
+EXTRA_FIELDS = [("date", "Date"), ("checkout", "Checkout"), ("guests", "Guests"),
+                ("items", "Items"), ("delivery", "Delivery"), ("time", "Time"), ("order_id", "Order"),
+                ("venue", "Venue"), ("hold", "Hold")]
+
+
+def format_record(kind, record):
+    """Format a record as a 'Key: value, ...' log line"""
+    parts = [
+        f"Username: {record['username']}",
+        f"{ITEM_LABELS[kind]}: {record['item']}",
+        f"Name: {record['name']}",
+        f"Phone: {record['phone']}",
+    ]
+    for key, label in EXTRA_FIELDS:
+        if record.get(key) not in (None, ""):
+            parts.append(f"{label}: {record[key]}")
+    return ", ".join(parts) + "\n"
+
+
+# Log line label -> record key, as written and lower-cased
+LABELS = {label: key for key, label in EXTRA_FIELDS}
+LABELS.update({label: "item" for label in ITEM_LABELS.values()})
+LABELS.update({"Username": "username", "Name": "name", "Phone": "phone"})
+LABELS.update({label.lower(): key for label, key in LABELS.items()})
+
+
+def parse_record(line):
+    """Parse a 'Key: value, ...' log line into a record dict.
+
+    Old food/event lines were written as 'food 4' / 'event 5' without the
+    colon; those are accepted too.
+    """
+    # Fast path for lines written by format_record(): alternating labels/values
+    parts = line.rstrip("\n").replace(": ", ", ").split(", ")
+    if len(parts) % 2:
+        return _parse_record_loose(line)
+    pairs = iter(parts)
+    return {LABELS[label]: value for label, value in zip(pairs, pairs) if label in LABELS}
+
+
+def _parse_record_loose(line):
+    record = {}
+    for part in line.split(","):
+        key, sep, value = part.partition(":")
+        if not sep:
+            key, _, value = part.strip().partition(" ")
+        key = LABELS.get(key.strip().lower())
+        if key:
+            record[key] = value.strip()
+    return record
+
+
+class Batch:
+    """Writes held back by storage.batch() until the block ends"""
+
+    def __init__(self):
+        self.users = {}  # role -> [(username, record)]
+        self.records = {}  # kind -> [record]
+        self.pending = {}  # username -> (role, record), so find_user() sees signups in the batch
+        self.undo = []  # (kind, callback) to run if that kind's records are never written
+        self.written = set()  # roles and kinds already written when the batch ends
+        self.held = contextlib.ExitStack()  # locks (and callbacks) released once the batch is written
+        self.holding = set()  # names of what is in held
+
+    def __len__(self):
+        return sum(map(len, self.users.values())) + sum(map(len, self.records.values()))
+
+    def add_user(self, role, username, data):
+        self.users.setdefault(role, []).append((username, data))
+        self.pending[username] = (role, data)
+
+    def add_records(self, kind, records):
+        self.records.setdefault(kind, []).extend(records)
+
+
+class _Backend:
+    """What both backends share: batch(), each_user() and, for one property
+    of several, claims in the shared username index (see properties.py).
+
+    A backend sets self._batches and has _write_batch(batch).
+    """
+
+    property_id = None
+    usernames = None  # the shared UsernameIndex when serving one property of several
+
+    def _claim(self, usernames):
+        """Claim usernames for this property; returns those held by another one"""
+        if self.usernames is None:
+            return []
+        return self.usernames.claim(usernames, self.property_id)
+
+    def _release(self, username):
+        if self.usernames is not None:
+            self.usernames.release(username, self.property_id)
+
+    def username_taken(self, username):
+        """Whether username is in use here or, sharing an index, at another property"""
+        if self.find_user(username) is not None:
+            return True
+        return self.usernames is not None and self.usernames.owner(username) not in (None, self.property_id)
+
+    def each_user(self, role, position=None, page=1000):
+        """(username, record) for a role (or a staff position) in username order, a page at a time"""
+        after = None
+        while True:
+            users, after = self.user_page(role, position, after, page)
+            yield from users
+            if after is None:
+                return
+
+    def current_batch(self):
+        """This thread's open batch, or None"""
+        return getattr(self._batches, "batch", None)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Hold back this thread's user saves and record appends until the block ends.
+
+        Nothing is written if the block raises. A batch opened inside
+        another one joins it. Other writes (password changes, deletes,
+        staff updates) still go straight to storage.
+        """
+        batch = self.current_batch()
+        if batch is not None:
+            yield batch
+            return
+        batch = self._batches.batch = Batch()
+        try:
+            yield batch
+            self._batches.batch = None
+            with metrics.timer("storage.batch"):
+                self._write_batch(batch)
+        finally:
+            self._batches.batch = None
+            try:
+                for kind, undo in reversed(batch.undo):
+                    if kind not in batch.written:
+                        undo()
+            finally:
+                batch.held.close()
+
+    def locked_log(self, kind):
+        """Lock for checking kind's log and appending to it as one step, across processes.
+
+        It is separate from the file's own write lock, which every append
+        takes; take it before any in-process lock.
+        """
+        return locked(os.path.join(self.root, f"{kind}.reserve"))
+
+
+class TextStorage(_Backend):
+    """The original append-only text files under one data directory.
+
+    All writes take the file's lock (see filelock.py), so several processes
+    can share the directory, and go through the write-ahead journal (see
+    journal.py), so a crash mid-write is repaired on the next open. With
+    sync=True every append is durable once the journal is fsynced;
+    group_commit=True does the same but shares one fsync between all the
+    threads appending at the same moment.
+
+    read_only=True is for queries that must leave the directory as it is:
+    nothing is created, the journal is neither opened nor checkpointed and
+    no snapshot or search index is saved. Such a storage must not be
+    written to, and does not see a write a crashed process left only in
+    the journal until a writer opens the directory.
+    """
+
+    def __init__(self, root="data", sync=False, group_commit=False, read_only=False):
+        self.root = root
+        self.sync = sync
+        self.read_only = read_only
+        self.user_files = {role: os.path.join(root, name) for role, name in USER_FILES.items()}
+        self.record_files = {kind: os.path.join(root, name) for kind, name in RECORD_FILES.items()}
+        self.directory = UserDirectory(self.user_files, os.path.join(root, SNAPSHOT_FILE))
+        self.journal = None
+        if not read_only:
+            self.journal = Journal(root, list(USER_FILES.values()) + list(RECORD_FILES.values()))
+        self.writers = {}
+        self._index = None
+        self._batches = threading.local()
+        if group_commit:
+            self.writers = {kind: GroupCommitWriter(path, self.journal.append)
+                            for kind, path in self.record_files.items()}
+
+    def has_admin(self):
+        return os.path.exists(self.user_files["admin"])
+
+    @metrics.timed("storage.save_user")
+    def save_user(self, role, username, password, position=None):
+        """Add or replace a user; False if another property has the username"""
+        # Claimed first: a crash before the write only leaves the name reserved
+        if self._claim([username]):
+            return False
+        data = {"password": password}
+        if role == "staff":
+            data["position"] = position
+        batch = self.current_batch()
+        if batch is not None:
+            batch.add_user(role, username, data)
+            return True
+        self._append_users(role, [(username, data)])
+        return True
+
+    def _append_users(self, role, changes):
+        """Append [(username, record or None to delete)] to a role file"""
+        path = self.user_files[role]
+        with locked(path):
+            stamp_before = file_stamp(path)
+            self.journal.write(path, [user_line(role, username, data) for username, data in changes], self.sync)
+            self.directory.applied(role, changes, stamp_before)
+            # Superseded lines pile up; squeeze them out now and then
+            live = len(self.directory.users(role))
+            if self.directory.lines[role] > 2 * live + COMPACT_SLACK:
+                with metrics.timer("storage.users_compact"):
+                    users = read_user_file(path, role == "staff")
+                    write_atomic(path, [user_line(role, u, d) for u, d in users.items()])
+                    self.journal.replaced(path)
+                    self.directory.replaced(role, users)
+
+    @metrics.timed("storage.load_users")
+    def load_users(self, role):
+        return self.directory.users(role)
+
+    @metrics.timed("storage.find_user")
+    def find_user(self, username):
+        batch = self.current_batch()
+        if batch is not None and username in batch.pending:
+            return batch.pending[username]
+        return self.directory.lookup(username)
+
+    def user_page(self, role, position=None, after=None, limit=50):
+        return self.directory.page(role, position, after, limit)
+
+    def count_users(self, role, position=None):
+        return self.directory.count(role, position)
+
+    @metrics.timed("storage.set_password")
+    def set_password(self, username, password):
+        entry = self.directory.lookup(username)
+        if entry is None:
+            return False
+        role, data = entry
+        # Appended: the new row shadows the old (maybe plaintext) one until
+        # compaction squeezes it out, so a login never rewrites the file
+        self._append_users(role, [(username, {**data, "password": password})])
+        return True
+
+    @metrics.timed("storage.update_staff_position")
+    def update_staff_position(self, username, position):
+        data = self.directory.users("staff").get(username)
+        if data is None:
+            return False
+        self._append_users("staff", [(username, {"password": data["password"], "position": position})])
+        return True
+
+    def delete_user(self, username):
+        entry = self.directory.lookup(username)
+        if entry is None:
+            return False
+        self._append_users(entry[0], [(username, None)])
+        self._release(username)
+        return True
+
+    def promote_to_admin(self, username):
+        entry = self.directory.lookup(username)
+        if entry is None or entry[0] == "admin":
+            return False
+        role, data = entry
+        # Admin line first: a crash in between leaves the admin row shadowing the old one
+        self._append_users("admin", [(username, {"password": data["password"]})])
+        self._append_users(role, [(username, None)])
+        return True
+
+    def import_staff(self, rows):
+        """Add or update staff from [(username, position, password hash or None)].
+
+        Existing staff keep their password unless one is given; new staff
+        without one get a disabled password until it is set. Returns the
+        usernames skipped because another property has them.
+        """
+        staff = self.directory.users("staff")
+        taken = set(self._claim([username for username, _, _ in rows]))
+        changes = []
+        for username, position, password in rows:
+            if username in taken:
+                continue
+            current = staff.get(username)
+            password = password or (current["password"] if current else DISABLED_PASSWORD)
+            changes.append((username, {"password": password, "position": position}))
+        if changes:
+            self._append_users("staff", changes)
+        return sorted(taken)
+
+    @metrics.timed("storage.add_record")
+    def add_record(self, kind, record):
+        batch = self.current_batch()
+        if batch is not None:
+            batch.add_records(kind, [record])
+            return
+        line = format_record(kind, record)
+        if kind in self.writers:
+            self.writers[kind].append(line)
+        else:
+            self.journal.append(self.record_files[kind], [line], self.sync)
+
+    @metrics.timed("storage.add_records")
+    def add_records(self, kind, records):
+        batch = self.current_batch()
+        if batch is not None:
+            batch.add_records(kind, records)
+            return
+        self.journal.append(self.record_files[kind], [format_record(kind, r) for r in records], self.sync)
+
+    def _write_batch(self, batch):
+        # One journaled append per file; a failure part-way leaves the
+        # files before it written (batch.written says which)
+        for role, changes in batch.users.items():
+            self._append_users(role, changes)
+            batch.written.add(role)
+        for kind, records in batch.records.items():
+            self.add_records(kind, records)
+            batch.written.add(kind)
+
+    @property
+    def index(self):
+        """Search index over the record logs, loaded on first use"""
+        if self._index is None:
+            from search import RecordIndex
+            self._index = RecordIndex(self.root, read_only=self.read_only)
+        return self._index
+
+    @metrics.timed("storage.find_records")
+    def find_records(self, field, value, limit=50, kinds=None):
+        return self.index.find(field, value, limit, kinds)
+
+    def log_end(self, kind):
+        """(inode, offset) just past the last complete line of kind's log"""
+        try:
+            with open(self.record_files[kind], "rb") as f:
+                inode, end = os.fstat(f.fileno()).st_ino, f.seek(0, os.SEEK_END)
+                while end > 0:
+                    start = max(0, end - 65536)
+                    f.seek(start)
+                    newline = f.read(end - start).rfind(b"\n")
+                    if newline >= 0:
+                        return inode, start + newline + 1
+                    end = start
+                return inode, 0
+        except FileNotFoundError:
+            return None, 0
+
+    def records_since(self, kind, position=None):
+        """(records of kind's log after position, up to its end now; that end).
+
+        position None reads the whole log. The records are None if the
+        log was rewritten since position.
+        """
+        end = self.log_end(kind)
+        if position is not None and (position[1] > end[1] or position[1] and position[0] != end[0]):
+            return None, end
+        return self._read_log(kind, position[1] if position else 0, end[1]), end
+
+    def _read_log(self, kind, start, end):
+        if start >= end:
+            return
+        with open(self.record_files[kind], "rb") as f:
+            f.seek(start)
+            for line in f:
+                start += len(line)
+                if start > end:
+                    return
+                if line.strip():
+                    yield parse_record(line.decode())
+
+    def records(self, kind):
+        path = self.record_files[kind]
+        if not os.path.exists(path):
+            return
+        if metrics.enabled:
+            metrics.count("file_bytes", os.path.getsize(path), file=RECORD_FILES[kind], op="read")
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield parse_record(line)
+
+    def close(self):
+        if self.read_only:
+            return
+        if self._index is not None:
+            self._index.save()
+        self.directory.save_snapshot()
+        self.journal.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    position TEXT
+);
+CREATE INDEX IF NOT EXISTS users_role ON users (role, position);
+CREATE INDEX IF NOT EXISTS users_page ON users (role, username);
+CREATE INDEX IF NOT EXISTS users_position_page ON users (role, position, username);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    username TEXT,
+    item TEXT,
+    name TEXT,
+    phone TEXT,
+    date TEXT,
+    checkout TEXT,
+    guests TEXT,
+    items TEXT,
+    delivery TEXT,
+    time TEXT,
+    order_id TEXT,
+    venue TEXT,
+    hold TEXT
+);
+CREATE INDEX IF NOT EXISTS records_username ON records (username);
+CREATE INDEX IF NOT EXISTS records_phone ON records (phone);
+CREATE INDEX IF NOT EXISTS records_item ON records (kind, item);
+CREATE INDEX IF NOT EXISTS records_date ON records (kind, date);
+CREATE INDEX IF NOT EXISTS records_kind ON records (kind, id);
+CREATE INDEX IF NOT EXISTS records_name ON records (name COLLATE NOCASE);
+"""
+
+# Substring search on client names; needs SQLite 3.34+ built with FTS5.
+# New rows are added to it by _insert_records(), a whole write at a time:
+# FTS5 indexes one INSERT ... SELECT several times faster than an AFTER
+# INSERT trigger adding the same rows one by one
+NAME_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE records_names USING fts5(name, content='records', content_rowid='id', tokenize='trigram');
+INSERT INTO records_names (records_names) VALUES ('rebuild');
+"""
+
+RECORD_COLUMNS = ["username", "item", "name", "phone", "date", "checkout", "guests", "items", "delivery", "time",
+                  "order_id", "venue", "hold"]
+INSERT_RECORD = (f"INSERT INTO records (kind, {', '.join(RECORD_COLUMNS)}) "
+                 f"VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 1))})")
+INSERT_USER = "INSERT OR REPLACE INTO users (username, password, role, position) VALUES (?, ?, ?, ?)"
+
+
+def _record_row(kind, record):
+    return (kind, *[record.get(col) for col in RECORD_COLUMNS])
+
+
+class SqliteStorage(_Backend):
+    """All users and records in one SQLite database (WAL mode).
+
+    read_only=True opens the database with mode=ro and runs no schema
+    changes; a database that does not exist reads as empty.
+    """
+
+    def __init__(self, path="data/hotel.db", read_only=False):
+        import sqlite3  # text-file terminals never load it
+        self.path = path
+        folder = os.path.dirname(path)
+        self.root = folder or "."  # for side files such as kitchen.txt
+        self.lock = threading.Lock()
+        self._batches = threading.local()
+        if read_only and os.path.exists(path):
+            from urllib.parse import quote
+            self.conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True,
+                                        check_same_thread=False)
+            self.name_search = bool(self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'records_names'").fetchone())
+            return
+        if read_only:
+            path = ":memory:"
+        elif folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # Databases created before a column was added get it on open
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(records)")}
+        for column in RECORD_COLUMNS:
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE records ADD COLUMN {column} TEXT")
+        self.name_search = bool(self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'records_names'").fetchone())
+        if self.name_search:
+            self.conn.execute("DROP TRIGGER IF EXISTS records_names_insert")  # from older databases
+        else:
+            try:
+                self.conn.executescript("BEGIN;" + NAME_SEARCH_SCHEMA + "COMMIT;")
+                self.name_search = True
+            except sqlite3.OperationalError:
+                self.conn.rollback()  # no FTS5 trigram tokenizer: fall back to LIKE
+
+    def has_admin(self):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM users WHERE role = 'admin' LIMIT 1").fetchone()
+        return row is not None
+
+    @metrics.timed("storage.save_user")
+    def save_user(self, role, username, password, position=None):
+        """Add or replace a user; False if another property has the username"""
+        if self._claim([username]):
+            return False
+        batch = self.current_batch()
+        if batch is not None:
+            batch.add_user(role, username, {"password": password, "position": position} if role == "staff"
+                           else {"password": password})
+            return True
+        with self.lock, self.conn:
+            self.conn.execute(INSERT_USER, (username, password, role, position if role == "staff" else None))
+        return True
+
+    @metrics.timed("storage.load_users")
+    def load_users(self, role):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT username, password, position FROM users WHERE role = ? ORDER BY rowid", (role,)
+            ).fetchall()
+        if role == "staff":
+            return {u: {"password": p, "position": pos} for u, p, pos in rows}
+        return {u: {"password": p} for u, p, _ in rows}
+
+    @metrics.timed("storage.find_user")
+    def find_user(self, username):
+        batch = self.current_batch()
+        if batch is not None and username in batch.pending:
+            return batch.pending[username]
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT role, password, position FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        if row is None:
+            return None
+        role, password, position = row
+        data = {"password": password}
+        if role == "staff":
+            data["position"] = position
+        return role, data
+
+    @metrics.timed("storage.set_password")
+    def set_password(self, username, password):
+        with self.lock, self.conn:
+            cur = self.conn.execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+        return cur.rowcount > 0
+
+    @metrics.timed("storage.update_staff_position")
+    def update_staff_position(self, username, position):
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "UPDATE users SET position = ? WHERE username = ? AND role = 'staff'", (position, username)
+            )
+        return cur.rowcount > 0
+
+    def user_page(self, role, position=None, after=None, limit=50):
+        where, args = "role = ?", [role]
+        if position:
+            where += " AND position = ?"
+            args.append(position)
+        if after:
+            where += " AND username > ?"
+            args.append(after)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT username, password, position FROM users WHERE {where} ORDER BY username LIMIT ?",
+                (*args, limit + 1),
+            ).fetchall()
+        page = [(u, {"password": p, "position": pos} if role == "staff" else {"password": p})
+                for u, p, pos in rows[:limit]]
+        return page, (page[-1][0] if len(rows) > limit else None)
+
+    def count_users(self, role, position=None):
+        query, args = "SELECT COUNT(*) FROM users WHERE role = ?", [role]
+        if position:
+            query += " AND position = ?"
+            args.append(position)
+        with self.lock:
+            return self.conn.execute(query, args).fetchone()[0]
+
+    def delete_user(self, username):
+        with self.lock, self.conn:
+            cur = self.conn.execute("DELETE FROM users WHERE username = ?", (username,))
+        if cur.rowcount:
+            self._release(username)
+        return cur.rowcount > 0
+
+    def promote_to_admin(self, username):
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "UPDATE users SET role = 'admin', position = NULL WHERE username = ? AND role != 'admin'", (username,)
+            )
+        return cur.rowcount > 0
+
+    def import_staff(self, rows):
+        taken = set(self._claim([username for username, _, _ in rows]))
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO users (username, password, role, position) VALUES (?, ?, 'staff', ?) "
+                "ON CONFLICT (username) DO UPDATE SET position = excluded.position, "
+                "password = COALESCE(?, password) WHERE role = 'staff'",
+                [(u, password or DISABLED_PASSWORD, position, password) for u, position, password in rows
+                 if u not in taken],
+            )
+        return sorted(taken)
+
+    @metrics.timed("storage.add_record")
+    def add_record(self, kind, record):
+        self.add_records(kind, [record])
+
+    @metrics.timed("storage.add_records")
+    def add_records(self, kind, records):
+        batch = self.current_batch()
+        if batch is not None:
+            batch.add_records(kind, records)
+            return
+        rows = [_record_row(kind, record) for record in records]
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._insert_records(rows)
+
+    def _insert_records(self, rows):
+        """Insert record rows and index their names; the caller holds self.lock
+        in a BEGIN IMMEDIATE transaction, so the new ids follow on from first"""
+        first = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+        self.conn.executemany(INSERT_RECORD, rows)
+        if self.name_search:
+            self.conn.execute("INSERT INTO records_names (rowid, name) SELECT id, name FROM records WHERE id > ?",
+                              (first,))
+
+    def _write_batch(self, batch):
+        with self.lock, self.conn:  # one transaction: all of it or none
+            self.conn.execute("BEGIN IMMEDIATE")
+            for role, changes in batch.users.items():
+                self.conn.executemany(INSERT_USER, [(u, d["password"], role, d.get("position"))
+                                                    for u, d in changes])
+            rows = [_record_row(kind, record) for kind, records in batch.records.items() for record in records]
+            if rows:
+                self._insert_records(rows)
+        batch.written.update(batch.users)
+        batch.written.update(batch.records)
+
+    def log_end(self, kind):
+        """id of kind's newest record"""
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM records WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def records_since(self, kind, position=None):
+        """(records of kind after id position, up to the newest; its id)"""
+        end = self.log_end(kind)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(RECORD_COLUMNS)} FROM records WHERE kind = ? AND id > ? AND id <= ? ORDER BY id",
+                (kind, position or 0, end)).fetchall()
+        return [{col: value for col, value in zip(RECORD_COLUMNS, row) if value is not None} for row in rows], end
+
+    def records(self, kind):
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(RECORD_COLUMNS)} FROM records WHERE kind = ? ORDER BY id", (kind,)
+            ).fetchall()
+        for row in rows:
+            yield {col: value for col, value in zip(RECORD_COLUMNS, row) if value is not None}
+
+    @metrics.timed("storage.find_records")
+    def find_records(self, field, value, limit=50, kinds=None):
+        """[(kind, record)] by phone, username or part of the client name, newest first"""
+        columns = ", ".join(RECORD_COLUMNS)
+        if field in ("phone", "username"):
+            where, args = f"{field} = ?", (str(value).strip(),)
+        elif field == "name":
+            text = " ".join(str(value).split())
+            if self.name_search and len(text) >= 3:
+                where = "id IN (SELECT rowid FROM records_names WHERE records_names MATCH ?)"
+                args = ('"' + text.replace('"', '""') + '"',)
+            else:
+                pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                where, args = "name LIKE ? ESCAPE '\\'", (pattern if len(text) < 3 else "%" + pattern,)
+        else:
+            raise ValueError(f"Unknown search field: {field}")
+        if kinds is not None:
+            where = f"({where}) AND kind IN ({', '.join('?' * len(kinds))})"
+            args = (*args, *kinds)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT kind, {columns} FROM records WHERE {where} ORDER BY id DESC LIMIT ?", (*args, limit)
+            ).fetchall()
+        return [(row[0], {col: value for col, value in zip(RECORD_COLUMNS, row[1:]) if value is not None})
+                for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def open_storage(kind=None, root="data", group_commit=False, property_id=None, read_only=False):
+    """Open the configured backend: 'text' (default) or 'sqlite'.
+
+    read_only=True opens it for queries that must not change the files
+    (see TextStorage and SqliteStorage).
+
+    With a property id (or HOTEL_PROPERTY) this opens that property's
+    directory under root, checks usernames against root's shared index
+    and loads the property's catalog (see properties.py).
+    """
+    from properties import UsernameIndex, catalog_path, current_property, property_root
+    import catalog
+    kind = kind or os.environ.get("HOTEL_STORAGE", "text")
+    property_id = property_id or current_property()
+    base = root
+    if property_id:
+        root = property_root(base, property_id)
+    if kind == "sqlite":
+        storage = SqliteStorage(os.path.join(root, "hotel.db"), read_only=read_only)
+    elif kind == "text":
+        storage = TextStorage(root, group_commit=group_commit, read_only=read_only)
+    else:
+        raise ValueError(f"Unknown storage backend: {kind}")
+    if property_id:
+        storage.property_id = property_id
+        storage.usernames = UsernameIndex(base)
+        catalog.use(catalog_path(base, property_id))
+    return storage
+
+
+def migrate_text_to_sqlite(root="data", db_path=None):
+    """Bulk-import the text files under root into an empty SQLite database.
+
+    Refuses a database that already has users or records, since a second
+    run would add every record again.
+    """
+    db = SqliteStorage(db_path or os.path.join(root, "hotel.db"))
+    text = None
+    try:
+        with db.lock:
+            filled = db.conn.execute("SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM records)")
+            if filled.fetchone()[0]:
+                raise ValueError(f"{db.path} is not empty; migrate into a new database")
+        text = TextStorage(root)  # recovers any journaled writes first
+        counts = {}
+        rows = []
+        # Lowest precedence first so INSERT OR REPLACE keeps the role login() would pick
+        for role in ("user", "staff", "admin"):
+            users = text.load_users(role)
+            rows.extend((u, d["password"], role, d.get("position")) for u, d in users.items())
+            counts[role] = len(users)
+        with db.lock, db.conn:
+            db.conn.executemany(INSERT_USER, rows)
+        for kind in RECORD_FILES:
+            batch = []
+            counts[kind] = 0
+            for record in text.records(kind):
+                batch.append(record)
+                if len(batch) >= 10000:
+                    db.add_records(kind, batch)
+                    counts[kind] += len(batch)
+                    batch = []
+            db.add_records(kind, batch)
+            counts[kind] += len(batch)
+        return counts
+    finally:
+        if text is not None:
+            text.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        root = sys.argv[2] if len(sys.argv) > 2 else "data"
+        db_path = sys.argv[3] if len(sys.argv) > 3 else None
+        try:
+            counts = migrate_text_to_sqlite(root, db_path)
+        except ValueError as e:
+            sys.exit(f"Not migrated: {e}")
+        for name, count in counts.items():
+            print(f"{name}: {count} imported")
+    else:
+        print("Usage: python storage.py migrate [data_dir] [db_path]")
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Cheap password hashing for the tests; read when credentials is imported
+os.environ.setdefault("HOTEL_SCRYPT_N", "1024")
+os.environ.pop("HOTEL_PROPERTY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    """An empty data directory; the working directory is its parent"""
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "data")
+
+
+@pytest.fixture
+def storage(root):
+    from storage import TextStorage
+    storage = TextStorage(root)
+    yield storage
+    storage.close()
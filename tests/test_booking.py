@@ -0,0 +1,114 @@
+import datetime
+import multiprocessing
+
+import pytest
+
+import services
+from catalog import get_catalog
+from storage import SqliteStorage, TextStorage
+
+ROOM = 3
+CHECK_IN = datetime.date.today() + datetime.timedelta(days=30)
+CHECK_OUT = CHECK_IN + datetime.timedelta(days=2)
+
+
+def _open(kind, root):
+    return TextStorage(root) if kind == "text" else SqliteStorage(f"{root}/hotel.db")
+
+
+def _book(storage, attempts):
+    """How many of attempts bookings of ROOM for the stay were accepted"""
+    accepted = 0
+    for i in range(attempts):
+        try:
+            services.book_room(storage, f"guest{i}", ROOM, "Test Guest", "9876543210",
+                               CHECK_IN.isoformat(), CHECK_OUT.isoformat())
+            accepted += 1
+        except services.ServiceError:
+            pass
+    return accepted
+
+
+def _book_in_process(kind, root, attempts, start):
+    storage = _open(kind, root)
+    try:
+        start.wait()
+        return _book(storage, attempts)
+    finally:
+        storage.close()
+
+
+@pytest.fixture(params=["text", "sqlite"])
+def kind(request):
+    return request.param
+
+
+def test_capacity_holds(storage):
+    count = get_catalog().rooms[ROOM].count
+    assert _book(storage, count + 3) == count
+    assert services.availability(storage, CHECK_IN.isoformat(), CHECK_OUT.isoformat())[ROOM] == 0
+
+
+def test_storages_share_capacity(kind, root):
+    count = get_catalog().rooms[ROOM].count
+    first, second = _open(kind, root), _open(kind, root)
+    try:
+        assert _book(first, 2) == 2
+        assert services.availability(second, CHECK_IN.isoformat(), CHECK_OUT.isoformat())[ROOM] == count - 2
+        assert _book(second, count) == count - 2
+        assert _book(first, 1) == 0
+    finally:
+        first.close()
+        second.close()
+
+
+def test_processes_share_capacity(kind, root):
+    count = get_catalog().rooms[ROOM].count
+    _open(kind, root).close()  # create the directory before the race
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        start = manager.Event()
+        with context.Pool(2) as pool:
+            results = [pool.apply_async(_book_in_process, (kind, root, count, start)) for _ in range(2)]
+            start.set()
+            accepted = [result.get(60) for result in results]
+    assert sum(accepted) == count
+    storage = _open(kind, root)
+    try:
+        assert sum(1 for r in storage.records("booking") if str(r["item"]) == str(ROOM)) == count
+    finally:
+        storage.close()
+
+
+def test_batch_booking_holds_capacity(storage):
+    count = get_catalog().rooms[ROOM].count
+    with storage.batch():
+        assert _book(storage, count + 1) == count
+    other = TextStorage(storage.root)
+    try:
+        assert _book(other, 1) == 0
+    finally:
+        other.close()
+
+
+@pytest.mark.parametrize("check_in, check_out", [
+    ("2020-01-01", "2020-01-03"),  # in the past
+    (CHECK_IN.isoformat(), "9999-12-31"),  # too long
+    ("9999-12-01", "9999-12-03"),  # too far ahead
+])
+def test_booking_dates_are_bounded(storage, check_in, check_out):
+    with pytest.raises(services.ServiceError):
+        services.book_room(storage, "ravi", ROOM, "Ravi Kumar", "9876543210", check_in, check_out)
+    assert list(storage.records("booking")) == []
+
+
+def test_availability_does_not_grow_the_inventory(storage):
+    _book(storage, 1)
+    inventory = services.get_inventory(storage)
+    base, sizes = inventory.base, [len(nights) for nights in inventory.nights.values()]
+    window = (CHECK_IN - datetime.timedelta(days=200), CHECK_IN + datetime.timedelta(days=160))
+    free = services.availability(storage, *(day.isoformat() for day in window))
+    assert free[ROOM] == get_catalog().rooms[ROOM].count - 1
+    assert (inventory.base, [len(nights) for nights in inventory.nights.values()]) == (base, sizes)
+    with pytest.raises(services.ServiceError):
+        services.availability(storage, "0001-01-01", "9999-12-31")
@@ -0,0 +1,101 @@
+import datetime
+import os
+import sqlite3
+
+import pytest
+
+import coordinator
+import services
+from journal import JOURNAL_FILE, encode_frame
+from search import INDEX_FILE
+from storage import SqliteStorage, open_storage
+
+DAY = datetime.date.today() + datetime.timedelta(days=60)
+
+
+def _property(root, property_id):
+    return open_storage(root=root, property_id=property_id)
+
+
+def test_revenue_skips_cancelled_events(root):
+    storage = _property(root, "north")
+    try:
+        kept = services.book_event(storage, "ravi", 1, "Ravi Kumar", "9876543210", DAY.isoformat(), 10)
+        cancelled = services.book_event(storage, "ravi", 1, "Ravi Kumar", "9876543210",
+                                        (DAY + datetime.timedelta(days=1)).isoformat(), 10)
+        services.cancel_event(storage, cancelled["hold"]["hold_id"])
+    finally:
+        storage.close()
+    result = coordinator.revenue(root, DAY.isoformat(), (DAY + datetime.timedelta(days=7)).isoformat(), workers=1)
+    assert result["event"] == kept["invoice"]["total"]
+
+
+def test_stays_does_not_write_the_index(root):
+    storage = _property(root, "north")
+    try:
+        services.book_room(storage, "ravi", 1, "Ravi Kumar", "9876543210",
+                           DAY.isoformat(), (DAY + datetime.timedelta(days=2)).isoformat())
+        folder = storage.root
+    finally:
+        storage.close()
+    before = sorted(os.listdir(folder))
+    stays = coordinator.guest_stays(root, "ravi", workers=1)["stays"]
+    assert [stay["property"] for stay in stays] == ["north"]
+    assert INDEX_FILE not in os.listdir(folder)
+    assert sorted(os.listdir(folder)) == before
+    coordinator.update_search_indexes(root)
+    assert INDEX_FILE in os.listdir(folder)
+    assert coordinator.guest_stays(root, "ravi", workers=1)["stays"] == stays
+
+
+@pytest.mark.parametrize("backend", ["text", "sqlite"])
+def test_stays_limit_counts_only_bookings(root, monkeypatch, backend):
+    monkeypatch.setenv("HOTEL_STORAGE", backend)
+    storage = _property(root, "north")
+    try:
+        services.book_room(storage, "ravi", 1, "Ravi Kumar", "9876543210",
+                           DAY.isoformat(), (DAY + datetime.timedelta(days=2)).isoformat())
+        for _ in range(3):
+            services.order_food(storage, "ravi", [["pepsi", 1]], "Ravi Kumar", "9876543210")
+    finally:
+        storage.close()
+    stays = coordinator.guest_stays(root, "ravi", limit=1, workers=1)["stays"]
+    assert [stay["date"] for stay in stays] == [DAY.isoformat()]
+
+
+def test_text_queries_leave_the_journal_alone(root):
+    storage = _property(root, "north")
+    folder = storage.root
+    storage.close()
+    wal = os.path.join(folder, JOURNAL_FILE)
+    with open(wal, "ab") as f:  # a write whose process died before the log
+        f.write(encode_frame({"file": "bookings.txt", "offset": 0, "data": "Username: ravi\n"}))
+    before = sorted(os.listdir(folder)), os.path.getsize(wal)
+    coordinator.occupancy(root, DAY.isoformat(), (DAY + datetime.timedelta(days=7)).isoformat(), workers=1)
+    coordinator.guest_stays(root, "ravi", workers=1)
+    assert (sorted(os.listdir(folder)), os.path.getsize(wal)) == before
+
+
+def test_sqlite_queries_change_nothing(root, monkeypatch):
+    monkeypatch.setenv("HOTEL_STORAGE", "sqlite")
+    storage = _property(root, "north")
+    folder = storage.root
+    storage.close()
+    db = sqlite3.connect(os.path.join(folder, "hotel.db"))
+    db.executescript("DROP TABLE IF EXISTS records_names")
+    db.close()
+    path = os.path.join(folder, "hotel.db")
+    before = os.stat(path).st_size, os.stat(path).st_mtime_ns
+    coordinator.revenue(root, DAY.isoformat(), (DAY + datetime.timedelta(days=7)).isoformat(), workers=1)
+    coordinator.guest_stays(root, "ravi", workers=1)
+    # SQLite's own -wal/-shm files may appear; the database itself is untouched
+    assert (os.stat(path).st_size, os.stat(path).st_mtime_ns) == before
+    assert not [name for name in os.listdir(folder) if not name.startswith("hotel.db")]
+    db = sqlite3.connect(path)
+    try:
+        assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'records_names'").fetchone() is None
+    finally:
+        db.close()
+    missing = SqliteStorage(os.path.join(root, "south", "hotel.db"), read_only=True)
+    assert list(missing.records("booking")) == [] and not os.path.exists(os.path.join(root, "south"))
+    missing.close()
@@ -0,0 +1,84 @@
+import os
+import random
+import signal
+import subprocess
+import sys
+
+import pytest
+
+import bench
+from storage import TextStorage, parse_record
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _writer(first, last, env=None):
+    """A process writing bookings (and every fourth a signup) first..last-1, printing each once acknowledged"""
+    return subprocess.Popen([sys.executable, "-c", bench.CRASH_CHILD, REPO, str(first), str(last)],
+                            stdout=subprocess.PIPE, text=True, env=env)
+
+
+def _check(root, acked):
+    """Recover, then check every acknowledged write is there exactly once"""
+    storage = TextStorage(root)
+    try:
+        names = [record["name"] for record in storage.records("booking")]
+        for i in acked:
+            assert names.count(f"Crash {i}") == 1, i
+            if i % 4 == 0:
+                assert storage.find_user(f"crash{i}") is not None, i
+        assert len(names) == len(set(names))
+    finally:
+        storage.close()
+    for name in ("bookings.txt", "users.txt"):
+        if os.path.exists(os.path.join(root, name)):
+            with open(os.path.join(root, name), "rb") as f:
+                assert f.read()[-1:] in (b"", b"\n"), f"{name} ends with a torn line"
+
+
+@pytest.mark.parametrize("after", [1, 7])
+@pytest.mark.parametrize("point", ["wal-torn", "wal", "target-torn", "target"])
+def test_crash_at_each_journal_step(root, point, after):
+    env = dict(os.environ, HOTEL_CRASH_AT=point, HOTEL_CRASH_AFTER=str(after))
+    proc = _writer(0, 20, env)
+    acked = [int(line) for line in proc.stdout]
+    proc.stdout.close()
+    assert proc.wait() == 70
+    assert len(acked) < 20
+    _check(root, acked)
+    # The recovered directory takes new writes after the repaired tail
+    proc = _writer(100, 104)
+    acked += [int(line) for line in proc.stdout]
+    proc.stdout.close()
+    assert proc.wait() == 0
+    _check(root, acked)
+
+
+def test_killed_writers_lose_nothing_acknowledged(root):
+    rng = random.Random(5)
+    acked = []
+    for kill in range(3):
+        proc = _writer(kill * 100000, (kill + 1) * 100000)
+        for _ in range(rng.randrange(1, 60)):
+            acked.append(int(proc.stdout.readline()))
+        proc.send_signal(signal.SIGKILL)
+        proc.stdout.close()
+        proc.wait()
+        _check(root, acked)
+
+
+def test_recovery_completes_a_journal_that_never_reached_the_file(root):
+    from journal import JOURNAL_FILE, Journal, encode_frame
+    os.makedirs(root)
+    frames, offset = [], 0
+    for i in range(500):
+        line = f"Username: guest, Item: 3, Name: Guest {i}, Phone: 9876543210\n"
+        frames.append(encode_frame({"file": "bookings.txt", "offset": offset, "data": line}))
+        offset += len(line)
+    with open(os.path.join(root, JOURNAL_FILE), "wb") as f:
+        f.writelines(frames)
+    journal = Journal(root, ["bookings.txt"], background=False)
+    assert journal.last_recovery[1] == 500
+    journal.close()
+    with open(os.path.join(root, "bookings.txt")) as f:
+        assert [parse_record(line)["name"] for line in f] == [f"Guest {i}" for i in range(500)]
@@ -0,0 +1,54 @@
+import os
+
+from journal import JOURNAL_FILE, Journal, encode_frame, read_frames
+from storage import TextStorage, parse_record
+
+
+def test_write_is_logged_then_applied(root):
+    journal = Journal(root, ["bookings.txt"], background=False)
+    path = os.path.join(root, "bookings.txt")
+    journal.append(path, ["a\n", "b\n"])
+    frames = read_frames(os.path.join(root, JOURNAL_FILE))
+    assert frames == [{"file": "bookings.txt", "offset": 0, "data": "a\nb\n"}]
+    journal.close()
+    with open(path) as f:
+        assert f.read() == "a\nb\n"
+    assert os.path.getsize(os.path.join(root, JOURNAL_FILE)) == 0
+
+
+def test_recovery_replays_logged_writes(root):
+    os.makedirs(root)
+    path = os.path.join(root, "bookings.txt")
+    with open(path, "w") as f:
+        f.write("one\ntw")  # crashed part-way through the second line
+    with open(os.path.join(root, JOURNAL_FILE), "wb") as f:
+        f.write(encode_frame({"file": "bookings.txt", "offset": 4, "data": "two\n"}))
+        f.write(encode_frame({"file": "bookings.txt", "offset": 8, "data": "three\n"})[:-5])  # torn frame
+    journal = Journal(root, ["bookings.txt"], background=False)
+    assert journal.last_recovery[1] == 1
+    journal.close()
+    with open(path) as f:
+        assert f.read() == "one\ntwo\n"
+
+
+def test_replay_is_idempotent(root):
+    os.makedirs(root)
+    path = os.path.join(root, "bookings.txt")
+    with open(path, "w") as f:
+        f.write("one\ntwo\n")
+    with open(os.path.join(root, JOURNAL_FILE), "wb") as f:
+        f.write(encode_frame({"file": "bookings.txt", "offset": 4, "data": "two\n"}))
+    Journal(root, ["bookings.txt"], background=False).close()
+    with open(path) as f:
+        assert f.read() == "one\ntwo\n"
+
+
+def test_torn_line_is_cut_before_the_next_append(root):
+    storage = TextStorage(root)
+    storage.add_record("booking", {"username": "ravi", "item": 1, "name": "Ravi", "phone": "9876543210"})
+    with open(os.path.join(root, "bookings.txt"), "a") as f:
+        f.write("Username: half")  # a writer that died mid-append
+    storage.add_record("booking", {"username": "anita", "item": 2, "name": "Anita", "phone": "9876543211"})
+    storage.close()
+    with open(os.path.join(root, "bookings.txt")) as f:
+        assert [parse_record(line)["username"] for line in f] == ["ravi", "anita"]
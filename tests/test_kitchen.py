@@ -0,0 +1,46 @@
+import datetime
+
+import pytest
+
+import services
+from storage import TextStorage
+
+
+def _order(storage):
+    return services.order_food(storage, "ravi", [["pepsi", 1]], "Ravi Kumar", "9876543210")["record"]["order_id"]
+
+
+def _open_orders(storage):
+    return [row["order_id"] for row in services.kitchen_plan(storage)]
+
+
+def test_no_chefs_is_not_an_empty_queue(storage):
+    assert services.kitchen_plan(storage) == []
+    _order(storage)
+    with pytest.raises(services.ServiceError, match="No chefs"):
+        services.kitchen_plan(storage)
+
+
+def test_kitchens_see_each_others_orders(storage):
+    storage.save_user("staff", "anita", "hash", "chef")
+    other = TextStorage(storage.root)
+    try:
+        assert _open_orders(other) == []  # built before the orders below
+        first, second = _order(storage), _order(storage)
+        assert sorted(_open_orders(other)) == sorted([first, second])
+        services.complete_order(other, first, "anita")
+        assert _open_orders(storage) == [second]
+        with pytest.raises(services.ServiceError):
+            services.complete_order(storage, first, "anita")  # already done elsewhere
+    finally:
+        other.close()
+
+
+def test_earlier_days_are_dropped(storage):
+    storage.save_user("staff", "anita", "hash", "chef")
+    order_id = _order(storage)
+    kitchen = services.get_kitchen(storage)
+    for ticket in kitchen.queue.tickets():
+        ticket.placed -= datetime.timedelta(days=1)
+    kitchen.day -= datetime.timedelta(days=1)
+    assert order_id not in _open_orders(storage)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from storage import SqliteStorage, TextStorage, migrate_text_to_sqlite
+
+
+def test_migration_copies_users_and_records(root):
+    text = TextStorage(root)
+    text.save_user("user", "ravi", "hash1")
+    text.save_user("staff", "anita", "hash2", "chef")
+    text.save_user("user", "boss", "old")
+    text.promote_to_admin("boss")
+    bookings = [{"username": "ravi", "item": str(i % 5 + 1), "name": f"Guest {i}", "phone": "9876543210",
+                 "date": "2026-03-01", "checkout": "2026-03-03"} for i in range(25)]
+    text.add_records("booking", bookings)
+    text.add_record("food", {"username": "ravi", "item": "2", "name": "Ravi", "phone": "9876543210",
+                             "items": "pepsi x2", "delivery": "no"})
+    text.close()
+
+    counts = migrate_text_to_sqlite(root)
+    assert counts == {"user": 1, "staff": 1, "admin": 1, "booking": 25, "food": 1, "event": 0}
+    db = SqliteStorage(f"{root}/hotel.db")
+    try:
+        assert db.find_user("boss") == ("admin", {"password": "old"})
+        assert db.find_user("anita") == ("staff", {"password": "hash2", "position": "chef"})
+        assert list(db.records("booking")) == bookings
+        assert [r["items"] for r in db.records("food")] == ["pepsi x2"]
+    finally:
+        db.close()
+
+
+def test_migration_closes_the_text_storage(root):
+    TextStorage(root).close()
+    migrate_text_to_sqlite(root)
+    assert not [t for t in threading.enumerate() if t.name == "hotel-journal"]
+
+
+def test_migration_recovers_journaled_signups(root):
+    # The signup reaches the journal and the process dies before users.txt
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    child = "import sys; sys.path.insert(0, sys.argv[1]); from storage import TextStorage; " \
+            "TextStorage(sys.argv[2]).save_user('user', 'ravi', 'hash1')"
+    env = dict(os.environ, HOTEL_CRASH_AT="wal")
+    assert subprocess.run([sys.executable, "-c", child, repo, root], env=env).returncode == 70
+    assert os.path.getsize(os.path.join(root, "users.txt")) == 0
+    assert migrate_text_to_sqlite(root)["user"] == 1
+    db = SqliteStorage(f"{root}/hotel.db")
+    try:
+        assert db.find_user("ravi") == ("user", {"password": "hash1"})
+    finally:
+        db.close()
+
+
+def test_migration_refuses_a_filled_database(root):
+    text = TextStorage(root)
+    text.save_user("user", "ravi", "hash1")
+    text.add_record("food", {"username": "ravi", "item": "2", "name": "Ravi", "phone": "9876543210",
+                             "items": "pepsi x2", "delivery": "no"})
+    text.close()
+    migrate_text_to_sqlite(root)
+    with pytest.raises(ValueError, match="not empty"):
+        migrate_text_to_sqlite(root)
+    db = SqliteStorage(f"{root}/hotel.db")
+    try:
+        assert len(list(db.records("food"))) == 1
+    finally:
+        db.close()
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import services
+import storage as storage_module
+from storage import TextStorage
+
+
+@pytest.fixture
+def no_rewrites(monkeypatch):
+    def refuse(path, lines):
+        raise AssertionError(f"{path} rewritten")
+    monkeypatch.setattr(storage_module, "write_atomic", refuse)
+
+
+def test_legacy_password_upgrade_appends(root, no_rewrites):
+    os.makedirs(root)
+    with open(os.path.join(root, "staff.txt"), "w") as f:
+        f.write("anita,plain-pw,chef\n")
+    storage = TextStorage(root)
+    try:
+        assert services.authenticate(storage, "anita", "plain-pw")["position"] == "chef"
+        role, data = storage.find_user("anita")
+        assert data["password"] != "plain-pw" and data["position"] == "chef"
+    finally:
+        storage.close()
+    with open(os.path.join(root, "staff.txt")) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2 and lines[0] == "anita,plain-pw,chef"  # shadowed until compaction
+    storage = TextStorage(root)
+    try:
+        assert services.authenticate(storage, "anita", "plain-pw")["username"] == "anita"
+        with pytest.raises(services.ServiceError):
+            services.authenticate(storage, "anita", "wrong")
+    finally:
+        storage.close()
+
+
+def test_change_and_reset_password_append(storage, no_rewrites):
+    services.signup(storage, "user", "ravi", "old")
+    services.change_password(storage, "ravi", "old", "new")
+    code = services.issue_password_reset(storage, "ravi")["code"]
+    services.reset_password(storage, "ravi", code, "newer")
+    assert services.authenticate(storage, "ravi", "newer")["username"] == "ravi"
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+import services
+from server import HotelServer
+
+
+def _request(server, method, path, body=None, token=None):
+    """(status, JSON reply) of one request over a real connection"""
+    async def go():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        data = json.dumps(body).encode() if body is not None else b""
+        auth = f"Authorization: Bearer {token}\r\n" if token else ""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n{auth}"
+                     "Connection: close\r\n\r\n".encode() + data)
+        reply = await reader.read()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        head, _, payload = reply.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(payload)
+    return asyncio.run(go())
+
+
+@pytest.fixture
+def server(storage):
+    server = HotelServer(storage, workers=2, persist_sessions=False)
+    yield server
+    server.pool.shutdown()
+
+
+def _admin_token(server, storage):
+    username = services.ensure_admin(storage)
+    status, reply = _request(server, "POST", "/login", {"username": username, "password": "admin123"})
+    assert status == 200
+    return reply["token"]
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/login", {"username": ["ravi"], "password": "pw"}),
+    ("/login", {"username": "ravi", "password": {"x": 1}}),
+    ("/signup", {"role": "user", "username": "ravi", "password": 1234}),
+    ("/signup", {"role": ["user"], "username": "ravi", "password": "pw"}),
+    ("/password/reset", {"username": 7, "code": "x", "password": "pw"}),
+])
+def test_wrong_field_types_are_bad_requests(server, storage, path, body):
+    status, reply = _request(server, "POST", path, body)
+    assert status == 400 and "must be" in reply["error"]
+    assert storage.find_user("ravi") is None
+
+
+def test_admin_numbers_are_checked(server, storage):
+    token = _admin_token(server, storage)
+    status, reply = _request(server, "POST", "/admin/profile", {"action": "stop", "limit": "x"}, token)
+    assert status == 400 and reply["error"] == "limit must be a whole number."
+    status, reply = _request(server, "GET", "/admin/users?role=user&limit=5", token=token)
+    assert status == 200 and reply["users"] == []
+
+
+def test_internal_errors_are_not_echoed(server, storage, monkeypatch, caplog):
+    def broken(*args):
+        raise KeyError("/secret/path")
+    monkeypatch.setattr(services, "login", broken)
+    with caplog.at_level(logging.ERROR, logger="hotel.server"):
+        status, reply = _request(server, "POST", "/login", {"username": "ravi", "password": "pw"})
+    assert status == 500 and reply == {"error": "Internal error."}
+    assert "/secret/path" in caplog.text
+
+
+@pytest.mark.parametrize("delivery, expected", [("false", "no"), ("0", "no"), (False, "no"), ("no", "no")])
+def test_delivery_flag_is_parsed(server, storage, delivery, expected):
+    services.signup(storage, "user", "ravi", "pw")
+    token = _request(server, "POST", "/login", {"username": "ravi", "password": "pw"})[1]["token"]
+    order = {"items": [["pepsi", 1]], "name": "Ravi Kumar", "phone": "9876543210", "delivery": delivery}
+    status, reply = _request(server, "POST", "/food-orders", order, token)
+    assert status == 200 and reply["record"]["delivery"] == expected
+    status, reply = _request(server, "POST", "/food-orders", {**order, "delivery": "maybe"}, token)
+    assert status == 400
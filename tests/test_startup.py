@@ -0,0 +1,15 @@
+import os
+import sys
+
+import bench
+
+
+def test_cold_start_within_budget(root):
+    from userdir import SNAPSHOT_FILE
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    bench.write_user_files(20000, 1000)
+    child = [sys.executable, "-c", bench.STARTUP_CHILD, here, "user19999"]
+    bench._cold_start(child)  # parses the users files and saves the snapshot
+    assert os.path.exists(os.path.join(root, SNAPSHOT_FILE))
+    wall = min(bench._cold_start(child)[0] for _ in range(3))
+    assert wall < bench.STARTUP_BUDGET, f"cold start took {wall:.3f} s"
@@ -0,0 +1,105 @@
+import pytest
+
+from storage import SqliteStorage, TextStorage
+
+
+@pytest.fixture(params=["text", "sqlite"])
+def backend(request, root):
+    storage = TextStorage(root) if request.param == "text" else SqliteStorage(f"{root}/hotel.db")
+    yield storage
+    storage.close()
+
+
+def test_users_round_trip(backend):
+    backend.save_user("user", "ravi", "hash1")
+    backend.save_user("staff", "anita", "hash2", "chef")
+    assert backend.find_user("ravi") == ("user", {"password": "hash1"})
+    assert backend.find_user("anita") == ("staff", {"password": "hash2", "position": "chef"})
+    assert backend.find_user("nobody") is None
+    assert backend.delete_user("ravi")
+    assert backend.find_user("ravi") is None
+
+
+def test_admin_shadows_other_roles(backend):
+    backend.save_user("user", "boss", "user-hash")
+    assert backend.promote_to_admin("boss")
+    assert backend.find_user("boss") == ("admin", {"password": "user-hash"})
+
+
+def test_listings_page_through_position_buckets(backend, monkeypatch):
+    import services
+    for i in range(5):
+        backend.save_user("staff", f"cook{i}", "hash", "chef")
+    backend.save_user("staff", "wendy", "hash", "waiter")
+    backend.save_user("user", "ravi", "hash")
+    backend.update_staff_position("cook4", "manager")
+
+    def scan(role):
+        raise AssertionError(f"{role} loaded whole")
+    monkeypatch.setattr(backend, "load_users", scan)
+    assert list(backend.each_user("staff", "chef", page=2)) == [(f"cook{i}", {"password": "hash", "position": "chef"})
+                                                                for i in range(4)]
+    roster = services.staff_by_position(backend)
+    assert roster["chef"] == ["cook0", "cook1", "cook2", "cook3"] and roster["manager"] == ["cook4"]
+    assert services.list_users(backend)["users"] == ["ravi"]
+    assert services.get_kitchen(backend).chefs() == ["cook0", "cook1", "cook2", "cook3"]
+
+
+def test_batch_writes_at_the_end(backend):
+    record = {"username": "ravi", "item": 1, "name": "Ravi", "phone": "9876543210"}
+    with backend.batch():
+        backend.save_user("user", "ravi", "hash")
+        backend.add_record("booking", record)
+        assert backend.find_user("ravi") is not None  # seen inside the batch
+        assert list(backend.records("booking")) == []
+    assert [r["username"] for r in backend.records("booking")] == ["ravi"]
+
+
+def test_failed_batch_writes_nothing(backend):
+    with pytest.raises(RuntimeError):
+        with backend.batch():
+            backend.save_user("user", "ravi", "hash")
+            raise RuntimeError
+    assert backend.find_user("ravi") is None
+
+
+def test_users_snapshot_sees_later_appends(root):
+    first = TextStorage(root)
+    for i in range(20):
+        first.save_user("user", f"u{i}", f"pw{i}")
+    first.close()  # saves users.snap
+    reader, writer = TextStorage(root), TextStorage(root)
+    assert reader.find_user("u3") == ("user", {"password": "pw3"})
+    assert reader.directory._snapshot is not None
+    writer.save_user("user", "late", "pw")
+    writer.delete_user("u4")
+    assert reader.find_user("late") == ("user", {"password": "pw"})
+    assert reader.find_user("u4") is None
+    writer.set_password("u5", "new")  # a rewrite: the snapshot is stale
+    assert reader.find_user("u5") == ("user", {"password": "new"})
+    reader.close()
+    writer.close()
+
+
+def test_sqlite_name_search_sees_every_write(root):
+    storage = SqliteStorage(f"{root}/hotel.db")
+    try:
+        if not storage.name_search:
+            pytest.skip("SQLite without the FTS5 trigram tokenizer")
+        storage.conn.executescript("""CREATE TRIGGER records_names_insert AFTER INSERT ON records BEGIN
+            INSERT INTO records_names (rowid, name) VALUES (new.id, new.name); END;""")  # as older versions made
+    finally:
+        storage.close()
+    storage = SqliteStorage(f"{root}/hotel.db")  # drops the trigger: no row indexed twice
+    try:
+        storage.add_records("booking", [{"username": f"u{i}", "name": f"Guest {i} Kumar"} for i in range(3)])
+        with storage.batch():
+            storage.add_record("food", {"username": "u9", "name": "Batch Kumar"})
+            storage.add_record("event", {"username": "u9", "name": "Event Kumar"})
+        found = storage.find_records("name", "kumar", 10)
+        assert sorted(record["name"] for _, record in found) == [
+            "Batch Kumar", "Event Kumar", "Guest 0 Kumar", "Guest 1 Kumar", "Guest 2 Kumar"]
+        assert storage.conn.execute("SELECT COUNT(*) FROM records_names WHERE records_names MATCH 'kumar'"
+                                    ).fetchone()[0] == 5
+    finally:
+        storage.close()
@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+
+import services
+
+CHECK_IN = datetime.date.today() + datetime.timedelta(days=30)
+CHECK_OUT = CHECK_IN + datetime.timedelta(days=2)
+
+BAD_TEXT = ["x\nghost", "x\rghost", "x\x00", "Ravi, Phone: 1234567890", "Username: victim"]
+
+
+@pytest.mark.parametrize("name", BAD_TEXT)
+def test_booking_name_cannot_forge_a_record(storage, name):
+    forged = name + "\nUsername: victim, Room: 1, Name: Forged, Phone: 9876543210"
+    for value in (name, forged):
+        with pytest.raises(services.ServiceError):
+            services.book_room(storage, "ravi", 1, value, "9876543210", CHECK_IN.isoformat(), CHECK_OUT.isoformat())
+    assert list(storage.records("booking")) == []
+    assert services.search_records(storage, "username", "victim") == []
+
+
+@pytest.mark.parametrize("name", BAD_TEXT)
+def test_order_and_event_names_are_checked(storage, name):
+    with pytest.raises(services.ServiceError):
+        services.order_food(storage, "ravi", [["pepsi", 1]], name, "9876543210")
+    with pytest.raises(services.ServiceError):
+        services.book_event(storage, "ravi", 1, name, "9876543210", CHECK_IN.isoformat(), 10)
+
+
+@pytest.mark.parametrize("username", BAD_TEXT)
+def test_signup_username_cannot_add_accounts(storage, username):
+    with pytest.raises(services.ServiceError):
+        services.signup(storage, "user", username, "pw")
+    assert storage.find_user("ghost") is None
+    assert storage.load_users("user") == {}
+
+
+def test_import_staff_skips_bad_usernames(storage):
+    result = services.import_staff(storage, [["x\nghost", "chef"], ["x:y", "chef"], ["anita", "chef"]])
+    assert result["added"] == 1
+    assert [number for number, _ in result["skipped"]] == [1, 2]
+    assert storage.find_user("ghost") is None
+
+
+def test_plain_names_still_accepted(storage):
+    booking = services.book_room(storage, "ravi", 1, "  Ravi Kumar-Singh  ", "9876543210",
+                                 CHECK_IN.isoformat(), CHECK_OUT.isoformat())
+    assert booking["record"]["name"] == "Ravi Kumar-Singh"
+    assert services.signup(storage, "user", "ravi.k", "pw")["username"] == "ravi.k"
+
+
+@pytest.mark.parametrize("limit", ["ten", None, "1.5"])
+def test_search_limit_must_be_a_number(storage, limit):
+    with pytest.raises(services.ServiceError):
+        services.search_records(storage, "username", "ravi", limit)
@@ -0,0 +1,33 @@
+import datetime
+
+import billing
+import services
+from venues import closed_holds
+
+DAY = datetime.date.today() + datetime.timedelta(days=60)
+
+
+def _book(storage, days, confirmed=True):
+    return services.book_event(storage, "ravi", 1, "Ravi Kumar", "9876543210",
+                               (DAY + datetime.timedelta(days=days)).isoformat(), 10, confirmed=confirmed)
+
+
+def test_closed_holds(storage):
+    kept = _book(storage, 0)["hold"]["hold_id"]
+    cancelled = _book(storage, 1)["hold"]["hold_id"]
+    tentative = _book(storage, 2, confirmed=False)["hold"]["hold_id"]
+    services.cancel_event(storage, cancelled)
+    assert closed_holds(storage.root) == {cancelled}
+    later = datetime.date.today() + datetime.timedelta(days=30)
+    assert closed_holds(storage.root, today=later) == {cancelled, tentative}
+    assert kept not in closed_holds(storage.root, today=later)
+    # The event records themselves stay in the log
+    assert len(list(storage.records("event"))) == 3
+
+
+def test_batch_totals_skip_closed_holds(storage):
+    kept = _book(storage, 0)
+    cancelled = _book(storage, 1)
+    services.cancel_event(storage, cancelled["hold"]["hold_id"])
+    totals = billing.batch_totals(storage)["event"]
+    assert totals == {kept["record"]["date"]: kept["invoice"]["total"]}
@@ -0,0 +1,419 @@
+import bisect
+import marshal
+import mmap
+import os
+import zlib
+from array import array
+from itertools import accumulate
+
+import metrics
+
+# Lookup order matters: an admin username shadows the same name in the
+# staff or users file, exactly like the old login() checks did.
+ROLES = ("admin", "staff", "user")
+SNAPSHOT_FILE = "users.snap"
+SNAPSHOT_VERSION = 1
+CHECK_BYTES = 4096  # tail of each users file the snapshot checksums
+
+
+def user_line(role, username, data):
+    """One users-file line; data None writes a deletion marker"""
+    if data is None:
+        return f"{username},,\n" if role == "staff" else f"{username},\n"
+    if role == "staff":
+        return f"{username},{data['password']},{data['position']}\n"
+    return f"{username},{data['password']}\n"
+
+
+def _changes(lines, with_position):
+    """(username, record or None for a deletion) for each users-file line"""
+    for line in lines:
+        parts = line.strip().split(",")
+        if len(parts) >= 2 and not parts[1]:
+            # Empty password: the user was deleted or moved to another role
+            yield parts[0], None
+        elif with_position and len(parts) >= 3:
+            yield parts[0], {"password": parts[1], "position": parts[2]}
+        elif not with_position and len(parts) >= 2:
+            yield parts[0], {"password": parts[1]}
+
+
+def _read(file_path, with_position):
+    """(users, line count) for one users file"""
+    users = {}
+    lines = 0
+    if not os.path.exists(file_path):
+        return users, lines
+    with open(file_path, "r") as f:
+        for username, data in _changes(f, with_position):
+            lines += 1
+            if data is None:
+                users.pop(username, None)
+            else:
+                users[username] = data
+    return users, lines
+
+
+def read_user_file(file_path, with_position=False):
+    """Parse one users file into {username: record}.
+
+    Changes are appended, so a later line for a username replaces an
+    earlier one and a line with an empty password removes the user.
+    """
+    return _read(file_path, with_position)[0]
+
+
+def _tail(f, end):
+    """The CHECK_BYTES before end in the open file f"""
+    start = max(0, end - CHECK_BYTES)
+    f.seek(start)
+    return f.read(end - start)
+
+
+def file_stamp(file_path):
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class UserSnapshot:
+    """A memory-mapped username table written by a fully loaded UserDirectory.
+
+    users.snap holds every (username, role) entry sorted by username, so a
+    lookup is a binary search over the mapping and a cold start reads none
+    of the users files. For each file it records the inode and the length
+    it covers, plus a checksum of the last CHECK_BYTES. The files only
+    grow between rewrites, so lines appended since (by any process) are
+    read into a small overlay before each lookup; a file that was
+    rewritten (compaction, a password change) makes the snapshot stale and
+    the directory parses the files instead.
+
+    Layout: a marshal header, padding to 8 bytes, count + 1 entry offsets
+    (array "q"), then the entries as b"username\nrole\npassword\nposition".
+    """
+
+    def __init__(self, files, header, mm, start):
+        self.files = files
+        self.mm = mm
+        self.count = header["count"]
+        self.offsets = memoryview(mm)[start:start + 8 * (self.count + 1)].cast("q")
+        self.base = start + 8 * (self.count + 1)  # where the entries start
+        self.covered = {}  # role -> (inode, bytes read) of its file
+        self.tail = {role: {} for role in files}  # username -> record or None, from lines read since
+
+    @classmethod
+    def open(cls, path, files):
+        """The snapshot at path if it still matches the files, else None"""
+        try:
+            with open(path, "rb") as f:
+                header = marshal.load(f)
+                start = -(-f.tell() // 8) * 8
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if header.get("version") != SNAPSHOT_VERSION or set(header["files"]) != set(files):
+                return None
+            snapshot = cls(files, header, mm, start)
+            if len(mm) != snapshot.base + snapshot.offsets[-1]:
+                return None  # cut short
+            for role, file_path in files.items():
+                if header["files"][role] is None:
+                    snapshot.covered[role] = (None, 0)
+                    continue
+                inode, offset, check = header["files"][role]
+                with open(file_path, "rb") as f:
+                    st = os.fstat(f.fileno())
+                    if st.st_ino != inode or st.st_size < offset or zlib.crc32(_tail(f, offset)) != check:
+                        return None
+                snapshot.covered[role] = (inode, offset)
+        except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+            return None  # missing, damaged or out of date
+        return snapshot
+
+    @staticmethod
+    def save(path, files, by_role, stamps):
+        """Write the snapshot of by_role, read from files at stamps; False if a file has changed since"""
+        covered = {}
+        for role, file_path in files.items():
+            try:
+                with open(file_path, "rb") as f:
+                    st = os.fstat(f.fileno())
+                    tail = _tail(f, st.st_size)
+            except FileNotFoundError:
+                if stamps[role] is not None:
+                    return False
+                covered[role] = None
+                continue
+            if (st.st_mtime_ns, st.st_size) != stamps[role] or tail[-1:] not in (b"", b"\n"):
+                return False  # moved on, or a line still being written
+            covered[role] = (st.st_ino, st.st_size, zlib.crc32(tail))
+        try:
+            with open(path, "rb") as f:
+                if marshal.load(f)["files"] == covered:
+                    return True  # already up to date
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass
+        entries = sorted(
+            (username, rank, f"{username}\n{role}\n{data['password']}\n{data.get('position', '')}".encode())
+            for rank, role in enumerate(ROLES) for username, data in by_role.get(role, {}).items())
+        offsets = array("q", accumulate((len(entry) for _, _, entry in entries), initial=0))
+        import tempfile
+        folder = os.path.dirname(path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump({"version": SNAPSHOT_VERSION, "files": covered, "count": len(entries)}, f)
+                f.write(b"\0" * (-f.tell() % 8))
+                f.write(offsets.tobytes())
+                f.writelines(entry for _, _, entry in entries)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return True
+
+    def catch_up(self):
+        """Read the lines appended to each file since; False if a file was rewritten"""
+        for role, path in self.files.items():
+            inode, offset = self.covered[role]
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                if offset:
+                    return False
+                continue
+            if (inode is not None and st.st_ino != inode) or st.st_size < offset:
+                return False
+            if st.st_size > offset:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(st.st_size - offset)
+                end = data.rfind(b"\n") + 1  # a line still being written is read next time
+                if metrics.enabled:
+                    metrics.count("file_bytes", end, file=os.path.basename(path), op="read")
+                self.tail[role].update(_changes(data[:end].decode().splitlines(), role == "staff"))
+                self.covered[role] = (st.st_ino, offset + end)
+        return True
+
+    def _stored(self, username):
+        """{role: record} of the entries for username"""
+        mm, offsets, base = self.mm, self.offsets, self.base
+        key = username.encode()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + offsets[mid]
+            if mm[start:mm.find(b"\n", start)] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = {}
+        while lo < self.count:
+            name, role, password, position = mm[base + offsets[lo]:base + offsets[lo + 1]].decode().split("\n")
+            if name != username:
+                break
+            found[role] = {"password": password, "position": position} if role == "staff" else {"password": password}
+            lo += 1
+        return found
+
+    def lookup(self, username):
+        """Return (role, record) for username, or None"""
+        stored = None
+        for role in ROLES:
+            if username in self.tail[role]:
+                data = self.tail[role][username]
+            else:
+                if stored is None:
+                    stored = self._stored(username)
+                data = stored.get(role)
+            if data is not None:
+                return role, data
+        return None
+
+
+class UserDirectory:
+    """Process-wide username index over the admin, staff and users files.
+
+    Each file is parsed once and only re-read when its mtime or size changes,
+    so login and signup checks are a dict lookup instead of three file parses.
+    Sorted username lists per role and per staff position ("buckets") are
+    built on first use and then kept up to date with each change, so paged
+    listings never scan a whole role.
+
+    With a snapshot path, lookups are answered from the UserSnapshot there
+    until something needs the files themselves (a listing, a count, a
+    write), so a terminal can log in without parsing them. save_snapshot()
+    writes it once the files are loaded.
+    """
+
+    def __init__(self, files, snapshot=None):
+        self.files = dict(files)  # role -> file path
+        self.snapshot_path = snapshot
+        self._snapshot = None  # UserSnapshot answering lookups until the files are loaded
+        self._snapshot_opened = snapshot is None
+        self._stamps = {role: None for role in self.files}
+        self._loaded = {role: False for role in self.files}
+        self._by_role = {role: {} for role in self.files}
+        self.lines = {role: 0 for role in self.files}  # lines in each file, live or not
+        self._index = {}
+        self._buckets = {}  # role or ("staff", position) -> sorted usernames
+
+    def refresh(self):
+        """Reload any file that changed on disk since it was last read"""
+        self._snapshot, self._snapshot_opened = None, True
+        changed = False
+        for role, path in self.files.items():
+            stamp = file_stamp(path)
+            if self._loaded[role] and stamp == self._stamps[role]:
+                continue
+            if metrics.enabled and stamp is not None:
+                metrics.count("file_bytes", stamp[1], file=os.path.basename(path), op="read")
+            self._by_role[role], self.lines[role] = _read(path, role == "staff")
+            self._stamps[role] = stamp
+            self._loaded[role] = True
+            self._drop_buckets(role)
+            changed = True
+        metrics.cache("userdir", not changed)
+        if changed:
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        index = {}
+        for role in reversed(ROLES):
+            for username, data in self._by_role.get(role, {}).items():
+                index[username] = (role, data)
+        self._index = index
+
+    def _drop_buckets(self, role):
+        for key in [k for k in self._buckets if k == role or (isinstance(k, tuple) and k[0] == role)]:
+            del self._buckets[key]
+
+    def _from_snapshot(self):
+        if not self._snapshot_opened:
+            self._snapshot_opened = True
+            self._snapshot = UserSnapshot.open(self.snapshot_path, self.files)
+        snapshot = self._snapshot
+        if snapshot is not None and not snapshot.catch_up():
+            snapshot = self._snapshot = None
+        return snapshot
+
+    def lookup(self, username):
+        """Return (role, record) for username, or None"""
+        snapshot = self._from_snapshot()
+        if snapshot is not None:
+            metrics.cache("userdir", True)
+            return snapshot.lookup(username)
+        self.refresh()
+        return self._index.get(username)
+
+    def exists(self, username):
+        return self.lookup(username) is not None
+
+    def users(self, role):
+        """Return the {username: record} dict for one role"""
+        self.refresh()
+        return self._by_role[role]
+
+    def _bucket(self, role, position=None):
+        key = (role, position) if position else role
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            users = self._by_role[role]
+            if position:
+                bucket = sorted(u for u, d in users.items() if d.get("position") == position)
+            else:
+                bucket = sorted(users)
+            self._buckets[key] = bucket
+        return bucket
+
+    def count(self, role, position=None):
+        self.refresh()
+        if position is None:
+            return len(self._by_role[role])
+        return len(self._bucket(role, position))
+
+    def page(self, role, position=None, after=None, limit=50):
+        """([(username, record)], next cursor) in username order.
+
+        The cursor is the last username of the page, so a listing stays
+        consistent while users are added or removed between pages; it is
+        None after the last page.
+        """
+        self.refresh()
+        bucket = self._bucket(role, position)
+        start = bisect.bisect_right(bucket, after) if after else 0
+        names = bucket[start:start + limit]
+        users = self._by_role[role]
+        cursor = names[-1] if names and start + limit < len(bucket) else None
+        return [(u, users[u]) for u in names], cursor
+
+    def _bucket_remove(self, key, username):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            i = bisect.bisect_left(bucket, username)
+            if i < len(bucket) and bucket[i] == username:
+                del bucket[i]
+
+    def _bucket_add(self, key, username):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            i = bisect.bisect_left(bucket, username)
+            if i == len(bucket) or bucket[i] != username:
+                bucket.insert(i, username)
+
+    def _apply(self, role, username, data):
+        users = self._by_role[role]
+        old = users.get(username)
+        if old is not None and old.get("position"):
+            self._bucket_remove((role, old["position"]), username)
+        if data is None:
+            users.pop(username, None)
+            self._bucket_remove(role, username)
+            current = self._index.get(username)
+            if current is not None and current[0] == role:
+                # Fall back to the same name in a lower role, if any
+                del self._index[username]
+                for other in ROLES:
+                    if username in self._by_role[other]:
+                        self._index[username] = (other, self._by_role[other][username])
+                        break
+            return
+        users[username] = data
+        self._bucket_add(role, username)
+        if data.get("position"):
+            self._bucket_add((role, data["position"]), username)
+        current = self._index.get(username)
+        if current is None or ROLES.index(current[0]) >= ROLES.index(role):
+            self._index[username] = (role, data)
+
+    def applied(self, role, changes, stamp_before):
+        """Record lines just appended to a role file by this process.
+
+        changes is [(username, record or None for a deletion)]; stamp_before
+        is the file stamp taken before the write. If the file had already
+        changed since we last read it, the role is simply marked stale and
+        re-read on the next lookup.
+        """
+        path = self.files[role]
+        if self._loaded[role] and stamp_before == self._stamps[role]:
+            for username, data in changes:
+                self._apply(role, username, data)
+            self.lines[role] += len(changes)
+            self._stamps[role] = file_stamp(path)
+        else:
+            self._loaded[role] = False
+
+    def save_snapshot(self):
+        """Write the snapshot of the loaded files, if any, for the next process to start from"""
+        if self.snapshot_path and all(self._loaded.values()):
+            UserSnapshot.save(self.snapshot_path, self.files, self._by_role, self._stamps)
+
+    def replaced(self, role, users):
+        """Record that a role file was rewritten with exactly these users"""
+        self._by_role[role] = users
+        self.lines[role] = len(users)
+        self._stamps[role] = file_stamp(self.files[role])
+        self._loaded[role] = True
+        self._drop_buckets(role)
+        self._rebuild_index()
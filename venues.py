@@ -0,0 +1,245 @@
+"""Event venue calendar: halls, gardens and conference rooms.
+
+A venue hosts one event per day. Each venue keeps a sorted list of the
+days it is held, so a conflict check is one bisect and "first free day
+from X" jumps straight to the next held day instead of walking the
+calendar. Holds are either tentative (they lapse after the catalog's
+hold_days unless confirmed) or confirmed.
+
+Holds are logged to venues.txt in the data directory, one line per
+change:
+    <hold id>,<venue>,<day>,<status>,<username>,<guests>,<expires>
+The last line for a hold id wins; status "cancelled" frees the day. The
+log is re-read when another process has appended to it, and new holds
+are checked and written under the file lock, so two clerks cannot take
+the same venue on the same day.
+
+The event records in event.txt are never rewritten, so whatever totals
+them skips the records whose hold closed_holds() lists as cancelled or
+lapsed.
+"""
+import bisect
+import datetime
+import os
+import secrets
+import threading
+
+from catalog import get_catalog
+from filelock import locked
+from inventory import parse_date
+from userdir import file_stamp
+
+VENUES_FILE = "venues.txt"
+TENTATIVE = "tentative"
+CONFIRMED = "confirmed"
+CANCELLED = "cancelled"
+
+
+class VenueError(Exception):
+    pass
+
+
+class Hold:
+    __slots__ = ("hold_id", "venue", "day", "status", "username", "guests", "expires")
+
+    def __init__(self, hold_id, venue, day, status, username, guests, expires=None):
+        self.hold_id = hold_id
+        self.venue = venue
+        self.day = day  # datetime.date
+        self.status = status
+        self.username = username
+        self.guests = guests
+        self.expires = expires  # datetime.date for tentative holds
+
+    def lapsed(self, today):
+        return self.status == TENTATIVE and self.expires is not None and self.expires < today
+
+    def line(self):
+        expires = self.expires.isoformat() if self.expires else ""
+        return (f"{self.hold_id},{self.venue},{self.day.isoformat()},{self.status},"
+                f"{self.username},{self.guests},{expires}\n")
+
+    def as_dict(self):
+        return {"hold_id": self.hold_id, "venue": self.venue, "date": self.day.isoformat(),
+                "status": self.status, "username": self.username, "guests": self.guests,
+                "expires": self.expires.isoformat() if self.expires else None}
+
+
+def _parse_hold(line):
+    parts = line.rstrip("\n").split(",")
+    if len(parts) != 7:
+        return None
+    day = parse_date(parts[2])
+    if day is None:
+        return None
+    try:
+        guests = int(parts[5])
+    except ValueError:
+        return None
+    return Hold(parts[0], parts[1], day, parts[3], parts[4], guests, parse_date(parts[6]))
+
+
+def _read_holds(path):
+    """{hold id: hold} as of the last line for each id in the log at path"""
+    holds = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                hold = _parse_hold(line)
+                if hold:
+                    holds[hold.hold_id] = hold
+    return holds
+
+
+def closed_holds(root, today=None):
+    """Ids of the holds in root's venue log that were cancelled or have lapsed"""
+    today = today or datetime.date.today()
+    return {hold_id for hold_id, hold in _read_holds(os.path.join(root, VENUES_FILE)).items()
+            if hold.status == CANCELLED or hold.lapsed(today)}
+
+
+class VenueCalendar:
+    """Holds per venue, with a sorted day index for each"""
+
+    def __init__(self, root, venues=None):
+        self.path = os.path.join(root, VENUES_FILE)
+        self.venues = venues if venues is not None else get_catalog().venues
+        self.lock = threading.RLock()
+        self._stamp = None
+        self._load()
+
+    def _load(self):
+        holds = _read_holds(self.path)
+        self.holds = {}  # hold id -> live hold
+        self.by_day = {venue: {} for venue in self.venues}  # venue -> {ordinal: hold}
+        self.days = {venue: [] for venue in self.venues}  # venue -> sorted ordinals
+        for hold in holds.values():
+            if hold.status != CANCELLED and hold.venue in self.by_day:
+                self.holds[hold.hold_id] = hold
+                self.by_day[hold.venue][hold.day.toordinal()] = hold
+        for venue, held in self.by_day.items():
+            self.days[venue] = sorted(held)
+        self._stamp = file_stamp(self.path)
+
+    def refresh(self):
+        """Pick up holds written by other processes"""
+        with self.lock:
+            if file_stamp(self.path) != self._stamp:
+                self._load()
+
+    def _index(self, hold):
+        ordinal = hold.day.toordinal()
+        self.holds[hold.hold_id] = hold
+        if ordinal not in self.by_day[hold.venue]:
+            bisect.insort(self.days[hold.venue], ordinal)
+        self.by_day[hold.venue][ordinal] = hold
+
+    def _unindex(self, hold):
+        ordinal = hold.day.toordinal()
+        self.holds.pop(hold.hold_id, None)
+        del self.by_day[hold.venue][ordinal]
+        days = self.days[hold.venue]
+        del days[bisect.bisect_left(days, ordinal)]
+
+    def _write(self, hold):
+        # Caller holds locked(self.path)
+        with open(self.path, "a") as f:
+            f.write(hold.line())
+        self._stamp = file_stamp(self.path)
+
+    def holder(self, venue, day, today=None):
+        """The live hold on venue for day, or None if the day is free"""
+        hold = self.by_day[venue].get(day.toordinal())
+        if hold is not None and hold.lapsed(today or datetime.date.today()):
+            return None
+        return hold
+
+    def _first_free_day(self, venue, start, end, today):
+        """First ordinal in [start, end] with no live hold, or None"""
+        days, held = self.days[venue], self.by_day[venue]
+        i = bisect.bisect_left(days, start)
+        day = start
+        while day <= end:
+            if i == len(days) or days[i] != day:
+                return day
+            if held[day].lapsed(today):
+                return day
+            # Held: step past this run of consecutive held days
+            day += 1
+            i += 1
+        return None
+
+    def candidates(self, guests, kinds=None):
+        """Venues big enough for guests, smallest first"""
+        return sorted((v for v in self.venues.values()
+                       if v.capacity >= guests and (kinds is None or v.kind in kinds)),
+                      key=lambda v: (v.capacity, v.id))
+
+    def first_free(self, guests, start, end, kinds=None, today=None):
+        """(venue, day) of the earliest free day in [start, end] for guests.
+
+        Ties on the day go to the smallest venue that fits, leaving the
+        big halls for big parties. None if nothing is free in range.
+        """
+        today = today or datetime.date.today()
+        best = None
+        with self.lock:
+            self.refresh()
+            for venue in self.candidates(guests, kinds):
+                limit = best[1] - 1 if best else end.toordinal()
+                day = self._first_free_day(venue.id, start.toordinal(), limit, today)
+                if day is not None:
+                    best = (venue, day)
+        return (best[0], datetime.date.fromordinal(best[1])) if best else None
+
+    def hold(self, venue, day, username, guests, status=TENTATIVE, today=None):
+        """Put a hold on venue for day; raises VenueError on a conflict"""
+        today = today or datetime.date.today()
+        if venue not in self.venues:
+            raise VenueError("Unknown venue.")
+        if guests > self.venues[venue].capacity:
+            raise VenueError(f"{self.venues[venue].name} holds at most {self.venues[venue].capacity} guests.")
+        if status not in (TENTATIVE, CONFIRMED):
+            raise VenueError("A hold is either tentative or confirmed.")
+        expires = today + datetime.timedelta(days=get_catalog().hold_days) if status == TENTATIVE else None
+        hold = Hold(secrets.token_hex(4), venue, day, status, username, guests, expires)
+        with self.lock, locked(self.path):
+            self.refresh()
+            current = self.holder(venue, day, today)
+            if current is not None:
+                raise VenueError(f"{self.venues[venue].name} is already booked on {day.isoformat()}.")
+            stale = self.by_day[venue].get(day.toordinal())
+            if stale is not None:
+                self._unindex(stale)  # lapsed tentative hold
+            self._write(hold)
+            self._index(hold)
+        return hold
+
+    def _change(self, hold_id, status):
+        with self.lock, locked(self.path):
+            self.refresh()
+            hold = self.holds.get(hold_id)
+            if hold is None or hold.lapsed(datetime.date.today()):
+                raise VenueError("Hold not found or already lapsed.")
+            changed = Hold(hold.hold_id, hold.venue, hold.day, status, hold.username, hold.guests)
+            self._write(changed)
+            self._unindex(hold)
+            if status != CANCELLED:
+                self._index(changed)
+        return changed
+
+    def confirm(self, hold_id):
+        return self._change(hold_id, CONFIRMED)
+
+    def cancel(self, hold_id):
+        return self._change(hold_id, CANCELLED)
+
+    def calendar(self, venue, start, end, today=None):
+        """Live holds on venue between start and end, in day order"""
+        today = today or datetime.date.today()
+        with self.lock:
+            self.refresh()
+            days, held = self.days[venue], self.by_day[venue]
+            lo = bisect.bisect_left(days, start.toordinal())
+            hi = bisect.bisect_right(days, end.toordinal())
+            return [held[d] for d in days[lo:hi] if not held[d].lapsed(today)]